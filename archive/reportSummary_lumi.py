@@ -1,6 +1,9 @@
 #!/usr/bin/env python
 
-import sys
+import sys, os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../bin/python/'))
+import kaonlt as klt
 
 runNo  = sys.argv[1]
 evenNo = sys.argv[2]
@@ -25,7 +28,7 @@ f.close()
 
 filename = './REPORT_OUTPUT/COIN/PRODUCTION/PionLT_replay_coin_production_%s_%s.report' % (runNo, evenNo)
 
-f    = open(filename)
+rep = klt.pyReport(filename)
 
 objList = ['Run #', 
            'SHMS Run Length',
@@ -39,25 +42,23 @@ objList = ['Run #',
            'SHMS_pTRIG2 Pre-scaled Pre-triggers', 'SHMS_pTRIG3 Pre-scaled Pre-triggers', 'SHMS_pTRIG5 Pre-scaled Pre-triggers',
            'Coin ROC2 pTRIG2 Accepted Triggers', 'Coin ROC2 pTRIG3 Accepted Triggers', 'Coin ROC2 pTRIG5 Accepted Triggers', 'ROC2 OG 6 GeV Electronic Dead Time (100, 150) ']
 
-for line in f:
-    data = line.split(':')
-    for index, obj in enumerate(objList) :
-        if (objList[index] in data[0]) :
-            if (index == 19) :
-                COIN_RAW = data[1].split("[")
-            if (index == 22) :
-                COIN_ACC = data[1].split("[")
-            if (objList[index] == 'ROC2 OG 6 GeV Electronic Dead Time (100, 150) ') :
-                elec_DT = data[1].split("%")
-                elec_LT = 1-float(elec_DT[0])
-                fout.write('\nROC2 OG 6 GeV Electronic Live Time (100, 150) (%): ')
-                fout.write(str(elec_LT))
-            else :
-                fout.write(data[0] + ' : ' + data[1])
-COIN_LT = 100-(float(COIN_ACC[0]) / float(COIN_RAW[0]))
+for index, obj in enumerate(objList) :
+    if (obj not in rep) :
+        continue
+    if (index == 19) :
+        COIN_RAW = rep.get(obj)
+    if (index == 22) :
+        COIN_ACC = rep.get(obj)
+    if (obj == 'ROC2 OG 6 GeV Electronic Dead Time (100, 150) ') :
+        elec_DT = rep.get(obj)
+        elec_LT = 1-elec_DT
+        fout.write('\nROC2 OG 6 GeV Electronic Live Time (100, 150) (%): ')
+        fout.write(str(elec_LT))
+    else :
+        fout.write(obj + ' : ' + rep.text(obj) + '\n')
+COIN_LT = 100-(COIN_ACC / COIN_RAW)
 fout.write('\nComputer Live Time for COIN Trigger (%): ')
 fout.write(str(COIN_LT))
-f.close()
 
 shms_file = '../MON_OUTPUT/REPORT/reportMonitor_shms_%s_50000.txt' % (runNo)
 f    = open(shms_file)
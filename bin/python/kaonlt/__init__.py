@@ -18,6 +18,15 @@ import uproot as up
 import time, math, sys
 
 from .kaonlt import pyDict, pyBranch, pyPlot, pyRoot, pyEquation
+from .store import pyStore
+from .scaler import pyScaler, pyScalerTable
+from .report import pyReport
+from .param import pyParam
+from .subtract import pySubtract
+from .binning import pyBinning
+from .stats import pyStats
+from .scan import pyScan
+from .bootstrap import pyBootstrap
 
 __version__ = '0.5.0'
 __author__ = 'trottar'
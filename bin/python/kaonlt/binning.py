@@ -0,0 +1,76 @@
+#! /usr/bin/python
+
+#
+# Description: Kinematic binning (e.g. t-phi or Q2-W grids), the bin of every event is found once and yields are summed per bin
+'''
+sys.path.insert(0, 'path_to/bin/python/')
+import kaonlt as klt
+
+b = klt.pyBinning.uniform(("t", 5, 0.0, 1.0), ("phi", 8, 0.0, 2*np.pi))
+idx = b.index(-MandelT, np.mod(ph_q, 2*np.pi)) # Flat bin number of each event, -1 outside the grid
+b.count(idx, promptMask) # Number of events in each bin
+b.accumulate(idx, w) # (sum of weights, sum of squared weights) in each bin
+b.table() # Dataframe with the bin numbers and edges of each axis, one row per bin in the same order
+'''
+
+import numpy as np
+import pandas as pd
+import sys
+
+'''
+This class holds the bin edges of each axis of a grid. The bins of every event are found with a binary search on each
+axis and combined into one flat bin number, so anything summed per bin afterwards is a single np.bincount over the
+events. Bins are closed at the low edge and open at the high edge, events outside any axis (or NaN) get -1.
+'''
+class pyBinning():
+
+    def __init__(self, axes):
+        # axes is [(name, bin edges)], the last axis varies fastest in the flat bin number
+        self.names = [name for (name, edges) in axes]
+        self.edges = [np.asarray(edges, dtype=float) for (name, edges) in axes]
+        self.shape = tuple(len(edges)-1 for edges in self.edges)
+        self.nBins = int(np.prod(self.shape))
+
+    # Grid of equal width bins, each axis given as (name, nBins, low, high)
+    @classmethod
+    def uniform(cls, *axes):
+        return cls([(name, np.linspace(low, high, int(nBins)+1)) for (name, nBins, low, high) in axes])
+
+    def __len__(self):
+        return self.nBins
+
+    # Flat bin number of every event, values are given in the same order as the axes
+    def index(self, *values):
+        if len(values) != len(self.edges):
+            print("!!!!! ERROR !!!!!\n %i values given for a %i axis grid (%s)\n!!!!! ERROR !!!!!" % (len(values), len(self.edges), ",".join(self.names)))
+            sys.exit(2)
+        idx = np.zeros(len(values[0]), dtype=np.int64)
+        inside = np.ones(len(values[0]), dtype=bool)
+        for edges, value in zip(self.edges, values):
+            # NaN sorts after every edge so it falls out with the overflow
+            i = np.searchsorted(edges, np.asarray(value, dtype=float), side="right")-1
+            inside &= (i >= 0) & (i < len(edges)-1)
+            idx = idx*(len(edges)-1) + i
+        return np.where(inside, idx, -1)
+
+    # Number of events in each bin, optionally only the events in mask
+    def count(self, idx, mask=None):
+        if mask is not None:
+            idx = idx[mask]
+        return np.bincount(idx[idx >= 0], minlength=self.nBins)
+
+    # Sum of the weights and of the squared weights in each bin
+    def accumulate(self, idx, w):
+        inside = idx >= 0
+        w = np.asarray(w, dtype=float)[inside]
+        idx = idx[inside]
+        return (np.bincount(idx, weights=w, minlength=self.nBins), np.bincount(idx, weights=w*w, minlength=self.nBins))
+
+    # Bin number, low and high edge on each axis for every flat bin
+    def table(self):
+        table = pd.DataFrame({"Bin" : np.arange(self.nBins)})
+        for name, edges, axis in zip(self.names, self.edges, np.unravel_index(np.arange(self.nBins), self.shape)):
+            table["%s_Bin" % name] = axis
+            table["%s_Low" % name] = edges[axis]
+            table["%s_High" % name] = edges[axis+1]
+        return table
@@ -0,0 +1,128 @@
+#! /usr/bin/python
+
+#
+# Description: Bootstrap uncertainties from Poisson(1) event weights, every replica evaluated at once
+'''
+sys.path.insert(0, 'path_to/bin/python/')
+import kaonlt as klt
+
+b = klt.pyBootstrap(nReplicas=200, seed=runNum, chunkSize=10000, processes=None) # processes=N for a pool of N workers
+b.weights(start, stop) # Poisson(1) weights of events start to stop, one column per replica
+b.sums(X) # Sum of each column of X (events x quantities) in every replica, (replicas x quantities)
+b.yields(w, masks) # Weighted yield of each selection in every replica
+b.subtract(prompt, random, -1/nWindows) # Prompt minus random yield of each selection in every replica
+b.ratio(passed, total) # Efficiency passed/total in every replica
+klt.pyBootstrap.error(replicas) # Bootstrap error, the spread of the replicas
+klt.pyBootstrap.interval(replicas) # Central 68% of the replicas
+'''
+
+import numpy as np
+import multiprocessing
+import math
+
+from .stats import pyStats
+
+# Cumulative distribution of Poisson(1) up to 20, beyond the precision of a double
+_cdf = np.cumsum([math.exp(-1)/math.factorial(k) for k in range(20)])
+
+# Weights of the events in chunk number chunk (chunkSize events each, counted from the first event of the run). Drawn by
+# inverting the Poisson(1) distribution on uniform numbers, about twice as fast as RandomState.poisson
+def _chunk_weights(seed, nReplicas, chunkSize, chunk):
+    u = np.random.RandomState([seed, chunk]).random_sample(chunkSize*nReplicas)
+    return np.searchsorted(_cdf, u, side="right").reshape(chunkSize, nReplicas).astype(float)
+
+# Replica sums of the columns of X, the events start to start+len(X). Only one chunk of weights is held at a time.
+# A module function so it can be sent to the workers of a pool.
+def _sums(seed, nReplicas, chunkSize, start, X):
+    total = np.zeros((nReplicas, X.shape[1]))
+    stop = start + len(X)
+    chunk = start // chunkSize
+    while chunk*chunkSize < stop:
+        low = max(start, chunk*chunkSize)
+        high = min(stop, (chunk+1)*chunkSize)
+        W = _chunk_weights(seed, nReplicas, chunkSize, chunk)[low-chunk*chunkSize:high-chunk*chunkSize]
+        total += W.T.dot(X[low-start:high-start])
+        chunk += 1
+    return total
+
+'''
+This class gives every event a Poisson(1) weight in each of nReplicas bootstrap replicas, so any sum over the
+events becomes one matrix product (replicas x events).(events x quantities) and the spread of the replicas is the
+statistical error. Weights are drawn chunkSize events at a time, each chunk seeded from (seed, chunk number), so an
+event always gets the same weights whichever way the events are split up (chunked reading, pool workers) and
+only chunkSize x nReplicas weights are held in memory. start is the number of the first event given.
+'''
+class pyBootstrap():
+
+    def __init__(self, nReplicas=200, seed=0, chunkSize=10000, processes=None):
+        self.nReplicas = int(nReplicas)
+        self.seed = int(seed)
+        self.chunkSize = int(chunkSize)
+        self.processes = processes
+
+    def weights(self, start, stop):
+        if stop <= start:
+            return np.zeros((0, self.nReplicas))
+        first = start // self.chunkSize
+        W = np.concatenate([_chunk_weights(self.seed, self.nReplicas, self.chunkSize, chunk) for chunk in range(first, (stop-1)//self.chunkSize+1)])
+        return W[start-first*self.chunkSize:stop-first*self.chunkSize]
+
+    def sums(self, X, start=0):
+        X = np.asarray(X, dtype=float)
+        if X.ndim == 1:
+            X = X[:,np.newaxis]
+        if self.processes is None or len(X) <= self.chunkSize:
+            return _sums(self.seed, self.nReplicas, self.chunkSize, start, X)
+        # Split on chunk boundaries so no chunk of weights is drawn by two workers
+        step = int(np.ceil(float(len(X))/(self.processes*self.chunkSize)))*self.chunkSize
+        bounds = [0] + [b-start for b in range((start//step+1)*step, start+len(X), step)] + [len(X)]
+        pool = multiprocessing.Pool(self.processes)
+        try:
+            parts = pool.starmap(_sums, [(self.seed, self.nReplicas, self.chunkSize, start+low, X[low:high]) for (low, high) in zip(bounds[:-1], bounds[1:])])
+        finally:
+            pool.close()
+            pool.join()
+        return sum(parts)
+
+    # Weighted yield sum(w) of the events in each mask (all events if masks is None), (replicas x masks)
+    def yields(self, w, masks=None, start=0):
+        w = np.asarray(w, dtype=float)
+        if masks is None:
+            return self.sums(w, start)
+        masks = np.asarray(masks, dtype=float)
+        if masks.ndim == 1:
+            masks = masks[:,np.newaxis]
+        return self.sums(masks*w[:,np.newaxis], start)
+
+    # Prompt minus scaled random yield, prompt and random are masks (events, or events x selections). As the replicas are
+    # sums they can be added up over chunks of a run
+    def subtract(self, prompt, random, randomWeight, start=0):
+        prompt = np.asarray(prompt, dtype=float)
+        random = np.asarray(random, dtype=float)
+        if prompt.ndim == 1:
+            prompt = prompt[:,np.newaxis]
+            random = random[:,np.newaxis]
+        S = self.sums(np.hstack((prompt, random)), start)
+        nSel = prompt.shape[1]
+        return S[:,:nSel] + np.asarray(randomWeight)*S[:,nSel:]
+
+    # Efficiency passed/total, masks (events, or events x efficiencies)
+    def ratio(self, passed, total, start=0):
+        passed = np.asarray(passed, dtype=float)
+        total = np.asarray(total, dtype=float)
+        if passed.ndim == 1:
+            passed = passed[:,np.newaxis]
+            total = total[:,np.newaxis]
+        S = self.sums(np.hstack((passed, total)), start)
+        nEff = passed.shape[1]
+        return pyStats.ratio(S[:,:nEff], S[:,nEff:])
+
+    # Standard deviation of the replicas of each quantity
+    @classmethod
+    def error(cls, replicas):
+        return np.std(replicas, axis=0, ddof=1)
+
+    # Central interval holding cl of the replicas of each quantity, (low, high)
+    @classmethod
+    def interval(cls, replicas, cl=0.6827):
+        return (np.nanpercentile(replicas, 50*(1-cl), axis=0), np.nanpercentile(replicas, 50*(1+cl), axis=0))
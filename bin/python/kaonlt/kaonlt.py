@@ -63,6 +63,10 @@ cutDict = make_cutDict("cut2",cutDict)
 # To apply cuts to array...
 c.add_cut(array,"cut#")
 
+# Kinematics on whole arrays, e.g. missing mass and -t of every event as a kaon when the replay assumed a pion
+MMK = klt.pyEquation.missmass(emiss, pmiss, P_gtr_p, "kaon", "pion")
+t = klt.pyEquation.mandelT(emiss, pmiss, P_gtr_p, "kaon", "pion")
+
 '''
 # ================================================================
 # Time-stamp: "2020-05-02 15:00:37 trottar"
@@ -95,6 +99,8 @@ import pandas as pd
 from csv import DictReader
 import time, math, sys, subprocess
 
+from .param import pyParam
+
 # garbage collector
 import gc
 gc.collect()
@@ -162,13 +168,77 @@ class pyRoot():
             print("\nERROR 1: Only current accepting 1D array/list values\n")
 
 '''            
-This class stores a variety of equations often used in the KaonLT analysis procedure
+This class stores a variety of equations often used in the KaonLT analysis procedure. Everything works on whole
+arrays (one entry per event) as well as single values. emiss and pmiss are the energy and momentum of the missing
+system from the replay, which assumes one mass (kin) for the SHMS particle. Giving a different hypothesis (hyp) swaps
+the energy of the SHMS particle, E(P_gtr_p, kin) -> E(P_gtr_p, hyp), as the old list comprehensions in the archived
+Pionyield.py did.
 '''
 class pyEquation():
 
-    # Define missing mass calculation
-    def missmass():
-        print("missmass")
+    # Particle masses (GeV/c^2)
+    masses = {"electron" : 0.00051099895, "pion" : 0.13957018, "kaon" : 0.493677, "proton" : 0.93828}
+
+    # Mass of a particle given by name (as in masses) or directly as a number
+    @classmethod
+    def mass(cls,particle):
+        if isinstance(particle, str):
+            try:
+                return cls.masses[particle.lower()]
+            except KeyError:
+                print("!!!!! ERROR !!!!!\n Unknown particle %s, expected one of %s\n!!!!! ERROR !!!!!" % (particle, ",".join(cls.masses)))
+                sys.exit(2)
+        return particle
+
+    # Energy of a particle with momentum p
+    @classmethod
+    def energy(cls,p,particle):
+        m = cls.mass(particle)
+        return np.sqrt(p*p + m*m)
+
+    # Velocity (beta) of a particle with momentum p, e.g. the expected P_gtr_beta of each hypothesis
+    @classmethod
+    def beta(cls,p,particle):
+        return p/cls.energy(p,particle)
+
+    # Missing energy with the SHMS particle taken as hyp rather than the kin assumed by the replay
+    @classmethod
+    def swap_emiss(cls,emiss,P_gtr_p,hyp,kin):
+        if hyp == kin:
+            return emiss
+        return emiss + cls.energy(P_gtr_p,kin) - cls.energy(P_gtr_p,hyp)
+
+    # Define missing mass calculation, sqrt(|E^2 - p^2|) of the missing system (for the hyp hypothesis if given)
+    @classmethod
+    def missmass(cls,emiss,pmiss,P_gtr_p=None,hyp=None,kin=None):
+        if hyp is not None:
+            emiss = cls.swap_emiss(emiss,P_gtr_p,hyp,kin)
+        return np.sqrt(np.abs(emiss*emiss - pmiss*pmiss))
+
+    # Missing mass under several hypotheses at once, {hypothesis : missing mass}. The SHMS particle energies are
+    # computed for every hypothesis in one broadcast (shape (number of hypotheses, number of events))
+    @classmethod
+    def missmass_all(cls,emiss,pmiss,P_gtr_p,kin,hyps=("pion","kaon","proton")):
+        m = np.array([cls.mass(hyp) for hyp in hyps])[:,np.newaxis]
+        p = np.asarray(P_gtr_p)[np.newaxis,:]
+        em = np.asarray(emiss)[np.newaxis,:] + cls.energy(p,kin) - np.sqrt(p*p + m*m)
+        mm = np.sqrt(np.abs(em*em - np.asarray(pmiss)[np.newaxis,:]**2))
+        return dict(zip(hyps, mm))
+
+    # Mandelstam t, (p_missing - p_target)^2 with the target at rest
+    @classmethod
+    def mandelT(cls,emiss,pmiss,P_gtr_p=None,hyp=None,kin=None,target="proton"):
+        if hyp is not None:
+            emiss = cls.swap_emiss(emiss,P_gtr_p,hyp,kin)
+        Mt = cls.mass(target)
+        return (emiss - Mt)*(emiss - Mt) - pmiss*pmiss
+
+    # Mandelstam u, (p_target - p_SHMS)^2 with the target at rest
+    @classmethod
+    def mandelU(cls,P_gtr_p,hyp,target="proton"):
+        Mt = cls.mass(target)
+        m = cls.mass(hyp)
+        return Mt*Mt + m*m - 2*Mt*cls.energy(P_gtr_p,hyp)
 
 '''
 This is the most extensive class of the kaonlt package. This class will perform many required tasks
@@ -181,6 +251,8 @@ class pyPlot(pyDict):
         self.REPLAYPATH = REPLAYPATH
         self.cutDict = cutDict
         self.DEBUG = DEBUG
+        # Combined masks already evaluated by mask(), {cut : boolean array}
+        self.masks = {}
 
     # A method for defining a bin. This may be called in any matplotlib package plots.
     # This will calculate a suitable bin width and use that to equally distribute the bin size
@@ -207,38 +279,31 @@ class pyPlot(pyDict):
 
         return arrPlot
 
-    def cut_RF(self,runNum,MaxEvent):
+    # Distance (in ns) of each event from the RF bunch, (RF time - hodoscope start time + RF offset) modulo the bunch spacing.
+    # The bunch spacing and offset come from Timing_Parameters.csv. If a namespace (e.g. globals()) is given the result is
+    # added to it as P_RF_Dist so the RF cuts (e.g. coin_time.SHMS_Pi_RF) can be evaluated in make_cutDict. Pass e_tree to
+    # reuse an already open event tree.
+    def cut_RF(self,runNum,MaxEvent,namespace=None,e_tree=None):
         TimingCutFile = self.REPLAYPATH+'/UTIL_PION/DB/PARAM/Timing_Parameters.csv'
-        # rootName = "/lustre19/expphy/volatile/hallc/c-pionlt/sjdkay/ROOTfiles/Proton_Analysis/Pass3/Proton_coin_replay_production_%s_%s.root" % (self.REPLAYPATH, runNum, MaxEvent)
-        rootName = "%s/UTIL_PION/ROOTfiles/coin_replay_Full_Lumi_%s_%s.root" % (self.REPLAYPATH,runNum,MaxEvent)
-        e_tree = up.open(rootName)["T"]
-        TimingCutf = open(TimingCutFile)
-        PromptPeak = [0, 0, 0]
-        linenum = 0 # Count line number we're on
-        TempPar = -1 # To check later
-        for line in TimingCutf: # Read all lines in the cut file
-            linenum += 1 # Add one to line number at start of loop
-            if(linenum > 1): # Skip first line
-                line = line.partition('#')[0] # Treat anything after a # as a comment and ignore it
-                line = line.rstrip()
-                array = line.split(",") # Convert line into an array, anything after a comma is a new entry
-                if(int(runNum) in range (int(array[0]), int(array[1])+1)): # Check if run number for file is within any of the ranges specified in the cut file
-                    TempPar += 2 # If run number is in range, set to non -1 value
-                    BunchSpacing = float(array[2]) # Bunch spacing in ns
-                    RF_Offset = float(array[9]) # Offset for RF timing cut
-        TimingCutf.close() # After scanning all lines in file, close file
-        if(TempPar == -1): # If value is still -1, run number provided didn't match any ranges specified so exit
-            print("!!!!! ERROR !!!!!\n Run number specified does not fall within a set of runs for which cuts are defined in %s\n!!!!! ERROR !!!!!" % TimingCutFile)
-            sys.exit(3)
-        elif(TempPar > 1):
+        if e_tree is None:
+            rootName = "%s/UTIL_PION/ROOTfiles/coin_replay_Full_Lumi_%s_%s.root" % (self.REPLAYPATH,runNum,MaxEvent)
+            e_tree = up.open(rootName)["T"]
+        TimingParam = pyParam.cached(TimingCutFile)
+        if(TimingParam.matches([int(runNum)])[0] > 1):
             print("!!! WARNING!!! Run number was found within the range of two (or more) line entries of %s !!! WARNING !!!" % TimingCutFile)
             print("The last matching entry will be treated as the input, you should ensure this is what you want")
+        BunchSpacing = TimingParam.get(int(runNum),"Bunch_Spacing") # Bunch spacing in ns
+        RF_Offset = TimingParam.get(int(runNum),"RF_Offset") # Offset for RF timing cut
         P_RF_tdcTime = e_tree.array("T.coin.pRF_tdcTime")
         P_hod_fpHitsTime = e_tree.array("P.hod.fpHitsTime")
-        RF_CutDist = np.array([ ((RFTime-StartTime + RF_Offset)%(BunchSpacing)) for (RFTime, StartTime) in zip(P_RF_tdcTime, P_hod_fpHitsTime)]) # In python x % y is taking the modulo y of x
+        RF_CutDist = np.mod(P_RF_tdcTime-P_hod_fpHitsTime+RF_Offset, BunchSpacing) # Same as python x % y, the result takes the sign of y
+        if namespace is not None:
+            namespace["P_RF_Dist"] = RF_CutDist
+        return RF_CutDist
 
-    # This method reads in the CUTS and converts them to a dictionary. 
-    def read_dict(self,fout,runNum):
+    # This method reads in the CUTS and converts them to a dictionary. Any parameter in keep (e.g. "pid.P_kcut_P_hgcer")
+    # is left in the cuts as it is rather than replaced by its value (see search_DB)
+    def read_dict(self,fout,runNum,keep=()):
 
         # Open run type cuts of interest
         f = open(fout)
@@ -322,7 +387,7 @@ class pyPlot(pyDict):
                                         if (self.DEBUG):
                                             print("cuts",cuts)
                                         # Grabs parameters from DB (see below)
-                                        db_cut = self.search_DB(cuts,runNum)
+                                        db_cut = self.search_DB(cuts,runNum,keep)
                                         if (self.DEBUG):
                                             print(typName, " already found!!!!")
                                         cutDict[typName] += ","+db_cut
@@ -332,7 +397,7 @@ class pyPlot(pyDict):
                                     if (self.DEBUG):
                                         print("cuts",cuts)
                                     # Grabs parameters from DB (see below)
-                                    db_cut = self.search_DB(cuts,runNum)
+                                    db_cut = self.search_DB(cuts,runNum,keep)
                                     cutName = {typName : db_cut}
                                     cutDict.update(cutName)
                                     # print(lplus[0],"++>",cutDict[typName])
@@ -397,7 +462,7 @@ class pyPlot(pyDict):
                                         # Check which cut matches the one wanted to be removed
                                         if leafminus in remove:
                                             # Grabs parameters from DB (see below)
-                                            remove = self.search_DB(remove,runNum)
+                                            remove = self.search_DB(remove,runNum,keep)
                                             if (self.DEBUG):
                                                 print("Removing... ",remove)
                                             # Replace unwanted cut with blank string
@@ -416,8 +481,8 @@ class pyPlot(pyDict):
         return cutDict
 
     # Grabs the cut parameters from the database. In essence this method simply replaces one string
-    # with another
-    def search_DB(self,cuts,runNum):
+    # with another. Parameters in keep are not replaced.
+    def search_DB(self,cuts,runNum,keep=()):
 
         # Split all cuts into a list
         cuts = cuts.split(",")
@@ -430,6 +495,8 @@ class pyPlot(pyDict):
                     if "." in val:
                         tmp = val.split(")")[0]
                         tmp = tmp.split(".")[1]
+                        if ("accept."+tmp) in keep:
+                            continue
                         fout = self.REPLAYPATH+"/UTIL_PION/DB/PARAM/Acceptance_Parameters.csv"
                         try:
                             data = dict(pd.read_csv(fout))
@@ -452,6 +519,8 @@ class pyPlot(pyDict):
                     if "." in val:
                         tmp = val.split(")")[0]
                         tmp = tmp.split(".")[1]
+                        if ("track."+tmp) in keep:
+                            continue
                         fout = self.REPLAYPATH+"/UTIL_PION/DB/PARAM/Tracking_Parameters.csv"
                         try:
                             data = dict(pd.read_csv(fout))
@@ -473,6 +542,8 @@ class pyPlot(pyDict):
                     if "." in val:
                         tmp = val.split(")")[0]
                         tmp = tmp.split(".")[1]
+                        if ("CT."+tmp) in keep:
+                            continue
                         fout = self.REPLAYPATH+"/UTIL_PION/DB/PARAM/Timing_Parameters.csv"
                         try:
                             data = dict(pd.read_csv(fout))
@@ -494,6 +565,8 @@ class pyPlot(pyDict):
                     if "." in val:
                         tmp = val.split(")")[0]
                         tmp = tmp.split(".")[1]
+                        if ("pid."+tmp) in keep:
+                            continue
                         fout = self.REPLAYPATH+"/UTIL_PION/DB/PARAM/PID_Parameters.csv"
                         try:
                             data = dict(pd.read_csv(fout))
@@ -515,6 +588,8 @@ class pyPlot(pyDict):
                     if "." in val:
                         tmp = val.split(")")[0]
                         tmp = tmp.split(".")[1]
+                        if ("misc."+tmp) in keep:
+                            continue
                         fout = self.REPLAYPATH+"/UTIL_PION/DB/PARAM/Misc_Parameters.csv"
                         try:
                             data = dict(pd.read_csv(fout))
@@ -592,6 +667,36 @@ class pyPlot(pyDict):
         arr_cut = eval(applycut)        
         return arr_cut
 
+    # Boolean mask of the events passing every term of a cut, kept so each cut is only combined once. If the terms of
+    # another cut are all in this one (the same arrays, e.g. coin_epi_cut_all inside coin_epi_cut_all_RF) the mask of
+    # that cut is used and only the extra terms are ANDed onto it. Terms are only recognised as the same if they are
+    # the same array, so the analysis script should evaluate each term once (see make_cutDict in Pionyield.py).
+    def mask(self,cuts):
+
+        if cuts in self.masks:
+            return self.masks[cuts]
+        subDict = self.cutDict[cuts]
+        if len(subDict) == 0:
+            print("!!!!! ERROR !!!!!\n Cut %s has no terms\n!!!!! ERROR !!!!!" % cuts)
+            sys.exit(2)
+        # Largest other cut whose terms are a subset of this one
+        base = None
+        for key,val in self.cutDict.items():
+            if key == cuts or len(val) >= len(subDict) or (base is not None and len(val) <= len(self.cutDict[base])):
+                continue
+            if all(leaf in subDict and subDict[leaf] is arr for leaf,arr in val.items()):
+                base = key
+        if base is None:
+            extra = list(subDict.keys())
+            arr_mask = np.asarray(subDict[extra.pop(0)]).copy()
+        else:
+            extra = [leaf for leaf in subDict if leaf not in self.cutDict[base]]
+            arr_mask = self.mask(base).copy()
+        for leaf in extra:
+            arr_mask &= subDict[leaf]
+        self.masks[cuts] = arr_mask
+        return arr_mask
+
     # The array index that was evaluated in the add_cut() method calls this method. This method then
     # grabs the properly formated dictionary (from class pyDict) and outputs arrays with cuts.
     def cut(self,key,cuts=None):
@@ -0,0 +1,134 @@
+#! /usr/bin/python
+
+#
+# Description: Run range parameter tables (DB/PARAM/*.csv), loaded once and indexed on Run_Start/Run_End
+'''
+sys.path.insert(0, 'path_to/bin/python/')
+import kaonlt as klt
+
+p = klt.pyParam("<path_to>/DB/PARAM/Timing_Parameters.csv")
+p.get(runNum, "Bunch_Spacing") # Value for a single run
+p.lookup(runList) # Dataframe with one row per run (NaN where the run is not in the table)
+p.index(runList) # Table row for each run, -1 where the run is not in the table
+p = klt.pyParam.cached("<path_to>/DB/PARAM/Timing_Parameters.csv") # Same table, only loaded once per process
+'''
+
+import numpy as np
+import pandas as pd
+import os
+import sys
+
+# Loaded tables, {file name : (modification time, size, pyParam)}
+_cache = {}
+
+'''
+This class reads a parameter table where every row covers the runs Run_Start to Run_End (inclusive). The
+rows are sorted on Run_Start once so a run is found with a binary search rather than a scan of the file.
+If the ranges overlap, the last matching row of the file is used, as the line by line scans did.
+'''
+class pyParam():
+
+    def __init__(self, paramFile):
+        self.paramFile = paramFile
+        try:
+            # Anything after a # is a comment
+            self.table = pd.read_csv(paramFile, comment='#', skipinitialspace=True)
+        except IOError:
+            print("!!!!! ERROR !!!!!\n %s not found\n!!!!! ERROR !!!!!" % paramFile)
+            sys.exit(2)
+        self.table.columns = [col.strip() for col in self.table.columns]
+        self.start = self.table["Run_Start"].values.astype(np.int64)
+        self.end = self.table["Run_End"].values.astype(np.int64)
+        self.order = np.argsort(self.start, kind="mergesort")
+        self.sorted_start = self.start[self.order]
+        self.sorted_end = self.end[self.order]
+        self.overlap = bool(np.any(self.sorted_start[1:] <= np.maximum.accumulate(self.sorted_end)[:-1]))
+
+    # The table for paramFile, only read again if the file has changed since it was last loaded
+    @classmethod
+    def cached(cls, paramFile):
+        try:
+            stat = os.stat(paramFile)
+        except OSError:
+            print("!!!!! ERROR !!!!!\n %s not found\n!!!!! ERROR !!!!!" % paramFile)
+            sys.exit(2)
+        entry = _cache.get(paramFile)
+        if entry is None or entry[0] != stat.st_mtime or entry[1] != stat.st_size:
+            entry = (stat.st_mtime, stat.st_size, cls(paramFile))
+            _cache[paramFile] = entry
+        return entry[2]
+
+    def __len__(self):
+        return len(self.table)
+
+    # Table row of each run, -1 where no range covers the run
+    def index(self, runs):
+        runs = np.atleast_1d(np.asarray(runs, dtype=np.int64))
+        if self.overlap:
+            # Ranges overlap so more than one row can match, take the last one in the file
+            match = (self.start[np.newaxis,:] <= runs[:,np.newaxis]) & (runs[:,np.newaxis] <= self.end[np.newaxis,:])
+            last = len(self.start)-1-np.argmax(match[:,::-1], axis=1)
+            return np.where(match.any(axis=1), last, -1)
+        i = np.searchsorted(self.sorted_start, runs, side="right")-1
+        found = (i >= 0) & (runs <= self.sorted_end[np.maximum(i, 0)])
+        return np.where(found, self.order[np.maximum(i, 0)], -1)
+
+    # Number of rows covering each run, every row that starts at or before the run minus those that end before it
+    def matches(self, runs):
+        runs = np.atleast_1d(np.asarray(runs, dtype=np.int64))
+        return np.searchsorted(self.sorted_start, runs, side="right") - np.searchsorted(np.sort(self.end), runs, side="left")
+
+    # Parameters for each run as a dataframe, rows for runs not in the table are NaN
+    def lookup(self, runs, columns=None):
+        idx = self.index(runs)
+        if columns is None:
+            columns = list(self.table.columns)
+        table = self.table[columns].iloc[np.maximum(idx, 0)].reset_index(drop=True).astype(float)
+        table.loc[idx < 0, :] = np.nan
+        return table
+
+    # Value of a parameter for a single run
+    def get(self, runNum, column):
+        idx = self.index([runNum])[0]
+        if idx < 0:
+            print("!!!!! ERROR !!!!!\n Run number specified does not fall within a set of runs for which cuts are defined in %s\n!!!!! ERROR !!!!!" % self.paramFile)
+            sys.exit(3)
+        return self.table[column].values[idx]
+
+    # Non-overlapping ranges covering exactly the runs the table covers, each with the row that wins for those runs
+    def flatten(self):
+        bounds = np.unique(np.concatenate((self.start, self.end+1)))
+        idx = self.index(bounds[:-1])
+        keep = idx >= 0
+        table = self.table.iloc[idx[keep]].reset_index(drop=True)
+        table["Run_Start"] = bounds[:-1][keep]
+        table["Run_End"] = bounds[1:][keep]-1
+        return table
+
+    # Merge neighbouring ranges whose parameters agree, tolerance is {column : largest allowed difference} and default is
+    # used for any column not listed. By default only ranges with no runs between them are merged, so runs missing from
+    # the table stay missing. Set maxGap to also merge across gaps of up to maxGap runs (None for no limit).
+    # Every row is compared to the first row of its range so the values can't drift along a long chain of merges,
+    # the merged range takes the mean of its rows (integer columns keep the value of the first row).
+    def compact(self, tolerance=None, default=0, maxGap=0):
+        if tolerance is None:
+            tolerance = {}
+        table = self.flatten()
+        columns = [col for col in table.columns if col not in ("Run_Start", "Run_End")]
+        tol = np.array([tolerance.get(col, default) for col in columns], dtype=float) + 1e-9
+        values = table[columns].values.astype(float)
+        gaps = table["Run_Start"].values[1:] - table["Run_End"].values[:-1] - 1
+        groups = np.zeros(len(table), dtype=int)
+        first = 0
+        for i in range(1, len(table)):
+            if (maxGap is not None and gaps[i-1] > maxGap) or np.any(np.abs(values[i]-values[first]) > tol):
+                first = i
+            groups[i] = groups[i-1] + (first == i)
+        grouped = table.groupby(groups)
+        compact = grouped[columns].mean().round(3)
+        for col in columns:
+            if table[col].dtype.kind in "iu":
+                compact[col] = grouped[col].first()
+        compact["Run_Start"] = grouped["Run_Start"].min()
+        compact["Run_End"] = grouped["Run_End"].max()
+        return compact[list(self.table.columns)].reset_index(drop=True)
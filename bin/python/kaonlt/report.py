@@ -0,0 +1,159 @@
+#! /usr/bin/python
+
+#
+# Description: Parser for the replay report files (and anything else written as "label : value" or
+#              "label = value" lines). Each file is parsed once, the result is kept in a cache database
+#              next to the reports until the file is modified.
+'''
+sys.path.insert(0, 'path_to/bin/python/')
+import kaonlt as klt
+
+rep = klt.pyReport("<path_to>/replay_coin_Lumi_<run>_-1.report") # cache=False to always parse the file
+current = rep.get("SHMS BCM4A Beam Cut Current") # First number on the line
+rate = rep.get("SHMS_pTRIG3 Pre-triggers", 1) # Second number on the line (the rate in [ ... kHz ])
+PS1 = rep.ps_factor(1) # Prescale factor for trigger 1, 0 if the trigger was disabled
+'''
+
+import re
+import os
+import sys
+import json
+import sqlite3
+
+# Cache database written in the directory of the reports, shared by every process reading them
+cacheName = ".report_cache.db"
+
+_number = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?|[-+]?(?:nan|inf)", re.IGNORECASE)
+_space = re.compile(r"\s+")
+
+# Prescale factors written in the report and the value set in the DAQ for each
+psActual = [-1,1,2,3,5,9,17,33,65,129,257,513,1025,2049,4097,8193,16385,32769]
+psValue = [-1,0,1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16]
+
+'''
+This class reads a report file in a single pass. Every line with a ":" or "=" is split at the first one,
+the label (whitespace collapsed) maps to the raw text after it and every number found in that text.
+If a label appears more than once the last line is kept, as the old line by line scans did.
+The parsed mapping is stored as JSON in an SQLite database next to the reports, keyed by the path, modification
+time and size of the file, so reading the same reports again (another run list, another job) skips the parsing.
+Only text and numbers are read back from the cache, nothing in it is executed.
+The database is opened in WAL mode as in pyStore so batch jobs can share it. If it cannot be written (e.g. a
+read only directory) the file is just parsed.
+'''
+class pyReport():
+
+    def __init__(self, fname, cache=True):
+        self.fname = fname
+        try:
+            stat = os.stat(fname)
+        except OSError:
+            print("!!!!! ERROR !!!!!\n Report file %s not found\n!!!!! ERROR !!!!!" % fname)
+            sys.exit(1)
+        self.data = None
+        if cache:
+            self.data = self.load(stat)
+        if self.data is None:
+            self.data = self.parse(fname)
+            if cache:
+                self.save(stat)
+
+    # Connection to the cache database of the directory the report is in
+    def connect(self, timeout=60.0):
+        conn = sqlite3.connect(os.path.join(os.path.dirname(os.path.abspath(self.fname)), cacheName), timeout=timeout)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS "reports" ("path" TEXT PRIMARY KEY, "mtime" REAL, "size" INTEGER, "data" TEXT)')
+        return conn
+
+    # Parsed mapping from the cache, None if the file is not there or has been modified since
+    def load(self, stat):
+        try:
+            conn = self.connect()
+            row = conn.execute('SELECT "mtime", "size", "data" FROM "reports" WHERE "path" = ?', (os.path.abspath(self.fname),)).fetchone()
+            conn.close()
+        except sqlite3.Error:
+            return None
+        if row is None or row[0] != stat.st_mtime or row[1] != stat.st_size:
+            return None
+        # An entry that can't be read is parsed again and overwritten
+        try:
+            return {key : (val[0], [float(x) for x in val[1]]) for key, val in json.loads(row[2]).items()}
+        except (ValueError, TypeError, AttributeError, IndexError):
+            return None
+
+    def save(self, stat):
+        try:
+            conn = self.connect()
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO "reports" VALUES (?, ?, ?, ?)', (os.path.abspath(self.fname), stat.st_mtime, stat.st_size, json.dumps(self.data)))
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    @staticmethod
+    def label(key):
+        return _space.sub(" ", key).strip()
+
+    def parse(self, fname):
+        data = {}
+        with open(fname) as f:
+            for line in f:
+                sep = [i for i in (line.find(":"), line.find("=")) if i >= 0]
+                if not sep:
+                    continue
+                key = self.label(line[:min(sep)])
+                # Banner lines (=:=:=:) have no label
+                if not key or key.startswith("="):
+                    continue
+                text = line[min(sep)+1:].strip()
+                data[key] = (text, [float(x) for x in _number.findall(text)])
+        return data
+
+    def __contains__(self, key):
+        return self.label(key) in self.data
+
+    def __getitem__(self, key):
+        return self.get(key)
+
+    def keys(self):
+        return self.data.keys()
+
+    # Raw text after the separator
+    def text(self, key):
+        return self.data[self.label(key)][0]
+
+    # Every number on the line
+    def values(self, key):
+        return self.data[self.label(key)][1]
+
+    # The index-th number on the line, default is returned if the label or number is missing
+    def get(self, key, index=0, default=None):
+        entry = self.data.get(self.label(key))
+        if entry is None or len(entry[1]) <= index:
+            if default is None:
+                print("!!!!! ERROR !!!!!\n %s (value %i) not found in %s\n!!!!! ERROR !!!!!" % (key, index, self.fname))
+                sys.exit(1)
+            return default
+        return entry[1][index]
+
+    # Prescale factor written in the report for trigger n, a disabled trigger is written as -1 (or 0 by some replays)
+    def ps_report(self, n):
+        ps = int(self.get("Ps%i_factor" % n))
+        if ps == 0:
+            ps = -1
+        if ps not in psActual:
+            print("!!!!! ERROR !!!!!\n Ps%i_factor %i in %s is not a valid prescale\n!!!!! ERROR !!!!!" % (n, ps, self.fname))
+            sys.exit(1)
+        return ps
+
+    # Prescale factor used for trigger n, 0 if the trigger was disabled
+    def ps_factor(self, n):
+        ps = self.ps_report(n)
+        if ps == -1:
+            return 0
+        return ps
+
+    # Prescale value set in the DAQ for trigger n (-1 if the trigger was disabled)
+    def ps_value(self, n):
+        return psValue[psActual.index(self.ps_report(n))]
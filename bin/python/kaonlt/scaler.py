@@ -0,0 +1,195 @@
+#! /usr/bin/python
+
+#
+# Description: Scaler (TSP/TSH tree) accumulation used for the charge, livetime and rate calculations
+#              Sums are kept between calls so a run that is still being replayed only needs the newly
+#              appended scaler reads to be processed.
+'''
+sys.path.insert(0, 'path_to/bin/python/')
+import kaonlt as klt
+
+s = klt.pyScaler(report_current, thres_curr)
+s.read(up.open(rootName)["TSP"]) # Only reads entries not already seen
+s.save("<path_to>/scaler_state.pkl") # Keep the running sums for the next call
+...
+s = klt.pyScaler.load("<path_to>/scaler_state.pkl", report_current, thres_curr)
+s.read(up.open(rootName)["TSP"])
+print(s.charge_sum, s.trig_sum, s.acctrig_sum)
+
+t = klt.pyScalerTable.read(up.open(rootName)["TSP"]) # Every scaler channel as one (channel, read) array
+t.group("trig") # Rows of the trigger channels
+t.channel("P.EDTM.scaler") # A single channel
+'''
+
+import numpy as np
+import pickle
+import os
+
+bcm_name = ["BCM1", "BCM2", "BCM4A", "BCM4B", "BCM4C"]
+trig_name = ["TRIG1", "TRIG2", "TRIG3", "TRIG4", "TRIG5", "TRIG6"]
+PRE_name = ["40", "100", "150", "200"]
+rate_name = ["EL_LO_LO", "EL_LO", "EL_HI", "EL_REAL", "EL_CLEAN", "STOF", "PR_HI", "PR_LO"]
+
+# Channel groups, in table order, and the tree branch of each channel
+groups = [
+    ("charge", ["P.%s.scalerCharge" % bcm for bcm in bcm_name]),
+    ("current", ["P.%s.scalerCurrent" % bcm for bcm in bcm_name]),
+    ("time", ["P.1MHz.scalerTime"]),
+    ("trig", ["P.p%s.scaler" % trig for trig in trig_name]),
+    ("acctrig", ["P.pL1ACCP.scaler"]),
+    ("PRE", ["P.pPRE%s.scaler" % pre for pre in PRE_name]),
+    ("rate", ["P.pEL_LO_LO.scaler", "P.pEL_LO.scaler", "P.pEL_HI.scaler", "P.pEL_REAL.scaler",
+              "P.pEL_CLEAN.scaler", "P.pSTOF.scaler", "P.PRHI.scaler", "P.PRLO.scaler"]),
+    ("EDTM", ["P.EDTM.scaler"]),
+]
+
+'''
+This class holds every scaler channel of a block of scaler reads as one 2D array (channel, read). The rows
+of each channel group are next to each other, so a group is a single slice of the table.
+'''
+class pyScalerTable():
+
+    branches = [branch for name, group in groups for branch in group]
+    slices = {}
+    for i, (name, group) in enumerate(groups):
+        start = sum(len(g) for n, g in groups[:i])
+        slices[name] = slice(start, start+len(group))
+    del i, name, group, start
+
+    def __init__(self, data):
+        self.data = data
+
+    # Read the scaler tree (from entrystart on) into a single array
+    @classmethod
+    def read(cls, tree, entrystart=0):
+        nEvts = max(tree.numentries-entrystart, 0)
+        data = np.empty((len(cls.branches), nEvts))
+        for i, branch in enumerate(cls.branches):
+            data[i] = tree.array(branch, entrystart=entrystart)
+        return cls(data)
+
+    # Table from a dictionary of {branch : array}
+    @classmethod
+    def from_dict(cls, chunk):
+        return cls(np.array([chunk[branch] for branch in cls.branches], dtype=float))
+
+    def __len__(self):
+        return self.data.shape[1]
+
+    # Rows of a channel group, a view on the table
+    def group(self, name):
+        return self.data[self.slices[name]]
+
+    def channel(self, branch):
+        return self.data[self.branches.index(branch)]
+
+'''
+This class keeps the running scaler sums for a run. Each call to update() takes the next block of scaler
+reads, the differences between consecutive reads are summed when the BCM current is within thres_curr
+of the report current. The last read of every channel is kept so the next block carries on where this
+one stopped.
+'''
+class pyScaler():
+
+    bcm_name = bcm_name
+    trig_name = trig_name
+    PRE_name = PRE_name
+    rate_name = rate_name
+
+    # The trigger, livetime and rate sums use the current of this bcm (BCM4A)
+    bcm_cut = 2
+
+    def __init__(self, report_current, thres_curr):
+        self.report_current = report_current
+        self.thres_curr = thres_curr
+        self.layout = list(pyScalerTable.branches)
+        self.nEntries = 0
+        self.charge_sum = np.zeros(len(self.bcm_name))
+        self.time_sum = np.zeros(len(self.bcm_name))
+        self.trig_sum = np.zeros(len(self.trig_name))
+        self.PRE_sum = np.zeros(len(self.PRE_name))
+        self.rate_sum = np.zeros(len(self.rate_name))
+        self.acctrig_sum = 0
+        self.EDTM_sum = 0
+        # Sum of the raw charge reads, used for the run average
+        self.charge_total = np.zeros(len(self.bcm_name))
+        # Last read of every channel and the last EDTM difference that passed the current cut
+        self.previous = None
+        self.EDTM_current = 0
+
+    # Read the entries of the scaler tree that have not been seen yet
+    def read(self, tree):
+        nEntries = tree.numentries
+        if nEntries < self.nEntries:
+            # The root file has been replayed again from the start
+            print("Scaler tree has %i entries, %i were already read. Starting the sums again..." % (nEntries, self.nEntries))
+            self.__init__(self.report_current, self.thres_curr)
+        if nEntries == self.nEntries:
+            return self
+        return self.update(pyScalerTable.read(tree, self.nEntries))
+
+    # Add the next block of scaler reads, either a pyScalerTable or a dictionary of {branch : array}
+    def update(self, table):
+        if isinstance(table, dict):
+            table = pyScalerTable.from_dict(table)
+        nEvts = len(table)
+        if nEvts == 0:
+            return self
+        if self.previous is None:
+            # The first read of the run is the starting point, it adds nothing to the sums
+            self.previous = table.data[:,0].copy()
+        # Difference of every read to the one before, all channels at once
+        delta = pyScalerTable(np.diff(np.concatenate((self.previous[:,np.newaxis], table.data), axis=1), axis=1))
+        mask = np.abs(table.group("current") - self.report_current) < self.thres_curr
+        self.charge_sum += np.where(mask, delta.group("charge"), 0).sum(axis=1)
+        self.time_sum += np.where(mask, delta.group("time"), 0).sum(axis=1)
+        self.charge_total += table.group("charge").sum(axis=1)
+        cut = mask[self.bcm_cut]
+        self.trig_sum += delta.group("trig")[:,cut].sum(axis=1)
+        self.PRE_sum += delta.group("PRE")[:,cut].sum(axis=1)
+        self.rate_sum += delta.group("rate")[:,cut].sum(axis=1)
+        dEDTM = delta.group("EDTM")[0]
+        self.EDTM_sum += dEDTM[cut].sum()
+        # The accepted triggers have the EDTM removed. The EDTM difference is only updated on reads that
+        # pass the cut, so the last passing value is carried forward to the reads that do not.
+        last = np.maximum.accumulate(np.where(cut, np.arange(nEvts), -1))
+        EDTM_current = np.where(last >= 0, dEDTM[np.maximum(last, 0)], self.EDTM_current)
+        acctrig = table.group("acctrig")[0]
+        previous_acctrig = np.concatenate((self.previous[pyScalerTable.slices["acctrig"]], acctrig[:-1])) - np.concatenate(([self.EDTM_current], EDTM_current[:-1]))
+        self.acctrig_sum += ((acctrig - dEDTM) - previous_acctrig)[cut].sum()
+        self.EDTM_current = EDTM_current[-1]
+        self.previous = table.data[:,-1].copy()
+        self.nEntries += nEvts
+        return self
+
+    # Average raw charge read of a bcm over the entries read so far
+    def charge_average(self, bcm):
+        if self.nEntries == 0:
+            return 0
+        return self.charge_total[self.bcm_name.index(bcm)]/self.nEntries
+
+    def save(self, fname):
+        tmpName = "%s.tmp%i" % (fname, os.getpid())
+        with open(tmpName, "wb") as f:
+            pickle.dump(self.__dict__, f)
+        os.replace(tmpName, fname)
+
+    # Returns the saved accumulator, or a new one if there is no saved state for this current threshold and set of
+    # scaler channels. The report current of an online run changes from pass to pass, the saved sums keep the report
+    # current they were started with so every read of the run is cut on the same window. The sums only have to be
+    # started again (delete the state file) if thres_curr or the scaler channels change, a replay of the root file
+    # from the start is picked up by read().
+    @classmethod
+    def load(cls, fname, report_current, thres_curr):
+        s = cls(report_current, thres_curr)
+        if not os.path.isfile(fname):
+            return s
+        with open(fname, "rb") as f:
+            state = pickle.load(f)
+        if state["thres_curr"] != thres_curr or state.get("layout") != s.layout:
+            print("Saved scaler sums in %s use a different current threshold or scaler channels, starting the sums again..." % fname)
+            return s
+        s.__dict__.update(state)
+        if s.report_current != report_current:
+            print("Report current is now %.3f uA, the saved scaler sums carry on cutting around %.3f uA" % (report_current, s.report_current))
+        return s
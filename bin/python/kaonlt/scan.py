@@ -0,0 +1,114 @@
+#! /usr/bin/python
+
+#
+# Description: Yields over a grid of cut parameter values (systematic cut scans) in one pass over the events
+'''
+sys.path.insert(0, 'path_to/bin/python/')
+import kaonlt as klt
+
+s = klt.pyScan.uniform(("pid.P_ecut_P_hgcer", 0.5, 3.0, 26), ("pid.H_hadcut_H_cal", 0.5, 0.9, 5))
+scanDict = c.read_dict(fout, runNum, keep=s.names) # Cuts with the scanned parameters left as names
+term, matched = klt.pyScan.relax(term, "pid.P_ecut_P_hgcer") # Cut term with the comparisons to the parameter always passing, and the (leaf, operator) of each
+lo, hi = s.interval(0, P_hgcer_npeSum, ">") # Grid points along axis 0 each event passes, lo <= point < hi
+s.count([lo0, lo1], [hi0, hi1], w) # Sum of w over the passing events at every grid point
+s.table() # Dataframe with the parameter values of every grid point, in the same order
+'''
+
+import numpy as np
+import pandas as pd
+import itertools
+import re
+import sys
+
+# Left hand side of a comparison in the cuts files, a leaf or abs(leaf-1) (beta cuts), and the comparison operator
+_lhs = r"(abs\(\w+-1\)|[A-Za-z_]\w*)\)?\s*(<=|>=|<|>)\s*"
+
+'''
+This class finds the yield at every point of a grid of cut parameter values without going back over the events
+for each point. The cuts are read with the scanned parameters kept as names (read_dict(..., keep=...)) so the
+comparisons to each parameter are found by name, whatever its value. Each is relaxed (made to always pass) so the
+rest of the cut is a single mask, then an event passing that mask passes a contiguous range of the sorted values
+along each axis, found with a binary search. Each event adds its weight to that box of grid points as +/- w at the
+2^axes corners and a cumulative sum along every axis gives the yields, so the cost is one pass over the events
+however many points there are.
+'''
+class pyScan():
+
+    def __init__(self, axes):
+        # axes is [(parameter, values)], values are sorted and the last axis varies fastest in the grid
+        self.names = [name for (name, values) in axes]
+        self.values = [np.unique(np.asarray(values, dtype=float)) for (name, values) in axes]
+        self.shape = tuple(len(values) for values in self.values)
+        self.nPoints = int(np.prod(self.shape))
+
+    # Grid of equally spaced values, each axis given as (parameter, low, high, nPoints)
+    @classmethod
+    def uniform(cls, *axes):
+        return cls([(name, np.linspace(low, high, int(nPoints))) for (name, low, high, nPoints) in axes])
+
+    def __len__(self):
+        return self.nPoints
+
+    # A cut term with every comparison to parameter (left as its name by read_dict) set to always pass, returns the new
+    # term and the (left hand side, operator) of each comparison relaxed. Any other use of the parameter can't be scanned.
+    @classmethod
+    def relax(cls, term, parameter):
+        matched = []
+        pieces = []
+        last = 0
+        for match in re.finditer(_lhs + "(" + re.escape(parameter) + r")(?!\w)", term):
+            lhs, op, name = match.groups()
+            matched.append((lhs, op))
+            pieces.append(term[last:match.start(3)])
+            pieces.append("-np.inf" if ">" in op else "np.inf")
+            last = match.end(3)
+        pieces.append(term[last:])
+        term = "".join(pieces)
+        if re.search(re.escape(parameter) + r"(?!\w)", term):
+            print("!!!!! ERROR !!!!!\n %s is used in %s other than as a comparison to a leaf, it can't be scanned\n!!!!! ERROR !!!!!" % (parameter, term))
+            sys.exit(2)
+        return (term, matched)
+
+    # Grid points along an axis passed by each value compared with op to that axis' parameter, as lo <= point < hi
+    def interval(self, axis, values, op):
+        values = np.asarray(values, dtype=float)
+        thresholds = self.values[axis]
+        nValues = np.zeros(len(values), dtype=np.int64)
+        if op == ">":
+            return (nValues, np.searchsorted(thresholds, values, side="left"))
+        elif op == ">=":
+            return (nValues, np.searchsorted(thresholds, values, side="right"))
+        elif op == "<":
+            return (np.searchsorted(thresholds, values, side="right"), nValues+len(thresholds))
+        elif op == "<=":
+            return (np.searchsorted(thresholds, values, side="left"), nValues+len(thresholds))
+        print("!!!!! ERROR !!!!!\n Unknown comparison %s\n!!!!! ERROR !!!!!" % op)
+        sys.exit(2)
+
+    # Sum of w (or the number of events) passing at each grid point, lo and hi hold the range of points each
+    # event passes along every axis
+    def count(self, lo, hi, w=None):
+        edges = tuple(n+1 for n in self.shape)
+        inside = np.ones(len(lo[0]), dtype=bool)
+        for l, h in zip(lo, hi):
+            inside &= (l < h)
+        if w is not None:
+            w = np.asarray(w, dtype=float)[inside]
+        grid = np.zeros(int(np.prod(edges)))
+        for corner in itertools.product((0, 1), repeat=len(self.shape)):
+            idx = np.zeros(inside.sum(), dtype=np.int64)
+            for axis, upper in enumerate(corner):
+                idx = idx*edges[axis] + (hi[axis] if upper else lo[axis])[inside]
+            sign = -1.0 if sum(corner) % 2 else 1.0
+            grid += sign*np.bincount(idx, weights=w, minlength=len(grid))
+        grid = grid.reshape(edges)
+        for axis in range(len(edges)):
+            grid = np.cumsum(grid, axis=axis)
+        return grid[tuple(slice(0, n) for n in self.shape)].ravel()
+
+    # Parameter values at every grid point
+    def table(self):
+        table = pd.DataFrame({"Point" : np.arange(self.nPoints)})
+        for name, values, axis in zip(self.names, self.values, np.unravel_index(np.arange(self.nPoints), self.shape)):
+            table[name] = values[axis]
+        return table
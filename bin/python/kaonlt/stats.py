@@ -0,0 +1,103 @@
+#! /usr/bin/python
+
+#
+# Description: Ratios, efficiencies, livetimes and their statistical uncertainties for arrays of counts
+'''
+sys.path.insert(0, 'path_to/bin/python/')
+import kaonlt as klt
+
+klt.pyStats.ratio(num, den, fill=0) # num/den, undefined (0/0) ratios set to fill
+klt.pyStats.stat_uncern(counts) # Relative error sqrt(N)/N
+klt.pyStats.ratio_uncern(num, den) # Error on num/den for independent Poisson counts
+klt.pyStats.binomial(passed, total) # (efficiency, error), passed is a subset of total
+klt.pyStats.bayesian(passed, total) # (mean, error) of the efficiency with a flat prior
+klt.pyStats.efficiency(passed, total, method="bayesian") # Either of the above by name
+klt.pyStats.livetime(accepted, TRIG1/PS1, TRIG3/PS3) # (computer livetime, error)
+klt.pyStats.elivetime(PRE[1], PRE[2]) # (electronic livetime, error)
+'''
+
+import numpy as np
+import sys
+
+'''
+This class holds the counting statistics used across the analysis scripts. Every method takes plain numbers, numpy
+arrays or pandas columns and broadcasts, so the efficiencies of hundreds of runs (or of many cuts, as a 2D array of
+runs by cuts) come from one call rather than a loop over len() of each selection. Pandas columns stay pandas columns.
+Division by zero gives NaN or inf instead of raising, use fill to replace the undefined (0/0) ratios.
+'''
+class pyStats():
+
+    # Replace the NaNs in a ratio, keeping pandas columns as they are
+    @classmethod
+    def fill(cls, r, fill):
+        if fill is None:
+            return r
+        if hasattr(r, "fillna"):
+            return r.fillna(fill)
+        r = np.where(np.isnan(r), fill, r)
+        return r[()] if r.ndim == 0 else r
+
+    @classmethod
+    def ratio(cls, num, den, fill=None):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return cls.fill(np.true_divide(num, den), fill)
+
+    # Relative error on a product or ratio of independent Poisson counts, sqrt(1/N1 + 1/N2 + ...)
+    @classmethod
+    def rel_uncern(cls, *counts):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.sqrt(sum(np.true_divide(1.0, n) for n in counts))
+
+    # Relative statistical error of a count, sqrt(N)/N
+    @classmethod
+    def stat_uncern(cls, counts, fill=0):
+        return cls.ratio(np.sqrt(counts), counts, fill)
+
+    # Error on num/den where both are independent Poisson counts (e.g. events after/before a tracking cut)
+    @classmethod
+    def ratio_uncern(cls, num, den, fill=None):
+        return cls.fill(cls.ratio(num, den)*cls.rel_uncern(num, den), fill)
+
+    # Efficiency of a cut passed by passed of total events, error from the binomial variance
+    @classmethod
+    def binomial(cls, passed, total, fill=None):
+        eff = cls.ratio(passed, total)
+        with np.errstate(invalid="ignore"):
+            err = np.sqrt(cls.ratio(eff*(1-eff), total))
+        return (cls.fill(eff, fill), cls.fill(err, fill))
+
+    # Mean and standard deviation of the efficiency for a flat prior, unlike the binomial error this doesn't
+    # vanish for efficiencies of 0 or 1 and stays defined when no events were seen
+    @classmethod
+    def bayesian(cls, passed, total):
+        k = np.add(passed, 1.0)
+        n = np.add(total, 2.0)
+        mean = k/n
+        var = k*(k+1)/(n*(n+1)) - mean*mean
+        with np.errstate(invalid="ignore"):
+            return (mean, np.sqrt(var))
+
+    @classmethod
+    def efficiency(cls, passed, total, method="binomial"):
+        if method == "binomial":
+            return cls.binomial(passed, total)
+        elif method == "bayesian":
+            return cls.bayesian(passed, total)
+        print("!!!!! ERROR !!!!!\n Unknown efficiency method %s, use binomial or bayesian\n!!!!! ERROR !!!!!" % method)
+        sys.exit(2)
+
+    # Computer livetime, accepted triggers over the sum of the prescaled triggers (TRIG/PS) of each spectrometer
+    # used, all counts treated as independent
+    @classmethod
+    def livetime(cls, accepted, *triggers):
+        lt = cls.ratio(accepted, sum(triggers))
+        return (lt, lt*cls.rel_uncern(accepted, *triggers))
+
+    # Electronic livetime from the pretrigger counts at the two pretrigger thresholds (PRE[1] and PRE[2]), the
+    # 6/5 accounts for the ratio of the two pretrigger widths
+    @classmethod
+    def elivetime(cls, pre, pre_dead):
+        dead = cls.ratio(np.subtract(pre, pre_dead), pre)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            err = dead*np.sqrt((np.sqrt(pre) + np.sqrt(pre_dead))/np.subtract(pre, pre_dead) + np.sqrt(pre)/pre)
+        return (1 - (6.0/5.0)*dead, err)
@@ -0,0 +1,125 @@
+#! /usr/bin/python
+
+#
+# Description: Run keyed result store for the per run analysis outputs (lumi_data, pid_data, ...)
+#              Replaces appending rows to a shared csv. Each run is stored once per analysis version
+#              so reruns replace the old row and concurrent batch jobs no longer interleave rows.
+'''
+sys.path.insert(0, 'path_to/bin/python/')
+import kaonlt as klt
+
+s = klt.pyStore("<path_to>/lumi_data.db", "lumi_data", key="run number", version=klt.__version__)
+s.upsert(data) # data is a dictionary of {column : value} for ONE run, must include the key column
+s.to_csv("<path_to>/lumi_data.csv") # Export the whole table (sorted by run number)
+lumi_data = dict(s.query()) # Same format as dict(pd.read_csv(...))
+'''
+
+import numpy as np
+import pandas as pd
+import sqlite3
+import os
+
+from .kaonlt import pyRoot
+
+'''
+This class stores one row of results per run number and analysis version in a local SQLite database.
+The database is opened in WAL mode so that many batch jobs can write to it at once, writers wait on
+each other (up to timeout seconds) rather than corrupting the file. Columns are added as they are
+first seen, so the analysis scripts do not need to define a schema.
+'''
+class pyStore():
+
+    def __init__(self, dbName, table, key="run_number", version="default", timeout=60.0):
+        self.dbName = dbName
+        self.table = table
+        self.key = key
+        self.version = str(version)
+        self.timeout = timeout
+        conn = self.connect()
+        with conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS "%s" ("%s" INTEGER NOT NULL, "version" TEXT NOT NULL, PRIMARY KEY ("%s", "version"))' % (self.table, self.key, self.key))
+        conn.close()
+
+    # Open a connection to the database, WAL allows readers while a batch job is writing
+    def connect(self):
+        conn = sqlite3.connect(self.dbName, timeout=self.timeout)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # Current columns of the table, in the order they were added
+    def columns(self, conn):
+        return [row[1] for row in conn.execute('PRAGMA table_info("%s")' % self.table)]
+
+    # Insert the results for a run, replacing any previous entry for the same run and version
+    def upsert(self, data):
+        if self.key not in data:
+            print("!!!!ERROR!!!!: Key %s not found in data to be stored in %s" % (self.key, self.dbName))
+            return
+        row = {}
+        for col, val in data.items():
+            # sqlite3 cannot adapt numpy scalars, convert to the python equivalent
+            if isinstance(val, np.generic):
+                val = val.item()
+            row[col] = val
+        row[self.key] = int(row[self.key])
+        row["version"] = self.version
+        conn = self.connect()
+        with conn:
+            # Take the write lock before checking the schema so two jobs do not add the same column
+            conn.execute("BEGIN IMMEDIATE")
+            known = self.columns(conn)
+            for col in row.keys():
+                if col not in known:
+                    conn.execute('ALTER TABLE "%s" ADD COLUMN "%s"' % (self.table, col))
+            cols = list(row.keys())
+            conn.execute('INSERT OR REPLACE INTO "%s" (%s) VALUES (%s)' % (self.table, ",".join('"%s"' % col for col in cols), ",".join("?"*len(cols))), [row[col] for col in cols])
+        conn.close()
+
+    # Returns a dataframe (sorted by run number) of the stored runs for this analysis version.
+    # Run range is inclusive, set version to None for every version.
+    def query(self, runStart=None, runEnd=None, columns=None, version="", keepVersion=False):
+        if version == "":
+            version = self.version
+        cuts = []
+        params = []
+        if version is not None:
+            cuts.append('"version" = ?')
+            params.append(version)
+        if runStart is not None:
+            cuts.append('"%s" >= ?' % self.key)
+            params.append(int(runStart))
+        if runEnd is not None:
+            cuts.append('"%s" <= ?' % self.key)
+            params.append(int(runEnd))
+        if columns:
+            select = ",".join('"%s"' % col for col in [self.key]+[col for col in columns if col != self.key])
+        else:
+            select = "*"
+        sql = 'SELECT %s FROM "%s"' % (select, self.table)
+        if cuts:
+            sql += " WHERE " + " AND ".join(cuts)
+        sql += ' ORDER BY "%s"' % self.key
+        conn = self.connect()
+        table = pd.read_sql_query(sql, conn, params=params)
+        conn.close()
+        if not keepVersion and "version" in table.columns:
+            table = table.drop(columns=["version"])
+        # Columns are kept in the same (sorted) order the old csv used
+        table = table.reindex(sorted(table.columns), axis=1)
+        return table
+
+    # Export the table to csv. The file is written next to the target and moved into place so a
+    # reader never sees a half written file.
+    def to_csv(self, csvName, **kwargs):
+        table = self.query(**kwargs)
+        tmpName = "%s.tmp%i" % (csvName, os.getpid())
+        table.to_csv(tmpName, index=False, header=True)
+        os.replace(tmpName, csvName)
+        return table
+
+    # Export the table to a root file of histograms, see pyRoot.csv2root
+    def to_root(self, rootName, **kwargs):
+        table = self.query(**kwargs)
+        pyRoot().csv2root({key : val.tolist() for key,val in dict(table).items()}, rootName)
+        return table
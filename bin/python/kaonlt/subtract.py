@@ -0,0 +1,56 @@
+#! /usr/bin/python
+
+#
+# Description: Prompt minus random (accidental) background subtraction as a weight per event
+'''
+sys.path.insert(0, 'path_to/bin/python/')
+import kaonlt as klt
+
+s = klt.pySubtract("<path_to>/DB/PARAM/Timing_Parameters.csv", runNum)
+w = s.weights(promptMask, randomMask) # +1 prompt, -1/nWindows random, 0 otherwise
+s.yields(w) # (background subtracted yield, error)
+s.histogram(MMpi, w, 220, 0.5, 1.6) # (counts, sum of squared weights, bin edges)
+'''
+
+import numpy as np
+
+from .param import pyParam
+
+'''
+This class gives every event a weight, +1 inside the prompt cointime window and -1/nWindows inside the random
+windows, so the background subtracted yield or histogram is a single weighted sum over the events rather than a
+prompt and a scaled random histogram subtracted afterwards. The random windows are nWindows bunches wide, the scale
+is 1/nWindows as in PlotPionPhysics.C. Errors come from the sum of the squared weights.
+'''
+class pySubtract():
+
+    def __init__(self, paramFile, runNum):
+        self.runNum = int(runNum)
+        self.nWindows = float(pyParam.cached(paramFile).get(self.runNum, "nWindows"))
+        self.randomWeight = -1.0/self.nWindows
+
+    # Weight of every event from the prompt and random window masks (boolean arrays of the same length)
+    def weights(self, prompt, random):
+        prompt = np.asarray(prompt, dtype=bool)
+        random = np.asarray(random, dtype=bool)
+        w = np.zeros(len(prompt))
+        w[random] = self.randomWeight
+        # An event can't be in both windows, but if the windows are set up to overlap the prompt window wins
+        w[prompt] = 1.0
+        return w
+
+    # Background subtracted yield and its error, optionally only for the events in mask
+    def yields(self, w, mask=None):
+        if mask is not None:
+            w = w[mask]
+        return (w.sum(), np.sqrt(np.sum(w*w)))
+
+    # Weighted histogram of values, returns (counts, sum of squared weights, bin edges). Only events with a
+    # non zero weight are histogrammed so the values of events outside both windows are never touched.
+    def histogram(self, values, w, nBins, low, high):
+        used = w != 0
+        values = np.asarray(values)[used]
+        w = w[used]
+        counts, edges = np.histogram(values, bins=nBins, range=(low, high), weights=w)
+        sumw2 = np.histogram(values, bins=edges, weights=w*w)[0]
+        return (counts, sumw2, edges)
@@ -0,0 +1,174 @@
+#! /usr/bin/python
+
+# Python script which finds the cointime peaks for every run in a kinematic list, runs are processed in parallel
+# For each run the peaks are fitted with FitCoinPeak.py from the CTPeak_Data rootfile, or the CTPeak_Hist rootfile if there is no CTPeak_Data file
+# If neither exists the CTPeak_Hist file (histograms only) is made with src/CoinTimePeak.py first
+# Writes KINEMATIC_Output.csv (sorted by run number) to UTIL_PION/OUTPUT/Analysis/PionLT, runs which fail are listed in Kinematics/KINEMATIC_FailedCTFit
+# The histograms and fits of each run are saved as RUNNUMBER_CTOut.pdf and .root in UTIL_PION/OUTPUT/Analysis/PionLT, as PlotCoinPeak.C did
+# Runs where only some species could be fitted are also listed as failed, they are still written to the csv with nan for those species
+# KINEMATIC_CTFitManifest.json keeps the hash of each run's CTPeak_Data rootfile and of the fit configuration with the fitted row, only runs where either changed are fitted again
+
+# Import relevant packages
+import multiprocessing as mp
+import sys, os, subprocess, traceback, hashlib, json
+
+from FitCoinPeak import fit_file, format_row, config_hash, failed_species, save_histos
+
+if (len(sys.argv)-1 < 1 or len(sys.argv)-1 > 3):
+    print("!!!!! ERROR !!!!!\n Expected 1-3 arguments\n Usage is with - KINEMATIC nProcesses(optional, default all cores) ROOTfilePrefix(optional) \n!!!!! ERROR !!!!!")
+    sys.exit(1)
+KINEMATIC = sys.argv[1]
+if (len(sys.argv)-1 > 1):
+    nProc = int(sys.argv[2])
+else:
+    nProc = mp.cpu_count()
+if (len(sys.argv)-1 > 2):
+    ROOTPrefix = sys.argv[3]
+else:
+    ROOTPrefix = "Pion_coin_replay_production"
+
+USER = subprocess.getstatusoutput("whoami") # Grab user info for file finding
+HOST = subprocess.getstatusoutput("hostname")
+if ("farm" in HOST[1]):
+    REPLAYPATH = "/group/c-pionlt/USERS/%s/hallc_replay_lt" % USER[1]
+elif ("qcd" in HOST[1]):
+    REPLAYPATH = "/group/c-pionlt/USERS/%s/hallc_replay_lt" % USER[1]
+elif ("phys.uregina" in HOST[1]):
+    REPLAYPATH = "/home/%s/work/JLab/hallc_replay_lt" % USER[1]
+elif("skynet" in HOST[1]):
+    REPLAYPATH = "/home/%s/Work/JLab/hallc_replay_lt" % USER[1]
+
+# Add more path setting as needed in a similar manner
+UTILPATH = "%s/UTIL_PION" % REPLAYPATH
+OUTPATH = "%s/OUTPUT/Analysis/PionLT" % UTILPATH
+SCRIPTPATH = "%s/scripts/CoinTimePeak" % UTILPATH
+RunListFile = "%s/Kinematics/%s" % (SCRIPTPATH, KINEMATIC)
+OutputFile = "%s/%s_Output.csv" % (OUTPATH, KINEMATIC)
+FailedFile = "%s/Kinematics/%s_FailedCTFit" % (SCRIPTPATH, KINEMATIC)
+ManifestFile = "%s/%s_CTFitManifest.json" % (OUTPATH, KINEMATIC)
+ConfigHash = config_hash()
+
+def ct_file(runNum):
+    CTFile = "%s/%s_-1_CTPeak_Data.root" % (OUTPATH, runNum)
+    if os.path.isfile(CTFile):
+        return CTFile
+    return "%s/%s_-1_CTPeak_Hist.root" % (OUTPATH, runNum)
+
+# Per run plots of the histograms and fits (without suffix)
+def ct_out(runNum):
+    return "%s/%s_CTOut" % (OUTPATH, runNum)
+
+# Size, modification time and content hash of a file, the hash of the cached entry is reused if the size and time haven't changed
+def file_entry(fname, cached=None):
+    stat = os.stat(fname)
+    if (cached is not None and cached["Size"] == stat.st_size and cached["MTime"] == stat.st_mtime):
+        return {"Size" : stat.st_size, "MTime" : stat.st_mtime, "Hash" : cached["Hash"]}
+    sha = hashlib.sha1()
+    with open(fname, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return {"Size" : stat.st_size, "MTime" : stat.st_mtime, "Hash" : sha.hexdigest()}
+
+# Cached row for a run, None if the run has to be fitted (no entry, different fit configuration, the rootfile has changed or its plots are missing)
+def cached_row(runNum, Manifest):
+    Entry = Manifest.get(str(runNum))
+    if (Entry is None or Entry["Config"] != ConfigHash or not os.path.isfile(ct_file(runNum)) or not os.path.isfile("%s.pdf" % ct_out(runNum))):
+        return None
+    CTEntry = file_entry(ct_file(runNum), Entry["CTPeak"])
+    if (CTEntry["Hash"] != Entry["CTPeak"]["Hash"]):
+        return None
+    # Same contents, keep the new size and time so the file isn't hashed again next time
+    Entry["CTPeak"] = CTEntry
+    return Entry["Row"]
+
+def write_atomic(fname, text):
+    tmpName = "%s.tmp%i" % (fname, os.getpid())
+    with open(tmpName, "w") as f:
+        f.write(text)
+    os.replace(tmpName, fname)
+
+# Message for a run where some of the peak fits failed, None if every species was fitted
+def fit_error(Row):
+    Failed = failed_species(Row.split(","))
+    if Failed:
+        return "Peak fit failed for %s" % ",".join(Failed)
+    return None
+
+# Extract (if needed) and fit the cointime peaks for one run, returns (run number, output row, error, manifest entry)
+# Any failure is caught here so a bad run can't take down the rest of the pool, the row is None if nothing could be fitted
+def process_run(runNum):
+    try:
+        CTFile = ct_file(runNum)
+        if not os.path.isfile(CTFile):
+            Extract = subprocess.Popen(["python3", "%s/src/CoinTimePeak.py" % SCRIPTPATH, ROOTPrefix, str(runNum), "-1", "Pion,Kaon,Proton", "hist"], cwd="%s/src" % SCRIPTPATH, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+            ExtractOut = Extract.communicate()[0]
+            if (Extract.returncode != 0 or not os.path.isfile(CTFile)):
+                return (runNum, None, "CoinTimePeak.py failed (exit code %i) - %s" % (Extract.returncode, ExtractOut.strip().split("\n")[-1]), None)
+        # Hash the rootfile before fitting so the manifest describes the file the fit actually read
+        CTEntry = file_entry(CTFile)
+        Row, Histos = fit_file(CTFile)
+        save_histos(Row, Histos, ct_out(runNum))
+        Row = format_row(Row)
+        Entry = {"CTPeak" : CTEntry, "Config" : ConfigHash, "Row" : Row}
+        if (len(failed_species(Row.split(","))) == len(Histos)):
+            return (runNum, None, fit_error(Row), None)
+        return (runNum, Row, fit_error(Row), Entry)
+    except Exception as e:
+        return (runNum, None, "%s\n%s" % (e, traceback.format_exc()), None)
+
+def main():
+    print("Running as %s on %s, hallc_replay_lt path assumed as %s" % (USER[1], HOST[1], REPLAYPATH))
+    if not os.path.isfile(RunListFile):
+        print("!!!!! ERROR !!!!!\n %s not found \n!!!!! ERROR !!!!!" % RunListFile)
+        sys.exit(2)
+    with open(RunListFile) as f:
+        RunList = sorted(set(int(line.strip()) for line in f if line.strip() != ""))
+    Manifest = {}
+    if os.path.isfile(ManifestFile):
+        try:
+            with open(ManifestFile) as f:
+                Manifest = json.load(f)
+        except ValueError:
+            print("!!! WARNING !!! - Could not read %s, fitting every run again - !!! WARNING !!!" % ManifestFile)
+    Rows = {}
+    Failed = {}
+    for runNum in RunList:
+        Row = cached_row(runNum, Manifest)
+        if Row is not None:
+            Rows[runNum] = Row
+            if fit_error(Row) is not None:
+                Failed[runNum] = fit_error(Row)
+    ToFit = [runNum for runNum in RunList if runNum not in Rows]
+    print("Processing %i runs from %s, %i unchanged since the last fit, fitting %i with %i processes" % (len(RunList), RunListFile, len(Rows), len(ToFit), nProc))
+    if ToFit:
+        pool = mp.Pool(processes=min(nProc, len(ToFit)))
+        try:
+            for runNum, Row, Error, Entry in pool.imap_unordered(process_run, ToFit):
+                if Row is None:
+                    Failed[runNum] = Error
+                    Manifest.pop(str(runNum), None)
+                    print("!!! WARNING !!! - Run %i failed - %s - !!! WARNING !!!" % (runNum, Error))
+                else:
+                    Rows[runNum] = Row
+                    Manifest[str(runNum)] = Entry
+                    print(Row)
+                    if Error is not None:
+                        Failed[runNum] = Error
+                        print("!!! WARNING !!! - Run %i - %s - !!! WARNING !!!" % (runNum, Error))
+        finally:
+            pool.close()
+            pool.join()
+    write_atomic(ManifestFile, json.dumps(Manifest, indent=1, sort_keys=True))
+    # Write the output to a temporary file and move it into place so a partial file is never left behind
+    write_atomic(OutputFile, "".join(Rows[runNum] + "\n" for runNum in sorted(Rows)))
+    print("%i of %i runs fitted, output written to %s" % (len([runNum for runNum in Rows if runNum not in Failed]), len(RunList), OutputFile))
+    if Failed:
+        with open(FailedFile, "w") as f:
+            for runNum in sorted(Failed):
+                f.write("%i\n" % runNum)
+        print("!!! WARNING !!! - %i runs failed, list written to %s - !!! WARNING !!!" % (len(Failed), FailedFile))
+    elif os.path.isfile(FailedFile):
+        os.remove(FailedFile)
+
+if __name__ == '__main__':
+    main()
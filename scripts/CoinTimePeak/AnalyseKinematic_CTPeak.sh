@@ -94,24 +94,10 @@ elif [ $TestingVar != 1 ]; then
 fi
 
 if [ $TestingVar == 1 ]; then
-    if [ -f "${UTILPATH}/OUTPUT/Analysis/PionLT/${KINEMATIC}_Output.csv" ]; then
-	rm "${UTILPATH}/OUTPUT/Analysis/PionLT/${KINEMATIC}_Output.csv"
-    else touch "${UTILPATH}/OUTPUT/Analysis/PionLT/${KINEMATIC}_Output.csv"
-    fi
-    while IFS='' read -r line || [[ -n "$line" ]]; do
-	runNum=$line
-	OutputFile="${UTILPATH}/OUTPUT/Analysis/PionLT/${runNum}_Out_tmp"
-	if [ -f ${OutputFile} ]; then
-	    rm ${OutputFile}
-	else touch ${OutputFile}
-	fi
-	root -b -l -q "${UTILPATH}/scripts/CoinTimePeak/PlotCoinPeak.C(\"${runNum}_-1_CTPeak_Data.root\", \"${runNum}_CTOut\")" >> ${OutputFile}
-	sleep 1
-	Data=$(sed -n "/${runNum},/p" $OutputFile)
-	echo ${Data} >> "${UTILPATH}/OUTPUT/Analysis/PionLT/${KINEMATIC}_Output.csv"
-	sleep 1
-	rm ${OutputFile}
-    done < "$RunListFile"
+    # Fits every run in the list in parallel and writes ${KINEMATIC}_Output.csv sorted by run number
+    cd "${UTILPATH}/scripts/CoinTimePeak"
+    python3 "${UTILPATH}/scripts/CoinTimePeak/AnalyseKinematic_CTPeak.py" ${KINEMATIC}
+    cd $REPLAYPATH
 fi
 
 if [ -f "${UTILPATH}/OUTPUT/Analysis/PionLT/${KINEMATIC}_Output.csv" ]; then
@@ -0,0 +1,66 @@
+#! /usr/bin/python
+
+# Python script which compacts a timing parameter file, neighbouring run ranges whose parameters agree within a tolerance are merged into a single range
+# Paramfile.py writes one row per run, after compacting each setting is typically only a handful of rows
+# Writes PARAMFILE_Compact.csv to this directory and prints how much the table shrank
+
+# Import relevant packages
+import numpy as np
+import sys, subprocess
+from os import path
+
+if (len(sys.argv)-1 < 1 or len(sys.argv)-1 > 3):
+    print("!!!!! ERROR !!!!!\n Expected 1-3 arguments\n Usage is with - ParamFile PeakTolerance(optional, ns, default 0.1) MaxGap(optional, runs, default 0, -1 for no limit) \n!!!!! ERROR !!!!!")
+    sys.exit(1)
+ParamFile = sys.argv[1]
+if (len(sys.argv)-1 > 1):
+    PeakTolerance = float(sys.argv[2])
+else:
+    PeakTolerance = 0.1
+if (len(sys.argv)-1 > 2):
+    MaxGap = int(sys.argv[3])
+    # Merging across gaps means runs that were never in the table get parameters, only do it if asked
+    if (MaxGap < 0):
+        MaxGap = None
+else:
+    MaxGap = 0
+
+USER = subprocess.getstatusoutput("whoami") # Grab user info for file finding
+HOST = subprocess.getstatusoutput("hostname")
+if ("farm" in HOST[1]):
+    REPLAYPATH = "/group/c-pionlt/USERS/%s/hallc_replay_lt" % USER[1]
+elif ("qcd" in HOST[1]):
+    REPLAYPATH = "/group/c-pionlt/USERS/%s/hallc_replay_lt" % USER[1]
+elif ("phys.uregina" in HOST[1]):
+    REPLAYPATH = "/home/%s/work/JLab/hallc_replay_lt" % USER[1]
+elif("skynet" in HOST[1]):
+    REPLAYPATH = "/home/%s/Work/JLab/hallc_replay_lt" % USER[1]
+
+# Add more path setting as needed in a similar manner
+PARAMPATH = "%s/UTIL_PION/DB/PARAM" % REPLAYPATH
+sys.path.insert(0, '%s/UTIL_PION/bin/python/' % REPLAYPATH)
+import kaonlt as klt
+
+# Accept either a file name or the name of a file in DB/PARAM without the .csv, as for Paramfile.py
+if (path.isfile(ParamFile) == False):
+    ParamFile = "%s/%s.csv" % (PARAMPATH, ParamFile)
+if (path.isfile(ParamFile) == False):
+    print("!!!!! ERROR !!!!!\n %s does not exist or is not a valid file - check 1st input arg and try again \n!!!!! ERROR !!!!!" % ParamFile)
+    sys.exit(2)
+OutFile = "%s_Compact.csv" % path.splitext(path.basename(ParamFile))[0]
+
+# Only the fitted peak positions are allowed to differ, every other parameter (offsets, windows, RF cuts) has to match exactly
+Tolerance = {"Pion_Prompt_Peak" : PeakTolerance, "Kaon_Prompt_Peak" : PeakTolerance, "Proton_Prompt_Peak" : PeakTolerance}
+Param = klt.pyParam(ParamFile)
+Compact = Param.compact(Tolerance, 0, MaxGap)
+Compact.to_csv(OutFile, index=False)
+
+# Check every run keeps its parameters to within the tolerance, a merged value is the mean of the range so it can sit up to twice the tolerance from a run at the edge of it
+Runs = np.concatenate([np.arange(Start, End+1) for Start, End in zip(Param.start, Param.end)])
+Shift = (klt.pyParam(OutFile).lookup(Runs) - Param.lookup(Runs)).abs().max()
+print("%s compacted from %i to %i rows (%.1f%% of the original), written to %s" % (ParamFile, len(Param), len(Compact), 100.0*len(Compact)/max(len(Param), 1), OutFile))
+for Peak in Tolerance:
+    print("Largest change in %s for any run - %.3f ns" % (Peak, Shift[Peak]))
+NewRuns = (Compact["Run_End"]-Compact["Run_Start"]+1).sum() - len(np.unique(Runs))
+if (NewRuns > 0):
+    print("%i runs in gaps between the original ranges are now covered by a merged range (set MaxGap to 0 to prevent this)" % NewRuns)
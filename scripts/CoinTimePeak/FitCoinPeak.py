@@ -0,0 +1,141 @@
+#! /usr/bin/python
+
+# Python replacement for PlotCoinPeak.C, histograms the cointime for each particle species from the CTPeak_Data rootfile and fits a Gaussian to the prompt peak
+# Prints the same output row as the macro - RunNumber, then PeakPos, PeakPosError, PeakFWHM, PeakFWHMError for pions, kaons and protons (nan for a species whose peak couldn't be fitted)
+# The fitting functions can also be imported by other scripts in this directory (from FitCoinPeak import fit_file)
+
+# Import relevant packages
+import uproot as up
+import numpy as np
+from scipy.optimize import curve_fit
+import sys, os, subprocess, hashlib
+
+# Species to fit - (name, tree, cointime branch), the order sets the order of the output row
+Species = [("Pion", "Pions_All", "CTime_ePiCoinTime_ROC1"),
+           ("Kaon", "Kaons_All", "CTime_eKCoinTime_ROC1"),
+           ("Proton", "Protons_All", "CTime_epCoinTime_ROC1")]
+# Histogram binning, identical to PlotCoinPeak.C
+NBins = 480
+CTMin = -60
+CTMax = 60
+
+def gaus(x, amp, mean, sigma):
+    return amp*np.exp(-0.5*((x-mean)/sigma)*((x-mean)/sigma))
+
+# Histogram the cointime values, returns bin contents and bin edges
+def histogram(CT, nBins=NBins, ctMin=CTMin, ctMax=CTMax):
+    CT = np.asarray(CT)
+    return np.histogram(CT[np.isfinite(CT)], bins=nBins, range=(ctMin, ctMax))
+
+# Fit a Gaussian to the peak of a histogram with the same constraints as PlotCoinPeak.C
+# The mean starts at the centre of the largest bin and can move by +/- 0.5, the amplitude is kept between 1/2 and 2x the largest bin and sigma between 0.1 and 2
+# Only bins within +/- 1 of the largest bin are fitted, bins are weighted by sqrt(N) and empty bins skipped, as in a ROOT chi2 fit
+# Returns the peak position, its error, the FWHM and its error, all NaN if the peak couldn't be fitted
+def fit_peak(counts, edges):
+    counts = np.asarray(counts, dtype=float)
+    centres = 0.5*(edges[1:]+edges[:-1])
+    MaxBin = np.argmax(counts)
+    MaxEnt = counts[MaxBin]
+    MaxVal = centres[MaxBin]
+    FitRange = (centres >= MaxVal-1) & (centres <= MaxVal+1) & (counts > 0)
+    if (MaxEnt <= 0 or np.count_nonzero(FitRange) < 3):
+        sys.stderr.write("!!! WARNING !!! - Too few entries to fit peak - !!! WARNING !!!\n")
+        return (np.nan, np.nan, np.nan, np.nan)
+    x = centres[FitRange]
+    y = counts[FitRange]
+    try:
+        par, cov = curve_fit(gaus, x, y, p0=[MaxEnt, MaxVal, 0.2], sigma=np.sqrt(y), absolute_sigma=True, bounds=([MaxEnt/2, MaxVal-0.5, 0.1], [MaxEnt*2, MaxVal+0.5, 2]))
+    except (RuntimeError, ValueError) as e:
+        sys.stderr.write("!!! WARNING !!! - Peak fit failed (%s) - !!! WARNING !!!\n" % e)
+        return (np.nan, np.nan, np.nan, np.nan)
+    err = np.sqrt(np.abs(np.diag(cov)))
+    return (par[1], err[1], abs(2.355*par[2]), abs(2.355*err[2]))
+
+# Read the cointime for each species from an open rootfile and histogram it, returns {name : (counts, edges)}
+# Files written by CoinTimePeak.py in hist mode already contain the histograms (h1_CT_<name>s), these are used as they are
+def histogram_file(InFile, species=Species):
+    Histos = {}
+    Keys = [key.decode().split(";")[0] for key in InFile.keys()]
+    for (name, tree, branch) in species:
+        if ("h1_CT_%ss" % name) in Keys:
+            Histos[name] = InFile["h1_CT_%ss" % name].numpy()
+        else:
+            Histos[name] = histogram(InFile[tree].array(branch))
+    return Histos
+
+# Fit every species in a CTPeak_Data (or CTPeak_Hist) rootfile, returns the output row (run number then 4 values per species) and the histograms
+def fit_file(rootFile, species=Species):
+    RunNum = int(os.path.basename(rootFile).split("_")[0])
+    Histos = histogram_file(up.open(rootFile), species)
+    Row = [RunNum]
+    for (name, tree, branch) in species:
+        Row.extend(fit_peak(*Histos[name]))
+    return Row, Histos
+
+# Hash of the fit configuration (this file, so the species, binning and fit code), cached fit results are only reused if it matches
+def config_hash():
+    with open(os.path.abspath(__file__), "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+# Species whose peak fit failed (NaN values) in an output row
+def failed_species(Row, species=Species):
+    return [name for i, (name, tree, branch) in enumerate(species) if not np.isfinite(float(Row[1+4*i]))]
+
+# Same formatting as the output line of PlotCoinPeak.C, failed fits are written as nan
+def format_row(Row):
+    return ",".join(["%i" % Row[0]] + ["%3.3f" % val for val in Row[1:]])
+
+# Save the histograms (and the fits) as a .pdf and a .root file
+def save_histos(Row, Histos, foutname, species=Species):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    fig, axes = plt.subplots(len(species), 1, figsize=(10,9))
+    for i, (name, tree, branch) in enumerate(species):
+        counts, edges = Histos[name]
+        centres = 0.5*(edges[1:]+edges[:-1])
+        axes[i].step(centres, counts, where="mid", color="blue")
+        mean, FWHM = Row[1+4*i], Row[3+4*i]
+        amp = counts[np.argmax(counts)]
+        x = np.linspace(mean-1, mean+1, 100)
+        axes[i].plot(x, gaus(x, amp, mean, FWHM/2.355), color="red")
+        axes[i].set_title("%ss CT - All events after PID cuts" % name)
+        axes[i].set_xlabel("Time (ns)")
+    plt.tight_layout()
+    plt.savefig("%s.pdf" % foutname)
+    plt.close(fig)
+    OutHisto_file = up.recreate("%s.root" % foutname)
+    for (name, tree, branch) in species:
+        OutHisto_file["h1_CT_%ss" % name] = Histos[name]
+    OutHisto_file.close()
+
+def main():
+    # Input should be the input root file name (including suffix) and optionally an output file name string (without any suffix)
+    if (len(sys.argv)-1 < 1 or len(sys.argv)-1 > 2):
+        print("!!!!! ERROR !!!!!\n Expected 1 or 2 arguments\n Usage is with - InFilename OutFilename(optional) \n!!!!! ERROR !!!!!")
+        sys.exit(1)
+    InFilename = sys.argv[1]
+    USER = subprocess.getstatusoutput("whoami") # Grab user info for file finding
+    HOST = subprocess.getstatusoutput("hostname")
+    if ("farm" in HOST[1]):
+        REPLAYPATH = "/group/c-pionlt/USERS/%s/hallc_replay_lt" % USER[1]
+    elif ("qcd" in HOST[1]):
+        REPLAYPATH = "/group/c-pionlt/USERS/%s/hallc_replay_lt" % USER[1]
+    elif ("phys.uregina" in HOST[1]):
+        REPLAYPATH = "/home/%s/work/JLab/hallc_replay_lt" % USER[1]
+    elif("skynet" in HOST[1]):
+        REPLAYPATH = "/home/%s/Work/JLab/hallc_replay_lt" % USER[1]
+    OUTPATH = "%s/UTIL_PION/OUTPUT/Analysis/PionLT" % REPLAYPATH
+    rootFile = "%s/%s" % (OUTPATH, InFilename)
+    # Complain and exit if your file doesn't exist
+    if not os.path.isfile(rootFile):
+        print("!!!!! ERROR !!!!!\n %s not found \n!!!!! ERROR !!!!!" % rootFile)
+        sys.exit(2)
+    Row, Histos = fit_file(rootFile)
+    if (len(sys.argv)-1 == 2):
+        save_histos(Row, Histos, "%s/%s" % (OUTPATH, sys.argv[2]))
+    # Only the output row goes to stdout so it can be appended directly to a csv
+    print(format_row(Row))
+
+if __name__ == '__main__':
+    main()
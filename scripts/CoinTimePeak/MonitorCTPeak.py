@@ -0,0 +1,173 @@
+#! /usr/bin/python
+
+# Python script which keeps a running record of the fitted cointime peak positions and widths as runs are completed, flags drifts and proposes new timing parameter ranges
+# Each call adds the new run(s) to the running sums saved in UTIL_PION/OUTPUT/Analysis/PionLT/CTPeak_Monitor.json, earlier runs are never re-read or re-fitted
+# A peak that moves by more than PeakThreshold (ns) from the mean of the current range for Confirm runs in a row starts a new range, fewer outlying runs are only flagged
+# The proposed ranges are written to UTIL_PION/OUTPUT/Analysis/PionLT/CTPeak_Monitor_TimingParamFile.csv in the Timing_Parameters.csv format, the other parameters are taken from Timing_Parameters.csv
+
+# Import relevant packages
+import numpy as np
+import sys, os, subprocess, json
+
+from FitCoinPeak import Species, fit_file, failed_species
+
+if (len(sys.argv)-1 < 1 or len(sys.argv)-1 > 4):
+    print("!!!!! ERROR !!!!!\n Expected 1-4 arguments\n Usage is with - RunNumber/KINEMATIC_Output.csv PeakThreshold(optional, ns, default 0.1) WidthThreshold(optional, fraction, default 0.25) Confirm(optional, runs, default 2) \n!!!!! ERROR !!!!!")
+    sys.exit(1)
+Input = sys.argv[1]
+if (len(sys.argv)-1 > 1):
+    PeakThreshold = float(sys.argv[2])
+else:
+    PeakThreshold = 0.1
+if (len(sys.argv)-1 > 2):
+    WidthThreshold = float(sys.argv[3])
+else:
+    WidthThreshold = 0.25
+if (len(sys.argv)-1 > 3):
+    Confirm = int(sys.argv[4])
+else:
+    Confirm = 2
+
+USER = subprocess.getstatusoutput("whoami") # Grab user info for file finding
+HOST = subprocess.getstatusoutput("hostname")
+if ("farm" in HOST[1]):
+    REPLAYPATH = "/group/c-pionlt/USERS/%s/hallc_replay_lt" % USER[1]
+elif ("qcd" in HOST[1]):
+    REPLAYPATH = "/group/c-pionlt/USERS/%s/hallc_replay_lt" % USER[1]
+elif ("phys.uregina" in HOST[1]):
+    REPLAYPATH = "/home/%s/work/JLab/hallc_replay_lt" % USER[1]
+elif("skynet" in HOST[1]):
+    REPLAYPATH = "/home/%s/Work/JLab/hallc_replay_lt" % USER[1]
+
+# Add more path setting as needed in a similar manner
+OUTPATH = "%s/UTIL_PION/OUTPUT/Analysis/PionLT" % REPLAYPATH
+PARAMPATH = "%s/UTIL_PION/DB/PARAM" % REPLAYPATH
+StateFile = "%s/CTPeak_Monitor.json" % OUTPATH
+RangeFile = "%s/CTPeak_Monitor_TimingParamFile.csv" % OUTPATH
+TimingCutFile = "%s/Timing_Parameters.csv" % PARAMPATH
+sys.path.insert(0, '%s/UTIL_PION/bin/python/' % REPLAYPATH)
+import kaonlt as klt
+
+SpeciesNames = [name for (name, tree, branch) in Species]
+
+# Running sums for one range of runs, the mean and spread of the peak position and the mean width of each species
+# N counts the runs used for each species, a species whose fit failed in a run is left out of its sums
+def new_range(runNum):
+    return {"Run_Start" : runNum, "Run_End" : runNum, "nRuns" : 0, "N" : [0]*len(Species), "Peak" : [0.0]*len(Species), "PeakM2" : [0.0]*len(Species), "FWHM" : [0.0]*len(Species)}
+
+# Add one run to a range (Welford's update, so the mean and spread never need the earlier runs)
+def add_run(Range, runNum, Peaks, FWHMs):
+    Range["nRuns"] += 1
+    Range["Run_End"] = runNum
+    for i in range(len(Species)):
+        if not np.isfinite(Peaks[i]):
+            continue
+        Range["N"][i] += 1
+        delta = Peaks[i] - Range["Peak"][i]
+        Range["Peak"][i] += delta/Range["N"][i]
+        Range["PeakM2"][i] += delta*(Peaks[i] - Range["Peak"][i])
+        Range["FWHM"][i] += (FWHMs[i] - Range["FWHM"][i])/Range["N"][i]
+
+# Species whose peak has moved away from the mean of the range, with the shift of each and the run to run spread of the range
+def drifts(Range, Peaks):
+    return [(SpeciesNames[i], Peaks[i] - Range["Peak"][i], np.sqrt(Range["PeakM2"][i]/Range["N"][i])) for i in range(len(Species)) if Range["N"][i] > 0 and np.isfinite(Peaks[i]) and abs(Peaks[i] - Range["Peak"][i]) > PeakThreshold]
+
+# Add a fitted run (FitCoinPeak row - run number, then PeakPos, PeakPosError, PeakFWHM, PeakFWHMError for each species) to the monitor
+def process_row(State, Row):
+    runNum = int(Row[0])
+    if (State["LastRun"] is not None and runNum <= State["LastRun"]):
+        print("Run %i is not after the last run added (%i), skipping" % (runNum, State["LastRun"]))
+        return
+    State["LastRun"] = runNum
+    Peaks = [float(Row[1+4*i]) for i in range(len(Species))]
+    FWHMs = [float(Row[3+4*i]) for i in range(len(Species))]
+    # Failed fits are nan, only the species that were fitted are added to the running means
+    Failed = failed_species(Row)
+    if (len(Failed) == len(Species)):
+        print("!!! WARNING !!! - Run %i has no fitted peaks, not added to the monitor - !!! WARNING !!!" % runNum)
+        return
+    elif Failed:
+        print("!!! WARNING !!! - Run %i peak fit failed for %s, only the other species are added - !!! WARNING !!!" % (runNum, ",".join(Failed)))
+    Current = State["Ranges"][-1] if State["Ranges"] else None
+    if Current is None:
+        Current = new_range(runNum)
+        State["Ranges"].append(Current)
+    for i in range(len(Species)):
+        if (Current["N"][i] > 0 and np.isfinite(FWHMs[i]) and abs(FWHMs[i] - Current["FWHM"][i]) > WidthThreshold*Current["FWHM"][i]):
+            print("!!! WARNING !!! - Run %i %s peak width %.3f ns, mean for runs %i-%i is %.3f ns - !!! WARNING !!!" % (runNum, SpeciesNames[i], FWHMs[i], Current["Run_Start"], Current["Run_End"], Current["FWHM"][i]))
+    Drift = drifts(Current, Peaks)
+    if not Drift:
+        # Back in line, any pending runs were outliers, they stay inside this range but don't count towards its mean
+        for Pending in State["Pending"]:
+            print("Run %i was an outlier, not used in the mean of the range starting at run %i" % (Pending[0], Current["Run_Start"]))
+        State["Pending"] = []
+        add_run(Current, runNum, Peaks, FWHMs)
+        return
+    print("!!! WARNING !!! - Run %i peak drift from mean of runs %i-%i - %s - !!! WARNING !!!" % (runNum, Current["Run_Start"], Current["Run_End"], ", ".join("%s %+.3f ns (RMS %.3f ns)" % d for d in Drift)))
+    State["Pending"].append((runNum, Peaks, FWHMs))
+    if (len(State["Pending"]) >= Confirm):
+        # The shift has held for Confirm runs, start a new range at the first of them
+        New = new_range(State["Pending"][0][0])
+        for Pending in State["Pending"]:
+            add_run(New, *Pending)
+        State["Ranges"].append(New)
+        State["Pending"] = []
+        print("New timing parameter range proposed starting at run %i" % New["Run_Start"])
+
+def write_ranges(State):
+    Ranges = [Range for Range in State["Ranges"] if Range["nRuns"] > 0]
+    if not Ranges:
+        return
+    OldParam = klt.pyParam(TimingCutFile)
+    Columns = list(OldParam.table.columns)
+    Params = OldParam.lookup([Range["Run_Start"] for Range in Ranges]).fillna(0)
+    for col in Columns:
+        if (OldParam.table[col].dtype.kind in "iu"):
+            Params[col] = Params[col].astype(int)
+    Params["Run_Start"] = [Range["Run_Start"] for Range in Ranges]
+    # Each range runs up to the run before the next one starts
+    Params["Run_End"] = [Next["Run_Start"]-1 for Next in Ranges[1:]] + [Ranges[-1]["Run_End"]]
+    # A species with no fitted runs in a range keeps the peak position from Timing_Parameters.csv
+    for i, name in enumerate(SpeciesNames):
+        Params["%s_Prompt_Peak" % name] = [round(Range["Peak"][i], 3) if Range["N"][i] > 0 else Old for Range, Old in zip(Ranges, Params["%s_Prompt_Peak" % name])]
+    tmpName = "%s.tmp%i" % (RangeFile, os.getpid())
+    Params[Columns].to_csv(tmpName, index=False)
+    os.replace(tmpName, RangeFile)
+
+def main():
+    if os.path.isfile(StateFile):
+        with open(StateFile) as f:
+            State = json.load(f)
+        if (State["Species"] != SpeciesNames):
+            print("!!!!! ERROR !!!!!\n %s was made for species %s, move it out of the way to start a new monitor \n!!!!! ERROR !!!!!" % (StateFile, ",".join(State["Species"])))
+            sys.exit(2)
+    else:
+        State = {"Species" : SpeciesNames, "LastRun" : None, "Ranges" : [], "Pending" : []}
+    if Input.isdigit():
+        # Single run, fit its CTPeak file
+        CTFile = "%s/%s_-1_CTPeak_Data.root" % (OUTPATH, Input)
+        if not os.path.isfile(CTFile):
+            CTFile = "%s/%s_-1_CTPeak_Hist.root" % (OUTPATH, Input)
+        if not os.path.isfile(CTFile):
+            print("!!!!! ERROR !!!!!\n No CTPeak_Data or CTPeak_Hist rootfile found for run %s in %s \n!!!!! ERROR !!!!!" % (Input, OUTPATH))
+            sys.exit(3)
+        Rows = [fit_file(CTFile)[0]]
+    else:
+        # Output csv of AnalyseKinematic_CTPeak.py, only the runs after the last one added are new
+        if not os.path.isfile(Input):
+            print("!!!!! ERROR !!!!!\n %s not found \n!!!!! ERROR !!!!!" % Input)
+            sys.exit(3)
+        with open(Input) as f:
+            Rows = [line.strip().split(",") for line in f if line.strip() != ""]
+        Rows = [Row for Row in Rows if State["LastRun"] is None or int(Row[0]) > State["LastRun"]]
+    for Row in sorted(Rows, key=lambda Row: int(Row[0])):
+        process_row(State, Row)
+    tmpName = "%s.tmp%i" % (StateFile, os.getpid())
+    with open(tmpName, "w") as f:
+        json.dump(State, f, indent=1)
+    os.replace(tmpName, StateFile)
+    write_ranges(State)
+    print("%i runs added, %i proposed timing parameter ranges written to %s" % (len(Rows), len([Range for Range in State["Ranges"] if Range["nRuns"] > 0]), RangeFile))
+
+if __name__ == '__main__':
+    main()
@@ -36,6 +36,8 @@ elif ("lark.phys.uregina" in HOST[1]):
 OUTPATH = "%s/UTIL_PION/OUTPUT/Analysis/PionLT" % REPLAYPATH
 PARAMPATH = "%s/UTIL_PION/DB/PARAM" % REPLAYPATH
 CUTPATH = "%s/UTIL_PION/DB/CUTS" % REPLAYPATH
+sys.path.insert(0, '%s/UTIL_PION/bin/python/' % REPLAYPATH)
+import kaonlt as klt
 
 print("Running as %s on %s, hallc_replay_lt path assumed as %s" % (USER[1], HOST[1], REPLAYPATH))
 KinList = "%s/UTIL_PION/scripts/CoinTimePeak/Kinematics/%s" % (REPLAYPATH,InputList)
@@ -51,81 +53,51 @@ if (path.exists(TimingCutFile) == False or path.isfile(TimingCutFile) == False):
 else:
     print("%s being used as old param file to base offsets/windows from" % TimingCutFile)
 
-KinListf = open(KinList)
-#KinLineNum = 0 # Uncomment for loop testing if needed
-ParamData=[]
-FailedParamData=[]
+# Load the old param file once, runs are matched to its Run_Start/Run_End ranges with an interval lookup rather than rescanning the file for every run
+OldParamData = klt.pyParam(TimingCutFile)
+KinData=[]
 # Open kinematic list file and go through every kinematic in the list
+KinListf = open(KinList)
 for KinLine in KinListf:
-    #KinLineNum += 1 # Uncomment for testing loop if needed
-    #print(KinLineNum) # Testing output
     KinLine=KinLine.rstrip();
     KinFile = "%s/%s_Output.csv" % (OUTPATH, KinLine)
     print(KinFile)
-    # Check the corresponding output .csv file exists, if it does, open it
+    # Check the corresponding output .csv file exists, if it does, read it
     if (path.exists(KinFile) == True and path.isfile(KinFile) == True):
-        KinFilef = open(KinFile)
-        #KinFileLineNum = 0 #
-        for KinFileLine in KinFilef:
-            # Check the line is not blank and process it if not
-            if (KinFileLine != "\n"):
-                RunParamData = [0] * 10 # Initialise a 10 element array for the param data for each run (line) in the KinFile
-                # Go through output csv line by line, convert each line to an array
-                #KinFileLineNum += 1
-                KinFileLine=KinFileLine.rstrip() # Remove trailing spaces
-                KinFileData=KinFileLine.split(",") # Convert csv row to an array
-                RunParamData[0]=int(KinFileData[0]) # Run number
-                #RunParamData[1]=int(KinFileData[0])+1
-                RunParamData[1]=int(KinFileData[0]) # Run start = run end as this is to cover one run at a time
-                RunParamData[6]=float(KinFileData[1]) # Pion peak pos
-                RunParamData[7]=float(KinFileData[5]) # Kaon peak pos
-                RunParamData[8]=float(KinFileData[9]) # Proton peak pos
-                # Need to now get the rest of the run param values from the existing param file which we were also given
-                TempPar = -1 # To check later
-                TimingCutLineNum = 0 # Count Timing cut file line number
-                TimingCutFilef = open(TimingCutFile)
-                for TimingCutLine in TimingCutFilef:
-                    TimingCutLineNum += 1 # Add one to line number at start of each loop
-                    if(TimingCutLineNum > 1): # Skip first line
-                        TimingCutLine = TimingCutLine.partition('#')[0] # Treat anything after a # as a comment and ignore it
-                        TimingCutLine = TimingCutLine.rstrip()
-                        OldParamFileArr = TimingCutLine.split(",") # Convert line into an array, anything after a comma is a new entry
-                        if(int(RunParamData[0]) in range (int(OldParamFileArr[0]), int(OldParamFileArr[1])+1)): # Check if run number for file is within any of the ranges specified in the cut file
-                            TempPar += 2 # If run number is in range, set to non -1 value
-                            RunParamData[2]=float(OldParamFileArr[2])
-                            RunParamData[3]=float(OldParamFileArr[3])
-                            RunParamData[4]=float(OldParamFileArr[4])
-                            RunParamData[5]=float(OldParamFileArr[5])
-                            RunParamData[9]=float(OldParamFileArr[9])
-                # Close loop over timing cut file and close the file
-                TimingCutFilef.close()
-                # If the run number was in the old param file, our new parameter file entry is now complete, we need to append it to our array for the new param file
-                if (TempPar != -1):
-                    ParamData.append(RunParamData)
-                elif(TempPar == -1): # If the run number wasn't found in the old param file add it to a failed array file
-                    FailedParamData.append(RunParamData)
-            # This is the else condition of if a line in the output for a kinematic file was emptry
-            else:
-                print("!!! WARNING !!! - Blank line in %s - check output is OK - !!! WARNING !!!" % KinFile)
-        # End loop over output file for a kinematic and close it
-        KinFilef.close()
+        with open(KinFile) as KinFilef:
+            KinText = KinFilef.read()
+        if "\n\n" in ("\n" + KinText):
+            print("!!! WARNING !!! - Blank line in %s - check output is OK - !!! WARNING !!!" % KinFile)
+        if (KinText.strip() == ""):
+            continue
+        KinFileData = pd.read_csv(KinFile, header=None, skip_blank_lines=True)
+        KinData.append(pd.DataFrame({"Run" : KinFileData[0].astype(int), "Pion_Prompt_Peak" : KinFileData[1], "Kaon_Prompt_Peak" : KinFileData[5], "Proton_Prompt_Peak" : KinFileData[9]}))
     # If the output csv file for a kinematic doesn't exist or can't be opened, skip it
     else:
         print("!!!!! ERROR !!!!!\n %s does not exist or is not a valid file - Skipping \n!!!!! ERROR !!!!!" % KinFile)
-# End loop over kinematic file list and cloe it
+# End loop over kinematic file list and close it
 KinListf.close()
 
-ParamDataArr=np.array(ParamData, dtype='O')
+ParamHeader = ['Run_Start','Run_End','Bunch_Spacing','Coin_Offset','nSkip','nWindows','Pion_Prompt_Peak','Kaon_Prompt_Peak','Proton_Prompt_Peak','RF_Offset']
+KinData = pd.concat(KinData, ignore_index=True) if KinData else pd.DataFrame(columns=["Run","Pion_Prompt_Peak","Kaon_Prompt_Peak","Proton_Prompt_Peak"])
+# Run start = run end as this is to cover one run at a time, the peak positions are the new fitted values, everything else comes from the old param file
+OldParamRows = OldParamData.index(KinData["Run"].values)
+NewParam = OldParamData.lookup(KinData["Run"].values, ['Bunch_Spacing','Coin_Offset','nSkip','nWindows','RF_Offset']).fillna(0)
+NewParam["Run_Start"] = KinData["Run"].values
+NewParam["Run_End"] = KinData["Run"].values
+# A peak that couldn't be fitted (nan in the output csv) keeps the value from the old param file
+OldPeaks = OldParamData.lookup(KinData["Run"].values, ["Pion_Prompt_Peak","Kaon_Prompt_Peak","Proton_Prompt_Peak"])
+for Peak in ["Pion_Prompt_Peak","Kaon_Prompt_Peak","Proton_Prompt_Peak"]:
+    NewParam[Peak] = np.where(np.isnan(KinData[Peak].values.astype(float)), OldPeaks[Peak].values, KinData[Peak].values)
+ParamDataArr = NewParam[ParamHeader].values[OldParamRows >= 0]
+# If the run number wasn't found in the old param file add it to a failed array file
+FailedParamDataArr = NewParam[ParamHeader].values[OldParamRows < 0]
+
 # Should now have an array of param entries for our file, need to print them to file, first, sort them by run number
-ParamDataArr = ParamDataArr[ParamDataArr[:,0].argsort()] # Sort by values in 1st column (starting run number)
+ParamDataArr = ParamDataArr[ParamDataArr[:,0].argsort(kind="mergesort")] # Sort by values in 1st column (starting run number)
 # Save to file with appropriate formatting and header
-np.savetxt(("%s_TimingParamFile.csv" % InputList), ParamDataArr, fmt="%i,%i,%2.3f,%2.3f,%i,%i,%3.3f,%3.3f,%3.3f,%2.3f", delimiter=",", header='Run_Start,Run_End,Bunch_Spacing,Coin_Offset,nSkip,nWindows,Pion_Prompt_Peak,Kaon_Prompt_Peak,Proton_Prompt_Peak,RF_Offset', comments='')
+np.savetxt(("%s_TimingParamFile.csv" % InputList), ParamDataArr, fmt="%i,%i,%2.3f,%2.3f,%i,%i,%3.3f,%3.3f,%3.3f,%2.3f", delimiter=",", header=",".join(ParamHeader), comments='')
 # If there are any runs that didn't match the fed parameter file, write them as a different csv
-if(len(FailedParamData) != 0):
-    FailedParamDataArr=np.array(FailedParamData, dtype='O')
-    FailedParamDataArr = FailedParamDataArr[FailedParamDataArr[:,0].argsort()] # Sort by values in 1st column (starting run number)
-    np.savetxt(("%s_Failed_TimingParamFile.csv" % InputList), FailedParamDataArr, fmt="%i,%i,%2.3f,%2.3f,%i,%i,%3.3f,%3.3f,%3.3f,%2.3f", delimiter=",", header='Run_Start,Run_End,Bunch_Spacing,Coin_Offset,nSkip,nWindows,Pion_Prompt_Peak,Kaon_Prompt_Peak,Proton_Prompt_Peak,RF_Offset', comments='')
-
-
-
-
+if(len(FailedParamDataArr) != 0):
+    FailedParamDataArr = FailedParamDataArr[FailedParamDataArr[:,0].argsort(kind="mergesort")] # Sort by values in 1st column (starting run number)
+    np.savetxt(("%s_Failed_TimingParamFile.csv" % InputList), FailedParamDataArr, fmt="%i,%i,%2.3f,%2.3f,%i,%i,%3.3f,%3.3f,%3.3f,%2.3f", delimiter=",", header=",".join(ParamHeader), comments='')
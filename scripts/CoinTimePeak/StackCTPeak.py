@@ -0,0 +1,144 @@
+#! /usr/bin/python
+
+# Python script which stacks the cointime histograms of every run in a kinematic list into one histogram per species and fits the stacked peak
+# Each run is shifted by its prompt peak positions from the timing parameter file first, so the stacked peak should sit at 0 if the parameter file is right
+# The runs are read and aligned in parallel, the partial sums are then added pairwise (a tree reduction) so no process ever has to hold more than two sets of histograms
+# Writes KINEMATIC_StackedCTPeak.pdf and .root to UTIL_PION/OUTPUT/Analysis/PionLT and prints the fitted offset and width of each stacked peak
+
+# Import relevant packages
+import uproot as up
+import numpy as np
+import multiprocessing as mp
+import sys, os, subprocess
+
+from FitCoinPeak import Species, histogram_file, fit_peak, save_histos
+
+if (len(sys.argv)-1 < 1 or len(sys.argv)-1 > 3):
+    print("!!!!! ERROR !!!!!\n Expected 1-3 arguments\n Usage is with - KINEMATIC nProcesses(optional, default all cores) ParamFile(optional, default Timing_Parameters) \n!!!!! ERROR !!!!!")
+    sys.exit(1)
+KINEMATIC = sys.argv[1]
+if (len(sys.argv)-1 > 1):
+    nProc = int(sys.argv[2])
+else:
+    nProc = mp.cpu_count()
+if (len(sys.argv)-1 > 2):
+    ParamName = sys.argv[3]
+else:
+    ParamName = "Timing_Parameters"
+
+USER = subprocess.getstatusoutput("whoami") # Grab user info for file finding
+HOST = subprocess.getstatusoutput("hostname")
+if ("farm" in HOST[1]):
+    REPLAYPATH = "/group/c-pionlt/USERS/%s/hallc_replay_lt" % USER[1]
+elif ("qcd" in HOST[1]):
+    REPLAYPATH = "/group/c-pionlt/USERS/%s/hallc_replay_lt" % USER[1]
+elif ("phys.uregina" in HOST[1]):
+    REPLAYPATH = "/home/%s/work/JLab/hallc_replay_lt" % USER[1]
+elif("skynet" in HOST[1]):
+    REPLAYPATH = "/home/%s/Work/JLab/hallc_replay_lt" % USER[1]
+
+# Add more path setting as needed in a similar manner
+UTILPATH = "%s/UTIL_PION" % REPLAYPATH
+OUTPATH = "%s/OUTPUT/Analysis/PionLT" % UTILPATH
+SCRIPTPATH = "%s/scripts/CoinTimePeak" % UTILPATH
+RunListFile = "%s/Kinematics/%s" % (SCRIPTPATH, KINEMATIC)
+ParamFile = "%s/DB/PARAM/%s.csv" % (UTILPATH, ParamName)
+sys.path.insert(0, '%s/bin/python/' % UTILPATH)
+import kaonlt as klt
+
+SpeciesNames = [name for (name, tree, branch) in Species]
+
+# Shift a histogram by offset (ns) keeping the same bins, the counts of each bin are shared between the bins it now overlaps
+def shift(counts, edges, offset):
+    cumulative = np.concatenate(([0], np.cumsum(counts, dtype=float)))
+    return np.diff(np.interp(edges + offset, edges, cumulative))
+
+# Read the histograms of a block of runs, align each to its prompt peaks and sum them
+# Returns (summed counts per species, bin edges, runs used, runs skipped with the reason)
+def stack_runs(Runs):
+    Param = klt.pyParam.cached(ParamFile)
+    Peaks = Param.lookup(Runs, ["%s_Prompt_Peak" % name for name in SpeciesNames]).values
+    Sum = None
+    Edges = None
+    Used = []
+    Skipped = []
+    for runNum, RunPeaks in zip(Runs, Peaks):
+        CTFile = "%s/%s_-1_CTPeak_Hist.root" % (OUTPATH, runNum)
+        if not os.path.isfile(CTFile):
+            CTFile = "%s/%s_-1_CTPeak_Data.root" % (OUTPATH, runNum)
+        if not os.path.isfile(CTFile):
+            Skipped.append((runNum, "no CTPeak_Hist or CTPeak_Data rootfile"))
+            continue
+        if np.isnan(RunPeaks).any():
+            Skipped.append((runNum, "not in %s" % ParamFile))
+            continue
+        Histos = histogram_file(up.open(CTFile))
+        if Edges is None:
+            Edges = Histos[SpeciesNames[0]][1]
+            Sum = np.zeros((len(SpeciesNames), len(Edges)-1))
+        if any(not np.array_equal(Histos[name][1], Edges) for name in SpeciesNames):
+            Skipped.append((runNum, "different cointime binning"))
+            continue
+        for i, name in enumerate(SpeciesNames):
+            Sum[i] += shift(Histos[name][0], Edges, RunPeaks[i])
+        Used.append(runNum)
+    return (Sum, Edges, Used, Skipped)
+
+# Add two partial sums
+def add_pair(Pair):
+    (SumA, EdgesA, UsedA, SkippedA), (SumB, EdgesB, UsedB, SkippedB) = Pair
+    if SumA is None:
+        return (SumB, EdgesB, UsedA + UsedB, SkippedA + SkippedB)
+    if SumB is None:
+        return (SumA, EdgesA, UsedA + UsedB, SkippedA + SkippedB)
+    if not np.array_equal(EdgesA, EdgesB):
+        return (SumA, EdgesA, UsedA, SkippedA + SkippedB + [(runNum, "different cointime binning") for runNum in UsedB])
+    return (SumA + SumB, EdgesA, UsedA + UsedB, SkippedA + SkippedB)
+
+# Pairwise reduction of the partial sums, each level halves the number of partial sums
+def reduce_tree(pool, Partials):
+    while len(Partials) > 1:
+        Pairs = list(zip(Partials[0::2], Partials[1::2]))
+        Reduced = pool.map(add_pair, Pairs)
+        if len(Partials) % 2 == 1:
+            Reduced.append(Partials[-1])
+        Partials = Reduced
+    return Partials[0]
+
+def main():
+    print("Running as %s on %s, hallc_replay_lt path assumed as %s" % (USER[1], HOST[1], REPLAYPATH))
+    if not os.path.isfile(RunListFile):
+        print("!!!!! ERROR !!!!!\n %s not found \n!!!!! ERROR !!!!!" % RunListFile)
+        sys.exit(2)
+    with open(RunListFile) as f:
+        RunList = sorted(set(int(line.strip()) for line in f if line.strip() != ""))
+    if not RunList:
+        print("!!!!! ERROR !!!!!\n %s is empty \n!!!!! ERROR !!!!!" % RunListFile)
+        sys.exit(2)
+    # Several runs per block so each process reads a few files before the reduction starts
+    nBlocks = min(len(RunList), nProc*4)
+    Blocks = [list(Block) for Block in np.array_split(RunList, nBlocks)]
+    pool = mp.Pool(processes=min(nProc, nBlocks))
+    try:
+        Sum, Edges, Used, Skipped = reduce_tree(pool, pool.map(stack_runs, Blocks))
+    finally:
+        pool.close()
+        pool.join()
+    for runNum, Reason in sorted(Skipped):
+        print("!!! WARNING !!! - Run %i not stacked - %s - !!! WARNING !!!" % (runNum, Reason))
+    if not Used:
+        print("!!!!! ERROR !!!!!\n No runs from %s could be stacked \n!!!!! ERROR !!!!!" % RunListFile)
+        sys.exit(3)
+    print("%i of %i runs stacked, aligned with %s" % (len(Used), len(RunList), ParamFile))
+    Row = [len(Used)]
+    Histos = {}
+    for i, name in enumerate(SpeciesNames):
+        Histos[name] = (Sum[i], Edges)
+        Fit = fit_peak(Sum[i], Edges)
+        Row.extend(Fit)
+        print("%s - stacked peak offset %.3f +/- %.3f ns, FWHM %.3f +/- %.3f ns, %i events" % ((name,) + tuple(Fit) + (Sum[i].sum(),)))
+    save_histos(Row, Histos, "%s/%s_StackedCTPeak" % (OUTPATH, KINEMATIC))
+    print("Stacked histograms written to %s/%s_StackedCTPeak.pdf and .root" % (OUTPATH, KINEMATIC))
+
+if __name__ == '__main__':
+    main()
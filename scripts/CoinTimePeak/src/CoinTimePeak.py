@@ -2,6 +2,11 @@
 
 # 15/10/20 - Stephen Kay, University of Regina
 # Script to extract the pion and kaon cointime peak from the data and save info as a new rootfile, subsequent script fits the peak to extract the position to examine the stability
+# The species to extract are given as a comma separated list (default Pion,Kaon,Proton), the replay file is read once and every species is taken from that one read
+# HeepProton writes the ep events (with the missing masses) to the HeepCoin output file, so Heep and production output can be made in a single pass, e.g. Pion,Kaon,Proton,HeepProton
+# A species can use a different cut from coinpeak.cuts with Name:cut, e.g. Pion:coin_epi_cut_prompt
+# By default the events passing the cuts are saved as trees (RUN_MAXEVENTS_CTPeak_Data.root), with OutputMode hist only the cointime histograms (and with hist2d the cointime vs SHMS beta maps)
+# are saved (RUN_MAXEVENTS_CTPeak_Hist.root), these are a tiny fraction of the size and are all FitCoinPeak.py needs
 
 # Import relevant packages
 import uproot as up
@@ -14,16 +19,28 @@ import scipy
 import scipy.integrate as integrate
 import matplotlib.pyplot as plt
 import sys, math, os, subprocess
+from collections import OrderedDict
 
 sys.path.insert(0, 'python/')
 # Check the number of arguments provided to the script
-if len(sys.argv)-1!=3:
-    print("!!!!! ERROR !!!!!\n Expected 3 arguments\n Usage is with - ROOTfilePrefix RunNumber MaxEvents \n!!!!! ERROR !!!!!")
+if (len(sys.argv)-1 < 3 or len(sys.argv)-1 > 8):
+    print("!!!!! ERROR !!!!!\n Expected 3-8 arguments\n Usage is with - ROOTfilePrefix RunNumber MaxEvents Species(optional, default Pion,Kaon,Proton) OutputMode(optional, tree/hist/hist2d) NBins(optional) CTMin(optional) CTMax(optional) \n!!!!! ERROR !!!!!")
     sys.exit(1)
 # Input params - run number and max number of events
 ROOTPrefix = sys.argv[1]
 runNum = sys.argv[2]
 MaxEvent = sys.argv[3]
+if (len(sys.argv)-1 > 3):
+    SpeciesList = sys.argv[4].split(",")
+else:
+    SpeciesList = ["Pion", "Kaon", "Proton"]
+if (len(sys.argv)-1 > 4):
+    OutputMode = sys.argv[5]
+else:
+    OutputMode = "tree"
+if OutputMode not in ("tree", "hist", "hist2d"):
+    print("!!!!! ERROR !!!!!\n OutputMode must be one of tree, hist or hist2d, not %s \n!!!!! ERROR !!!!!" % OutputMode)
+    sys.exit(1)
 
 USER = subprocess.getstatusoutput("whoami") # Grab user info for file finding
 HOST = subprocess.getstatusoutput("hostname")
@@ -41,6 +58,39 @@ OUTPATH = "%s/UTIL_PION/OUTPUT/Analysis/PionLT" % REPLAYPATH
 CUTPATH = "%s/UTIL_PION/DB/CUTS" % REPLAYPATH
 sys.path.insert(0, '%s/UTIL_PION/bin/python/' % REPLAYPATH)
 import kaonlt as klt
+sys.path.insert(0, '%s/UTIL_PION/scripts/CoinTimePeak/' % REPLAYPATH)
+from FitCoinPeak import NBins, CTMin, CTMax, histogram
+
+# Histogram binning, defaults are the same as the fit in FitCoinPeak.py
+if (len(sys.argv)-1 > 5):
+    NBins = int(sys.argv[6])
+if (len(sys.argv)-1 > 6):
+    CTMin = float(sys.argv[7])
+if (len(sys.argv)-1 > 7):
+    CTMax = float(sys.argv[8])
+
+# Species that can be extracted - (histogram name, output tree, default cut in coinpeak.cuts, cointime branch, output file suffix)
+Species = {
+    "Pion" : ("Pion", "Pions_All", "coin_epi_cut_all", "CTime_ePiCoinTime_ROC1", ""),
+    "Kaon" : ("Kaon", "Kaons_All", "coin_ek_cut_all", "CTime_eKCoinTime_ROC1", ""),
+    "Proton" : ("Proton", "Protons_All", "coin_ep_cut_all", "CTime_epCoinTime_ROC1", ""),
+    "HeepProton" : ("Proton", "Protons_All", "coin_ep_cut_all", "CTime_epCoinTime_ROC1", "_HeepCoin"),
+}
+# Requested species as (histogram name, output tree, cut, cointime branch, output file suffix)
+Requested = []
+for Spec in SpeciesList:
+    Name, Sep, Cut = Spec.partition(":")
+    if Name not in Species:
+        print("!!!!! ERROR !!!!!\n Unknown species %s, options are %s \n!!!!! ERROR !!!!!" % (Name, ",".join(sorted(Species))))
+        sys.exit(1)
+    Spec = Species[Name]
+    Requested.append((Spec[0], Spec[1], Cut if Cut else Spec[2], Spec[3], Spec[4]))
+# Output file suffixes, the HeepCoin output also includes the SHMS missing masses
+Suffixes = sorted(set(Spec[4] for Spec in Requested))
+# SHMS beta binning of the 2D maps
+BetaBins = 200
+BetaMin = 0.5
+BetaMax = 1.5
 
 print("Running as %s on %s, hallc_replay_lt path assumed as %s" % (USER[1], HOST[1], REPLAYPATH))
 rootName = "%s/UTIL_PION/ROOTfiles/Analysis/PionLT/%s_%s_%s.root" % (REPLAYPATH, ROOTPrefix, runNum, MaxEvent)
@@ -62,30 +112,20 @@ else:
     print ("%s not found - do you have the correct sym link/folder set up?" % (rootName))
     sys.exit(4)
 print("Output path checks out, outputting to %s" % (OUTPATH))
-# Read stuff from the main event tree
+# Read stuff from the main event tree, every requested species uses this one read
 e_tree = up.open(rootName)["T"]
-# Timing info
-CTime_ePiCoinTime_ROC1 = e_tree.array("CTime.ePiCoinTime_ROC1")
-CTime_eKCoinTime_ROC1 = e_tree.array("CTime.eKCoinTime_ROC1")
-CTime_epCoinTime_ROC1 = e_tree.array("CTime.epCoinTime_ROC1")
-# HMS info
-H_gtr_beta = e_tree.array("H.gtr.beta")
-H_gtr_xp = e_tree.array("H.gtr.th") # xpfp -> Theta
-H_gtr_yp = e_tree.array("H.gtr.ph") # ypfp -> Phi
-H_gtr_dp = e_tree.array("H.gtr.dp")
-H_cal_etotnorm = e_tree.array("H.cal.etotnorm")
-H_cer_npeSum = e_tree.array("H.cer.npeSum")
-# SHMS info
-P_gtr_beta = e_tree.array("P.gtr.beta")
-P_gtr_xp = e_tree.array("P.gtr.th") # xpfp -> Theta
-P_gtr_yp = e_tree.array("P.gtr.ph") # ypfp -> Phi
-P_gtr_p = e_tree.array("P.gtr.p")
-P_gtr_dp = e_tree.array("P.gtr.dp")
-P_cal_etotnorm = e_tree.array("P.cal.etotnorm")
-P_aero_npeSum = e_tree.array("P.aero.npeSum")
-P_hgcer_npeSum = e_tree.array("P.hgcer.npeSum")
-P_hgcer_xAtCer = e_tree.array("P.hgcer.xAtCer")
-P_hgcer_yAtCer = e_tree.array("P.hgcer.yAtCer")
+# Branches saved to the output trees, (name in the output, branch)
+Branches = [("H_gtr_beta", "H.gtr.beta"), ("H_gtr_xp", "H.gtr.th"), ("H_gtr_yp", "H.gtr.ph"), ("H_gtr_dp", "H.gtr.dp"), ("H_cal_etotnorm", "H.cal.etotnorm"), ("H_cer_npeSum", "H.cer.npeSum"),
+            ("CTime_ePiCoinTime_ROC1", "CTime.ePiCoinTime_ROC1"), ("CTime_eKCoinTime_ROC1", "CTime.eKCoinTime_ROC1"), ("CTime_epCoinTime_ROC1", "CTime.epCoinTime_ROC1"),
+            ("P_gtr_beta", "P.gtr.beta"), ("P_gtr_xp", "P.gtr.th"), ("P_gtr_yp", "P.gtr.ph"), ("P_gtr_p", "P.gtr.p"), ("P_gtr_dp", "P.gtr.dp"), ("P_cal_etotnorm", "P.cal.etotnorm"),
+            ("P_aero_npeSum", "P.aero.npeSum"), ("P_hgcer_npeSum", "P.hgcer.npeSum"), ("P_hgcer_xAtCer", "P.hgcer.xAtCer"), ("P_hgcer_yAtCer", "P.hgcer.yAtCer")]
+MMBranches = [("MMpi", "P.kin.secondary.MMpi"), ("MMK", "P.kin.secondary.MMK"), ("MMp", "P.kin.secondary.MMp")]
+ReadBranches = list(Branches)
+if "_HeepCoin" in Suffixes:
+    ReadBranches += MMBranches
+# The cuts are evaluated by name (e.g. P_cal_etotnorm) so each branch is kept as a global of the same name
+for (name, branch) in ReadBranches:
+    globals()[name] = e_tree.array(branch)
 # Relevant branches now stored as NP arrays
 
 r = klt.pyRoot()
@@ -123,54 +163,62 @@ def make_cutDict(cut,inputDict=None):
         
     return inputDict
 
-cutDict = make_cutDict("coin_epi_cut_all")
-cutDict = make_cutDict("coin_ek_cut_all", cutDict)
-cutDict = make_cutDict("coin_ep_cut_all", cutDict)
+# Each cut is only evaluated once, however many species use it
+Cuts = sorted(set(Spec[2] for Spec in Requested))
+cutDict = None
+for cut in Cuts:
+    if cut not in readDict:
+        print("!!!!! ERROR !!!!!\n Cut %s not found in %s \n!!!!! ERROR !!!!!" % (cut, fout))
+        sys.exit(1)
+    cutDict = make_cutDict(cut, cutDict)
 c = klt.pyPlot(REPLAYPATH,cutDict)
-
-def coin_events(): 
-    # Define the array of arrays containing the relevant HMS and SHMS info
-    All_Events_Uncut_tmp = [H_gtr_beta, H_gtr_xp, H_gtr_yp, H_gtr_dp, H_cal_etotnorm, H_cer_npeSum, CTime_ePiCoinTime_ROC1, CTime_eKCoinTime_ROC1, CTime_epCoinTime_ROC1, P_gtr_beta, P_gtr_xp, P_gtr_yp, P_gtr_p, P_gtr_dp, P_cal_etotnorm, P_aero_npeSum, P_hgcer_npeSum, P_hgcer_xAtCer, P_hgcer_yAtCer]
-    All_Events_Uncut = [(HBeta, Hxp, Hyp, Hdel, HCal, HCer, CTPi, CTK, CTp, KBeta, Kxp, Kyp, KP, KDel, KCal, KAero, KHGC, KHGCX, KHGCY) for (HBeta, Hxp, Hyp, Hdel, HCal, HCer, CTPi, CTK, CTp, KBeta, Kxp, Kyp, KP, KDel, KCal, KAero, KHGC, KHGCX, KHGCY) in zip(*All_Events_Uncut_tmp)] 
-
-    # Create array of arrays of pions and kaons after cuts, all events, prompt and random
-    Pion_Events_All_tmp =[]
-    Kaon_Events_All_tmp = []
-    Proton_Events_All_tmp = []
-
-    # Go over every array in All_Events_Uncut_tmp, append to the other arrays the array after a cut is applied
-    for arr in All_Events_Uncut_tmp:
-        Pion_Events_All_tmp.append(c.add_cut(arr, "coin_epi_cut_all")) # Apply PID but no cointime cut
-        Kaon_Events_All_tmp.append(c.add_cut(arr, "coin_ek_cut_all")) # Apply PID but no cointime cut
-        Proton_Events_All_tmp.append(c.add_cut(arr, "coin_ep_cut_all")) # Apply PID but no cointime cut
-      
-    Pion_Events_All = [(HBeta, Hxp, Hyp, Hdel, HCal, HCer, CTPi, CTK, CTp, KBeta, Kxp, Kyp, KP, KDel, KCal, KAero, KHGC, KHGCX, KHGCY) for (HBeta, Hxp, Hyp, Hdel, HCal, HCer, CTPi, CTK, CTp, KBeta, Kxp, Kyp, KP, KDel, KCal, KAero, KHGC, KHGCX, KHGCY) in zip(*Pion_Events_All_tmp)] 
-    Kaon_Events_All = [(HBeta, Hxp, Hyp, Hdel, HCal, HCer, CTPi, CTK, CTp, KBeta, Kxp, Kyp, KP, KDel, KCal, KAero, KHGC, KHGCX, KHGCY) for (HBeta, Hxp, Hyp, Hdel, HCal, HCer, CTPi, CTK, CTp, KBeta, Kxp, Kyp, KP, KDel, KCal, KAero, KHGC, KHGCX, KHGCY) in zip(*Kaon_Events_All_tmp)]
-    Proton_Events_All = [(HBeta, Hxp, Hyp, Hdel, HCal, HCer, CTPi, CTK, CTp, KBeta, Kxp, Kyp, KP, KDel, KCal, KAero, KHGC, KHGCX, KHGCY) for (HBeta, Hxp, Hyp, Hdel, HCal, HCer, CTPi, CTK, CTp, KBeta, Kxp, Kyp, KP, KDel, KCal, KAero, KHGC, KHGCX, KHGCY) in zip(*Proton_Events_All_tmp)]
-
-    COIN_EventInfo = {
-        "All_Events" : All_Events_Uncut,
-        "Pions_All" : Pion_Events_All,
-        "Kaons_All" : Kaon_Events_All,
-        "Protons_All" : Proton_Events_All,
-        }
-
+# Indices of the events passing each cut, every branch of a species is then just indexed rather than cut again
+CutEvents = {}
+for cut in Cuts:
+    CutEvents[cut] = c.add_cut(np.arange(len(H_gtr_beta)), cut)
+
+def coin_events(Suffix):
+    Header = [name for (name, branch) in Branches]
+    if (Suffix == "_HeepCoin"):
+        Header += [name for (name, branch) in MMBranches]
+    # All_Events has to be first, it creates the output file and the species trees are appended to it
+    COIN_EventInfo = OrderedDict()
+    COIN_EventInfo["All_Events"] = pd.DataFrame(dict((name, globals()[name]) for name in Header), columns = Header)
+    # Apply PID but no cointime cut
+    for (name, tree, cut, branch, suffix) in Requested:
+        if (suffix == Suffix):
+            COIN_EventInfo[tree] = COIN_EventInfo["All_Events"].iloc[CutEvents[cut]].reset_index(drop=True)
     return COIN_EventInfo
 
-def main():
-    COIN_Data = coin_events()
-
-    COIN_All_Data_Header = ["H_gtr_beta","H_gtr_xp","H_gtr_yp","H_gtr_dp","H_cal_etotnorm","H_cer_npeSum","CTime_ePiCoinTime_ROC1","CTime_eKCoinTime_ROC1","CTime_epCoinTime_ROC1","P_gtr_beta","P_gtr_xp","P_gtr_yp","P_gtr_p","P_gtr_dp","P_cal_etotnorm","P_aero_npeSum","P_hgcer_npeSum","P_hgcer_xAtCer","P_hgcer_yAtCer"]
+# Histogram the cointime of each species after its PID cut, returns {histogram name : histogram}
+def coin_histograms(Suffix):
+    Histos = {}
+    for (name, tree, cut, branch, suffix) in Requested:
+        if (suffix != Suffix):
+            continue
+        CT = globals()[branch][CutEvents[cut]]
+        Histos["h1_CT_%ss" % name] = histogram(CT, NBins, CTMin, CTMax)
+        if (OutputMode == "hist2d"):
+            Beta = P_gtr_beta[CutEvents[cut]]
+            Finite = np.isfinite(CT) & np.isfinite(Beta)
+            Histos["h2_CT_Beta_%ss" % name] = np.histogram2d(CT[Finite], Beta[Finite], bins=(NBins, BetaBins), range=((CTMin, CTMax), (BetaMin, BetaMax)))
+    return Histos
 
-    data_keys = list(COIN_Data.keys()) # Create a list of all the keys in all dicts added above, each is an array of data
-    #print(data_keys)
+def main():
+    for Suffix in Suffixes:
+        if (OutputMode != "tree"):
+            OutHisto_file = up.recreate("%s/%s_%s_CTPeak_Hist%s.root" % (OUTPATH, runNum, MaxEvent, Suffix))
+            for name, Histo in coin_histograms(Suffix).items():
+                OutHisto_file[name] = Histo
+            OutHisto_file.close()
+            continue
+        COIN_Data = coin_events(Suffix)
+        data_keys = list(COIN_Data.keys()) # Create a list of all the keys in all dicts added above, each is an array of data
+        for i in range (0, len(data_keys)):
+            if (i == 0):
+                COIN_Data.get(data_keys[i]).to_root("%s/%s_%s_CTPeak_Data%s.root" % (OUTPATH, runNum, MaxEvent, Suffix), key ="%s" % data_keys[i])
+            elif (i != 0):
+                COIN_Data.get(data_keys[i]).to_root("%s/%s_%s_CTPeak_Data%s.root" % (OUTPATH, runNum, MaxEvent, Suffix), key ="%s" % data_keys[i], mode ='a')
 
-    for i in range (0, len(data_keys)):
-        DFHeader=list(COIN_All_Data_Header)
-        if (i == 0):
-            pd.DataFrame(COIN_Data.get(data_keys[i]), columns = DFHeader, index = None).to_root("%s/%s_%s_CTPeak_Data.root" % (OUTPATH, runNum, MaxEvent), key ="%s" % data_keys[i])
-        elif (i != 0):
-            pd.DataFrame(COIN_Data.get(data_keys[i]), columns = DFHeader, index = None).to_root("%s/%s_%s_CTPeak_Data.root" % (OUTPATH, runNum, MaxEvent), key ="%s" % data_keys[i], mode ='a') 
-                    
 if __name__ == '__main__':
     main()
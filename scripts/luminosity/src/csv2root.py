@@ -34,14 +34,13 @@ elif ("trottar" in HOST[1]):
 print("Running as %s on %s, hallc_replay_lt path assumed as %s" % (USER[1], HOST[1], REPLAYPATH))
 
 if csv == "lumi_data":
-    inp_f = "%s/UTIL_PION/OUTPUT/Analysis/Lumi/lumi_data.csv" % str(REPLAYPATH)
+    inp_f = "%s/UTIL_PION/OUTPUT/Analysis/Lumi/lumi_data.db" % str(REPLAYPATH)
     out_f = "%s/UTIL_PION/OUTPUT/Analysis/Lumi/lumi_data.root" % str(REPLAYPATH)
-    try:
-        lumi_data = dict(pd.read_csv(inp_f))
-    except IOError:
+    if not os.path.isfile(inp_f):
         print("Error: %s does not appear to exist." % inp_f)
+        sys.exit(1)
+    lumi_data = klt.pyStore(inp_f, "lumi_data", key="run number", version=klt.__version__).to_root(out_f)
     print(lumi_data.keys())
-    r.csv2root(lumi_data,out_f)
 elif csv == "yield_data":
     inp_f = "%s/UTIL_PION/OUTPUT/Analysis/Lumi/yield_data.csv" % str(REPLAYPATH)
     out_f = "%s/UTIL_PION/OUTPUT/Analysis/Lumi/yield_data.root" % str(REPLAYPATH)
@@ -21,6 +21,8 @@ import kaonlt as klt
 
 runNum = sys.argv[1]
 MaxEvent=sys.argv[2]
+# Optional third argument "online", for runs still being replayed
+ONLINE = (len(sys.argv) > 3 and sys.argv[3] == "online")
 
 # Add this to all files for more dynamic pathing
 USER = subprocess.getstatusoutput("whoami") # Grab user info for file finding
@@ -36,6 +38,8 @@ elif ("trottar" in HOST[1]):
 print("Running as %s on %s, hallc_replay_lt path assumed as %s" % (USER[1], HOST[1], REPLAYPATH))
 
 filename = "%s/UTIL_PION/OUTPUT/Analysis/Lumi/lumi_data.csv" % REPLAYPATH
+dbname = "%s/UTIL_PION/OUTPUT/Analysis/Lumi/lumi_data.db" % REPLAYPATH
+scalerState = "%s/UTIL_PION/OUTPUT/Analysis/Lumi/scaler_state_%s_%s.pkl" % (REPLAYPATH,runNum,MaxEvent)
 rootName = "%s/UTIL_PION/ROOTfiles/Analysis/Lumi/coin_replay_Full_Lumi_%s_%s.root" % (REPLAYPATH,runNum,MaxEvent)
 # report = "/u/group/c-pionlt/USERS/%s/kaonlt/REPORT_OUTPUT/coin_replay_Full_Lumi_%s_%s.report" % (USER[1],runNum,MaxEvent)
 report = "%s/UTIL_PION/REPORT_OUTPUT/Analysis/Lumi/replay_coin_Lumi_%s_%s.report" % (REPLAYPATH,runNum,MaxEvent)
@@ -43,251 +47,54 @@ report = "%s/UTIL_PION/REPORT_OUTPUT/Analysis/Lumi/replay_coin_Lumi_%s_%s.report
 thres_curr = 2.5
 # thres_curr = 10.0
 
-f = open(report)
-
-psList = ['Ps1_factor','Ps3_factor','Ps5_factor']
-
-psActual = [-1,1,2,3,5,9,17,33,65,129,257,513,1025,2049,4097,8193,16385,32769]
-psValue = [-1,0,1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16]
-
-for line in f:
-    data = line.split('=')
-    curr_data = line.split(':')
-    if ('SHMS BCM4A Beam Cut Current' in curr_data[0]) :
-        report_current_tmp = curr_data[1].split(" ")[1]
-    for index, obj in enumerate(psList) :
-        if (psList[index] in data[0]) : 
-            if (index == 0) :  
-                ps1_tmp = data[1].split(" ")
-            if (index == 1) : 
-                ps3_tmp = data[1].split(" ")
-            if (index == 2) :
-                ps5_tmp = data[1].split(" ")
-ps1=int(ps1_tmp[1])
-ps3=int(ps3_tmp[1])
-ps5=int(ps5_tmp[1])
-report_current = float(report_current_tmp)        
-
-for i,index in enumerate(psActual):
-    #psValue
-    if (index == ps1) :
-        if(index == -1):
-            PS1 = 0
-        else:
-            PS1 = psActual[i]
-    if (index == ps3) :
-        if(index == -1):
-            PS3 = 0
-        else:
-            PS3 = psActual[i]
-    if (index == ps5) :
-        if(index == -1):
-            PS5 = 0
-        else:
-            PS5 = psActual[i]
-f.close()
+rep = klt.pyReport(report)
+report_current = rep.get('SHMS BCM4A Beam Cut Current')
+PS1 = rep.ps_factor(1)
+PS3 = rep.ps_factor(3)
+PS5 = rep.ps_factor(5)
 
 '''
 SCALER TREE, TSH
 '''
 
 s_tree = up.open(rootName)["TSP"]
-s_branch = klt.pyBranch(s_tree)
-
-# s_evts = len(s_tree)
-s_evts = s_tree.array("P.BCM4A.scaler")
-
-P_BCM4A_scalerCharge = s_tree.array("P.BCM4A.scalerCharge")
-P_BCM2_scalerCharge = s_tree.array("P.BCM2.scalerCharge")
-P_BCM4B_scalerCharge = s_tree.array("P.BCM4B.scalerCharge")
-P_BCM1_scalerCharge = s_tree.array("P.BCM1.scalerCharge")
-P_BCM4C_scalerCharge = s_tree.array("P.BCM4C.scalerCharge")
-
-P_BCM4A_scalerCurrent = s_tree.array("P.BCM4A.scalerCurrent")
-P_BCM2_scalerCurrent = s_tree.array("P.BCM2.scalerCurrent")
-P_BCM4B_scalerCurrent = s_tree.array("P.BCM4B.scalerCurrent")
-P_BCM1_scalerCurrent = s_tree.array("P.BCM1.scalerCurrent")
-P_BCM4C_scalerCurrent = s_tree.array("P.BCM4C.scalerCurrent")
-
-P_1Mhz_scalerTime = s_tree.array("P.1MHz.scalerTime")
-
-P_pTRIG1_scaler = s_tree.array("P.pTRIG1.scaler")
-P_pTRIG2_scaler = s_tree.array("P.pTRIG2.scaler")
-P_pTRIG3_scaler = s_tree.array("P.pTRIG3.scaler")
-P_pTRIG4_scaler = s_tree.array("P.pTRIG4.scaler")
-P_pTRIG5_scaler = s_tree.array("P.pTRIG5.scaler")
-P_pTRIG6_scaler = s_tree.array("P.pTRIG6.scaler")
-
-P_pL1ACCP_scaler = s_tree.array("P.pL1ACCP.scaler")
-P_pPRE40_scaler = s_tree.array("P.pPRE40.scaler")
-P_pPRE100_scaler = s_tree.array("P.pPRE100.scaler")
-P_pPRE150_scaler = s_tree.array("P.pPRE150.scaler")
-P_pPRE200_scaler = s_tree.array("P.pPRE200.scaler")
-P_pPRE40_scaler = s_tree.array("P.pPRE40.scaler")
-P_pPRE100_scaler = s_tree.array("P.pPRE100.scaler")
-P_pPRE150_scaler = s_tree.array("P.pPRE150.scaler")
-P_pPRE200_scaler = s_tree.array("P.pPRE200.scaler")
-
-P_pEL_LO_LO_scaler = s_tree.array("P.pEL_LO_LO.scaler")
-P_pEL_LO_scaler = s_tree.array("P.pEL_LO.scaler")
-P_pEL_HI_scaler = s_tree.array("P.pEL_HI.scaler")
-P_pEL_REAL_scaler = s_tree.array("P.pEL_REAL.scaler")
-P_pEL_CLEAN_scaler = s_tree.array("P.pEL_CLEAN.scaler")
-P_pSTOF_scaler = s_tree.array("P.pSTOF.scaler")
-
-P_pEL_LO_LO_scaler = s_tree.array("P.pEL_LO_LO.scaler")
-P_pEL_LO_scaler = s_tree.array("P.pEL_LO.scaler")
-P_pEL_HI_scaler = s_tree.array("P.pEL_HI.scaler")
-P_pEL_REAL_scaler = s_tree.array("P.pEL_REAL.scaler")
-P_pEL_CLEAN_scaler = s_tree.array("P.pEL_CLEAN.scaler")
-P_pSTOF_scaler = s_tree.array("P.pSTOF.scaler")
-P_pPRHI_scaler = s_tree.array("P.PRHI.scaler")
-P_pPRLO_scaler = s_tree.array("P.PRLO.scaler")
-
-P_EDTM_scaler = s_tree.array("P.EDTM.scaler")
+
+# Online runs keep the scaler sums between calls so only the new scaler reads are processed
+if ONLINE:
+    s_acc = klt.pyScaler.load(scalerState, report_current, thres_curr)
+else:
+    s_acc = klt.pyScaler(report_current, thres_curr)
+s_acc.read(s_tree)
+if ONLINE:
+    s_acc.save(scalerState)
 
 def scaler(runNum, PS1, PS3, thres_curr):
 
     NBCM = 5
-    NTRIG = 6
-    NPRE = 4
-    NRATE = 6
-    SHMSNRATE = 8
 
     bcm_name = ["BCM1 ", "BCM2 ", "BCM4A", "BCM4B", "BCM4C"]
 
     trig_name = ["TRIG1", "TRIG2", "TRIG3", "TRIG4", "TRIG5", "TRIG6"]
 
-    PRE_name = ["40", "100", "150", "200"]
-
-    rate_name = ["EL_LO_LO", "EL_LO", "EL_HI", "EL_REAL", "EL_CLEAN", "STOF"]
-
-    SHMS_rate_name = ["EL_LO_LO", "EL_LO", "EL_HI",
-                      "EL_REAL", "EL_CLEAN", "STOF", "PR_HI", "PR_LO"]
-
-    bcm_value = [P_BCM1_scalerCharge, P_BCM2_scalerCharge,
-                 P_BCM4A_scalerCharge, P_BCM4B_scalerCharge, P_BCM4C_scalerCharge]
-
-    time_value = P_1Mhz_scalerTime
-
-    current = [P_BCM1_scalerCurrent, P_BCM2_scalerCurrent,
-                 P_BCM4A_scalerCurrent, P_BCM4B_scalerCurrent, P_BCM4C_scalerCurrent]
-
-    trig_value = [P_pTRIG1_scaler, P_pTRIG2_scaler, P_pTRIG3_scaler,
-                  P_pTRIG4_scaler, P_pTRIG5_scaler, P_pTRIG6_scaler]
-
-    acctrig_value = P_pL1ACCP_scaler
-
-    PRE_value = [P_pPRE40_scaler, P_pPRE100_scaler,
-                 P_pPRE150_scaler, P_pPRE200_scaler]
-
-    SHMS_PRE_value = [P_pPRE40_scaler, P_pPRE100_scaler,
-                      P_pPRE150_scaler, P_pPRE200_scaler]
-
-    rate_value = [P_pEL_LO_LO_scaler, P_pEL_LO_scaler, P_pEL_HI_scaler,
-                  P_pEL_REAL_scaler, P_pEL_CLEAN_scaler, P_pSTOF_scaler]
-
-    SHMS_rate_value = [P_pEL_LO_LO_scaler, P_pEL_LO_scaler, P_pEL_HI_scaler,
-                       P_pEL_REAL_scaler, P_pEL_CLEAN_scaler, P_pSTOF_scaler, P_pPRHI_scaler, P_pPRLO_scaler]
-
-    EDTM_value = P_EDTM_scaler
-
-    # Variables useful in Process
-    # To find total charge
-    name = [0]*NBCM
-    charge_sum = [0]*NBCM
-    time_sum = [0]*NBCM
-    previous_charge = [0]*NBCM
-    previous_time = 0
-    previous_time = [0]*NBCM
-    current_I = 0
-    current_time = 0
-
-    # To determine computer livetime
-    name = [0]*NTRIG
-    trig_sum = [0]*NTRIG
-    previous_trig = [0]*NTRIG
-    pretrigger = 0
-    previous_pretrigger = 0
-    acctrig_sum = 0
-    previous_acctrig = 0
-
-    # To determine HMS electronic livetime
-    name = [0]*NPRE
-    PRE_sum = [0]*NPRE
-    previous_PRE = [0]*NPRE
-
-    # To determine SHMS electronic livetime
-    SHMS_PRE_sum = [0]*NPRE
-    SHMS_previous_PRE = [0]*NPRE
-
-    # To determine HMS trigger rates
-    name = [0]*NRATE
-    rate_sum = [0]*NRATE
-    previous_rate = [0]*NRATE
-
-    # To determine SHMS trigger rates
-    rate_name = [0]*SHMSNRATE
-    SHMS_rate_sum = [0]*SHMSNRATE
-    SHMS_previous_rate = [0]*SHMSNRATE
-
-    # To determine number of EDTM events
-    EDTM_sum = 0
-    EDTM_current = 0
-    previous_EDTM = 0
-    
-    # for itrig in range(0, NTRIG):
-        # print("trig_value[%s] = " %(itrig),trig_value[itrig][:5])
-        # print(len(trig_value[itrig]))
-        
-    for ibcm in range(0, 5):
-        previous_acctrig = (acctrig_value[0] - EDTM_current)
-        previous_EDTM = EDTM_value[0]
-        for itrig in range(0, NTRIG):
-            previous_trig[itrig] = trig_value[itrig][0]
-        for iPRE in range(0, NPRE):
-            previous_PRE[iPRE] = PRE_value[iPRE][0]
-            SHMS_previous_PRE[iPRE] = SHMS_PRE_value[iPRE][0]
-        for iRATE in range(0, NRATE):
-            previous_rate[iRATE] = rate_value[iRATE][0]
-        for iRATE in range(0, SHMSNRATE):
-            SHMS_previous_rate[iRATE] = SHMS_rate_value[iRATE][0]
-        previous_time[ibcm] = time_value[0]
-        previous_charge[ibcm] = bcm_value[ibcm][0]
-        for i, evt in enumerate(s_evts):
-            if (time_value[i] != previous_time[ibcm]):
-                current_I = (bcm_value[ibcm][i] -
-                             previous_charge[ibcm])/(time_value[i] - previous_time[ibcm])
-            if (abs( current[ibcm][i]-report_current) < thres_curr ):
-                charge_sum[ibcm] += (bcm_value[ibcm][i] - previous_charge[ibcm])
-                time_sum[ibcm] += (time_value[i] - previous_time[ibcm])
-            if (ibcm == 2 and abs( current[ibcm][i]-report_current) < thres_curr):
-                EDTM_current = (EDTM_value[i] - previous_EDTM)
-                EDTM_sum += EDTM_current
-                acctrig_sum += ((acctrig_value[i] - EDTM_current) - previous_acctrig)
-                for itrig in range(0, NTRIG):
-                    trig_sum[itrig] += (trig_value[itrig][i] - previous_trig[itrig])
-                    # print("trig_value[%s] = " %(itrig),trig_value[itrig][i])
-                for iPRE in range(0, NPRE):
-                    PRE_sum[iPRE] += (PRE_value[iPRE][i] - previous_PRE[iPRE])
-                    SHMS_PRE_sum[iPRE] += (SHMS_PRE_value[iPRE][i] - SHMS_previous_PRE[iPRE])
-                for iRATE in range(0, NRATE):
-                    rate_sum[iRATE] += (rate_value[iRATE][i] - previous_rate[iRATE])
-                for iRATE in range(0, SHMSNRATE):
-                    SHMS_rate_sum[iRATE] += (SHMS_rate_value[iRATE][i] - SHMS_previous_rate[iRATE])
-            previous_acctrig = (acctrig_value[i] - EDTM_current)
-            previous_EDTM = EDTM_value[i]
-            for itrig in range(0, NTRIG):
-                previous_trig[itrig] = trig_value[itrig][i]
-            for iPRE in range(0, NPRE):
-                previous_PRE[iPRE] = PRE_value[iPRE][i]
-                SHMS_previous_PRE[iPRE] = SHMS_PRE_value[iPRE][i]
-            for iRATE in range(0, NRATE):
-                previous_rate[iRATE] = rate_value[iRATE][i]
-            for iRATE in range(0, SHMSNRATE):
-                SHMS_previous_rate[iRATE] = SHMS_rate_value[iRATE][i]
-            previous_time[ibcm] = time_value[i]
-            previous_charge[ibcm] = bcm_value[ibcm][i]
+    charge_sum = s_acc.charge_sum
+    time_sum = s_acc.time_sum
+    trig_sum = s_acc.trig_sum
+    acctrig_sum = s_acc.acctrig_sum
+    # HMS and SHMS electronic livetime use the same pretrigger scalers
+    PRE_sum = s_acc.PRE_sum
+    SHMS_PRE_sum = s_acc.PRE_sum
+    EDTM_sum = s_acc.EDTM_sum
+
+    # Prescaled triggers of the spectrometers in use, a prescale of 0 means the trigger was off
+    if PS1 == 0:
+        prescaled = [trig_sum[2]/PS3]
+    elif PS3 == 0:
+        prescaled = [trig_sum[0]/PS1]
+    else:
+        prescaled = [trig_sum[0]/PS1, trig_sum[2]/PS3]
+    (CPULT, CPULT_uncern) = klt.pyStats.livetime(acctrig_sum, *prescaled)
+    (HMS_eLT, HMS_eLT_uncern) = klt.pyStats.elivetime(PRE_sum[1], PRE_sum[2])
+    (SHMS_eLT, SHMS_eLT_uncern) = klt.pyStats.elivetime(SHMS_PRE_sum[1], SHMS_PRE_sum[2])
 
     if PS1 == 0 :
         scalers = {
@@ -298,10 +105,10 @@ def scaler(runNum, PS1, PS3, thres_curr):
             "charge": charge_sum[1],
             "TRIG1_scaler": trig_sum[0],
             "TRIG3_scaler": trig_sum[2],
-            "CPULT_scaler": acctrig_sum/(trig_sum[2]/PS3),
-            "CPULT_scaler_uncern": (acctrig_sum/((trig_sum[2]/PS3)))*np.sqrt((1/(trig_sum[2]/PS3))+(1/acctrig_sum)),
-            "HMS_eLT": 1 - ((6/5)*(PRE_sum[1]-PRE_sum[2])/(PRE_sum[1])),
-            "HMS_eLT_uncern": (PRE_sum[1]-PRE_sum[2])/(PRE_sum[1])*np.sqrt((np.sqrt(PRE_sum[1]) + np.sqrt(PRE_sum[2]))/(PRE_sum[1] - PRE_sum[2]) + (np.sqrt(PRE_sum[1])/PRE_sum[1])),
+            "CPULT_scaler": CPULT,
+            "CPULT_scaler_uncern": CPULT_uncern,
+            "HMS_eLT": HMS_eLT,
+            "HMS_eLT_uncern": HMS_eLT_uncern,
             "SHMS_eLT": 0,
             "SHMS_eLT_uncern": 0,
             "sent_edtm": EDTM_sum
@@ -316,12 +123,12 @@ def scaler(runNum, PS1, PS3, thres_curr):
             "charge": charge_sum[1],
             "TRIG1_scaler": trig_sum[0],
             "TRIG3_scaler": trig_sum[2],
-            "CPULT_scaler": acctrig_sum/((trig_sum[0]/PS1)),
-            "CPULT_scaler_uncern": (acctrig_sum/((trig_sum[0]/PS1))*np.sqrt((1/(trig_sum[0]/PS1)))+(1/acctrig_sum)),
+            "CPULT_scaler": CPULT,
+            "CPULT_scaler_uncern": CPULT_uncern,
             "HMS_eLT": 0,
             "HMS_eLT_uncern": 0,
-            "SHMS_eLT": 1 - ((6/5)*(SHMS_PRE_sum[1]-SHMS_PRE_sum[2])/(SHMS_PRE_sum[1])),
-            "SHMS_eLT_uncern": (SHMS_PRE_sum[1]-SHMS_PRE_sum[2])/(SHMS_PRE_sum[1])*np.sqrt((np.sqrt(SHMS_PRE_sum[1]) + np.sqrt(SHMS_PRE_sum[2]))/(SHMS_PRE_sum[1] - SHMS_PRE_sum[2]) + (np.sqrt(SHMS_PRE_sum[1])/SHMS_PRE_sum[1])),
+            "SHMS_eLT": SHMS_eLT,
+            "SHMS_eLT_uncern": SHMS_eLT_uncern,
             "sent_edtm": EDTM_sum
 
         }
@@ -335,12 +142,12 @@ def scaler(runNum, PS1, PS3, thres_curr):
             "charge": charge_sum[1],
             "TRIG1_scaler": trig_sum[0],
             "TRIG3_scaler": trig_sum[2],
-            "CPULT_scaler": acctrig_sum/((trig_sum[0]/PS1) + (trig_sum[2]/PS3)),
-            "CPULT_scaler_uncern": (acctrig_sum/((trig_sum[0]/PS1) + (trig_sum[2]/PS3)))*np.sqrt((1/(trig_sum[0]/PS1))+(1/(trig_sum[2]/PS3))+(1/acctrig_sum)),
-            "HMS_eLT": 1 - ((6/5)*(PRE_sum[1]-PRE_sum[2])/(PRE_sum[1])),
-            "HMS_eLT_uncern": (PRE_sum[1]-PRE_sum[2])/(PRE_sum[1])*np.sqrt((np.sqrt(PRE_sum[1]) + np.sqrt(PRE_sum[2]))/(PRE_sum[1] - PRE_sum[2]) + (np.sqrt(PRE_sum[1])/PRE_sum[1])),
-            "SHMS_eLT": 1 - ((6/5)*(SHMS_PRE_sum[1]-SHMS_PRE_sum[2])/(SHMS_PRE_sum[1])),
-            "SHMS_eLT_uncern": (SHMS_PRE_sum[1]-SHMS_PRE_sum[2])/(SHMS_PRE_sum[1])*np.sqrt((np.sqrt(SHMS_PRE_sum[1]) + np.sqrt(SHMS_PRE_sum[2]))/(SHMS_PRE_sum[1] - SHMS_PRE_sum[2]) + (np.sqrt(SHMS_PRE_sum[1])/SHMS_PRE_sum[1])),
+            "CPULT_scaler": CPULT,
+            "CPULT_scaler_uncern": CPULT_uncern,
+            "HMS_eLT": HMS_eLT,
+            "HMS_eLT_uncern": HMS_eLT_uncern,
+            "SHMS_eLT": SHMS_eLT,
+            "SHMS_eLT_uncern": SHMS_eLT_uncern,
             "sent_edtm": EDTM_sum
             
         }
@@ -431,7 +238,7 @@ P_dc_2x2_nhit = tree.array("P.dc.2x2.nhit")
 P_dc_2v2_nhit = tree.array("P.dc.2v2.nhit")
 
 # H_bcm_bcm4a_AvgCurrent = tree.array("H.bcm.bcm4b.AvgCurrent")
-H_bcm_bcm4a_AvgCurrent = np.full(len(W),np.average(P_BCM4A_scalerCharge))
+H_bcm_bcm4a_AvgCurrent = np.full(len(W),s_acc.charge_average("BCM4A"))
 
 T_coin_pTRIG1_ROC1_tdcTime = tree.array("T.coin.pTRIG1_ROC1_tdcTime")
 T_coin_pTRIG3_ROC1_tdcTime = tree.array("T.coin.pTRIG3_ROC1_tdcTime")
@@ -448,8 +255,8 @@ fout = REPLAYPATH+'/UTIL_PION/DB/CUTS/run_type/lumi.cuts'
 
 # read in cuts file and make dictionary
 c = klt.pyPlot(REPLAYPATH)
-# apply RF cuts to timing cuts file
-c.cut_RF(runNum,MaxEvent)
+# RF distance (P_RF_Dist) for the RF timing cuts
+c.cut_RF(runNum,MaxEvent,globals(),tree)
 readDict = c.read_dict(fout,runNum)
 
 # This method calls several methods in kaonlt package. It is required to create properly formated
@@ -707,91 +514,51 @@ def analysis(PS1, PS3, thres_curr):
     h_ecuts_goodscinhit = c.add_cut(H_hod_goodscinhit,"h_ecut_lumi_eff")
     p_pcuts_goodscinhit = c.add_cut(P_hod_goodscinhit,"p_pcut_lumi_eff")
                                                         
-    if PS1 == -1 or PS1 == 0:
-        track_info = {
-            
-            "HMS_evts_scalar" : len(h_ecut_lumi_eff),
-            "HMS_evts_scalar_uncern" : math.sqrt(len(h_ecut_lumi_eff)),
-            "SHMS_evts_scalar" : 0,
-            "SHMS_evts_scalar_uncern" : 0,
-            "h_int_goodscin_evts" : scipy.integrate.simps(h_ecuts_goodscinhit),
-            "p_int_goodscin_evts" : scipy.integrate.simps(p_pcuts_goodscinhit),
-            "TRIG1_cut" : len(TRIG1_cut),
-            "TRIG3_cut" : len(TRIG3_cut),
-            "HMS_track" : len(h_track_lumi_after)/len(h_track_lumi_before),
-            "HMS_track_uncern" : (len(h_track_lumi_after)/len(h_track_lumi_before))*math.sqrt((1/len(h_track_lumi_after)) + (1/len(h_track_lumi_before))),
-            "etrack" : len(h_etrack_lumi_after)/len(h_etrack_lumi_before),
-            "etrack_uncern" : (len(h_etrack_lumi_after)/len(h_etrack_lumi_before))*math.sqrt((1/len(h_etrack_lumi_after)) + (1/len(h_etrack_lumi_before))),
-            "SHMS_track" : 0,
-            "SHMS_track_uncern" : 0,
-            "hadtrack" : 0,
-            "hadtrack_uncern" : 0,
-            "pitrack" : 0,
-            "pitrack_uncern" : 0,
-            "Ktrack" : 0,
-            "Ktrack_uncern" : 0,
-            "ptrack" : 0,
-            "ptrack_uncern" : 0,
-            "accp_edtm" : (len(EDTM)),
-            
-        }
-    elif PS3 == -1 or PS3 == 0:
-        track_info = {
-            
-            "HMS_evts_scalar" : 0,
-            "HMS_evts_scalar_uncern" : 0,
-            "SHMS_evts_scalar" : len(p_pcut_lumi_eff),
-            "SHMS_evts_scalar_uncern" : math.sqrt(len(p_pcut_lumi_eff)),
-            "intW_evts" : scipy.integrate.simps(h_ecut_W),
-            "h_int_goodscin_evts" : scipy.integrate.simps(h_ecuts_goodscinhit),
-            "p_int_goodscin_evts" : scipy.integrate.simps(p_pcuts_goodscinhit),
-            "TRIG1_cut" : len(TRIG1_cut),
-            "TRIG3_cut" : len(TRIG3_cut),
-            "HMS_track" : 0,
-            "HMS_track_uncern" : 0,
-            "etrack" : 0,
-            "etrack_uncern" : 0,
-            "SHMS_track" : len(p_track_lumi_after)/len(p_track_lumi_before),
-            "SHMS_track_uncern" : (len(p_track_lumi_after)/len(p_track_lumi_before))*math.sqrt((1/len(p_track_lumi_after)) + (1/len(p_track_lumi_before))),
-            "hadtrack" : len(p_hadtrack_lumi_after)/len(p_hadtrack_lumi_before),
-            "hadtrack_uncern" : (len(p_hadtrack_lumi_after)/len(p_hadtrack_lumi_before))*math.sqrt((1/len(p_hadtrack_lumi_after)) + (1/len(p_hadtrack_lumi_before))),
-            "pitrack" : len(p_pitrack_lumi_after)/len(p_pitrack_lumi_before),
-            "pitrack_uncern" : (len(p_pitrack_lumi_after)/len(p_pitrack_lumi_before))*math.sqrt((1/len(p_pitrack_lumi_after)) + (1/len(p_pitrack_lumi_before))),
-            "Ktrack" : len(p_ktrack_lumi_after)/len(p_ktrack_lumi_before),
-            "Ktrack_uncern" : (len(p_ktrack_lumi_after)/len(p_ktrack_lumi_before))*math.sqrt((1/len(p_ktrack_lumi_after)) + (1/len(p_ktrack_lumi_before))),
-            "ptrack" : len(p_ptrack_lumi_after)/len(p_ptrack_lumi_before),
-            "ptrack_uncern" : (len(p_ptrack_lumi_after)/len(p_ptrack_lumi_before))*math.sqrt((1/len(p_ptrack_lumi_after)) + (1/len(p_ptrack_lumi_before))),
-            "accp_edtm" : (len(EDTM)),
-
-        }
-    else:
-        track_info = {
-            
-            "HMS_evts_scalar" : len(h_ecut_lumi_eff),
-            "HMS_evts_scalar_uncern" : math.sqrt(len(h_ecut_lumi_eff)),
-            "SHMS_evts_scalar" : len(p_pcut_lumi_eff),
-            "SHMS_evts_scalar_uncern" : math.sqrt(len(p_pcut_lumi_eff)),
-            "h_int_goodscin_evts" : scipy.integrate.simps(h_ecuts_goodscinhit),
-            "p_int_goodscin_evts" : scipy.integrate.simps(p_pcuts_goodscinhit),
-            "TRIG1_cut" : len(TRIG1_cut),
-            "TRIG3_cut" : len(TRIG3_cut),
-            "HMS_track" : len(h_track_lumi_after)/len(h_track_lumi_before),
-            "HMS_track_uncern" : (len(h_track_lumi_after)/len(h_track_lumi_before))*math.sqrt((1/len(h_track_lumi_after)) + (1/len(h_track_lumi_before))),
-            "etrack" : len(h_etrack_lumi_after)/len(h_etrack_lumi_before),
-            "etrack_uncern" : (len(h_etrack_lumi_after)/len(h_etrack_lumi_before))*math.sqrt((1/len(h_etrack_lumi_after)) + (1/len(h_etrack_lumi_before))),
-            "SHMS_track" : len(p_track_lumi_after)/len(p_track_lumi_before),
-            "SHMS_track_uncern" : (len(p_track_lumi_after)/len(p_track_lumi_before))*math.sqrt((1/len(p_track_lumi_after)) + (1/len(p_track_lumi_before))),
-            "hadtrack" : len(p_hadtrack_lumi_after)/len(p_hadtrack_lumi_before),
-            "hadtrack_uncern" : (len(p_hadtrack_lumi_after)/len(p_hadtrack_lumi_before))*math.sqrt((1/len(p_hadtrack_lumi_after)) + (1/len(p_hadtrack_lumi_before))),
-            "pitrack" : len(p_pitrack_lumi_after)/len(p_pitrack_lumi_before),
-            "pitrack_uncern" : (len(p_pitrack_lumi_after)/len(p_pitrack_lumi_before))*math.sqrt((1/len(p_pitrack_lumi_after)) + (1/len(p_pitrack_lumi_before))),
-            "Ktrack" : len(p_ktrack_lumi_after)/len(p_ktrack_lumi_before),
-            "Ktrack_uncern" : (len(p_ktrack_lumi_after)/len(p_ktrack_lumi_before))*math.sqrt((1/len(p_ktrack_lumi_after)) + (1/len(p_ktrack_lumi_before))),
-            "ptrack" : len(p_ptrack_lumi_after)/len(p_ptrack_lumi_before),
-            "ptrack_uncern" : (len(p_ptrack_lumi_after)/len(p_ptrack_lumi_before))*math.sqrt((1/len(p_ptrack_lumi_after)) + (1/len(p_ptrack_lumi_before))),
-            "accp_edtm" : (len(EDTM)),
-            
-        }
+    # Efficiencies as (name, events passing, events before the cut), the counts of every selection are taken
+    # once and all ratios and errors computed together
+    effs = [("HMS_track", h_track_lumi_after, h_track_lumi_before),
+            ("etrack", h_etrack_lumi_after, h_etrack_lumi_before),
+            ("SHMS_track", p_track_lumi_after, p_track_lumi_before),
+            ("hadtrack", p_hadtrack_lumi_after, p_hadtrack_lumi_before),
+            ("pitrack", p_pitrack_lumi_after, p_pitrack_lumi_before),
+            ("Ktrack", p_ktrack_lumi_after, p_ktrack_lumi_before),
+            ("ptrack", p_ptrack_lumi_after, p_ptrack_lumi_before),
+            ("HMS_cer", h_ecut_lumi_eff, h_etrack_lumi_after),
+            ("SHMS_cer", p_pcut_lumi_eff, p_etrack_lumi_after)]
+    passed = np.array([len(after) for (name, after, before) in effs], dtype=float)
+    total = np.array([len(before) for (name, after, before) in effs], dtype=float)
+    eff = dict(zip([name for (name, after, before) in effs], klt.pyStats.ratio(passed, total)))
+    eff_uncern = dict(zip([name for (name, after, before) in effs], klt.pyStats.ratio_uncern(passed, total)))
+
+    # Efficiencies of a spectrometer that wasn't triggered are stored as 0
+    def track_effs(names, used):
+        effDict = {}
+        for name in names:
+            effDict[name] = float(eff[name]) if used else 0
+            effDict["%s_uncern" % name] = float(eff_uncern[name]) if used else 0
+        return effDict
+
+    # TRIG1 is the SHMS and TRIG3 the HMS trigger, with neither prescale off both spectrometers are used
+    SHMS_used = not (PS1 == -1 or PS1 == 0)
+    HMS_used = not (PS3 == -1 or PS3 == 0) or not SHMS_used
+
+    track_info = {
+        
+        "HMS_evts_scalar" : len(h_ecut_lumi_eff) if HMS_used else 0,
+        "HMS_evts_scalar_uncern" : math.sqrt(len(h_ecut_lumi_eff)) if HMS_used else 0,
+        "SHMS_evts_scalar" : len(p_pcut_lumi_eff) if SHMS_used else 0,
+        "SHMS_evts_scalar_uncern" : math.sqrt(len(p_pcut_lumi_eff)) if SHMS_used else 0,
+        "h_int_goodscin_evts" : scipy.integrate.simps(h_ecuts_goodscinhit),
+        "p_int_goodscin_evts" : scipy.integrate.simps(p_pcuts_goodscinhit),
+        "TRIG1_cut" : len(TRIG1_cut),
+        "TRIG3_cut" : len(TRIG3_cut),
+        "accp_edtm" : (len(EDTM)),
+        
+    }
+    if not HMS_used:
+        track_info["intW_evts"] = scipy.integrate.simps(h_ecut_W)
+    track_info.update(track_effs(["HMS_track", "etrack"], HMS_used))
+    track_info.update(track_effs(["SHMS_track", "hadtrack", "pitrack", "Ktrack", "ptrack"], SHMS_used))
 
     print("Terminate","Selection rules have been applied, plotting results")
     print("Using prescale factors: PS1 %.0f, PS3 %.0f\n" % (PS1,PS3))
@@ -803,44 +570,17 @@ def analysis(PS1, PS3, thres_curr):
 
     print("Number of HMS good events: %.0f +/- %.0f " % ((PS3*len(h_ecut_lumi_eff))
                                                          ,math.sqrt(PS3*len(h_ecut_lumi_eff))))
-    print("Calculated tracking efficiency: %f +/- %f\n" %
-          (len(h_track_lumi_after)/len(h_track_lumi_before),
-           (len(h_track_lumi_after)/len(h_track_lumi_before))*math.sqrt((1/len(h_track_lumi_after))
-                                                         + (1/len(h_track_lumi_before)))))
-    print("Calculated electron tracking efficiency: %f +/- %f\n" %
-          (len(h_etrack_lumi_after)/len(h_etrack_lumi_before),
-           (len(h_etrack_lumi_after)/len(h_etrack_lumi_before))*math.sqrt((1/len(h_etrack_lumi_after))
-                                                           + (1/len(h_etrack_lumi_before)))))
-    print("Calculated HMS Cherenkov efficiency: %f +/- %f\n\n" %
-          (len(h_ecut_lumi_eff)/len(h_etrack_lumi_after),
-           (len(h_ecut_lumi_eff)/len(h_etrack_lumi_after))*math.sqrt((1/len(h_ecut_lumi_eff))
-                                                    + (1/len(h_etrack_lumi_after)))))
+    print("Calculated tracking efficiency: %f +/- %f\n" % (eff["HMS_track"], eff_uncern["HMS_track"]))
+    print("Calculated electron tracking efficiency: %f +/- %f\n" % (eff["etrack"], eff_uncern["etrack"]))
+    print("Calculated HMS Cherenkov efficiency: %f +/- %f\n\n" % (eff["HMS_cer"], eff_uncern["HMS_cer"]))
     print("Number of SHMS good events: %.0f +/- %.0f" % ((PS1*len(p_pcut_lumi_eff)),
                                                          math.sqrt(PS1*len(p_pcut_lumi_eff))))
-    print("Calculated tracking efficiency: %f +/- %f\n" %
-          (len(p_track_lumi_after)/len(p_track_lumi_before),
-           (len(p_track_lumi_after)/len(p_track_lumi_before))*math.sqrt((1/len(p_track_lumi_after))
-                                                         + (1/len(p_track_lumi_before)))))
-    print("Calculated hadron tracking efficiency: %f +/- %f\n" %
-          (len(p_hadtrack_lumi_after)/len(p_hadtrack_lumi_before),
-           (len(p_hadtrack_lumi_after)/len(p_hadtrack_lumi_before))*math.sqrt((1/len(p_hadtrack_lumi_after))
-                                                               + (1/len(p_hadtrack_lumi_before)))))
-    print("Calculated pion tracking efficiency: %f +/- %f\n" %
-          (len(p_pitrack_lumi_after)/len(p_pitrack_lumi_before),
-           (len(p_pitrack_lumi_after)/len(p_pitrack_lumi_before))*math.sqrt((1/len(p_pitrack_lumi_after))
-                                                             + (1/len(p_pitrack_lumi_before)))))
-    print("Calculated kaon tracking efficiency: %f +/- %f\n" %
-          (len(p_ktrack_lumi_after)/len(p_ktrack_lumi_before),
-           (len(p_ktrack_lumi_after)/len(p_ktrack_lumi_before))*math.sqrt((1/len(p_ktrack_lumi_after))
-                                                           + (1/len(p_ktrack_lumi_before)))))
-    print("Calculated proton tracking efficiency: %f +/- %f\n" %
-          (len(p_ptrack_lumi_after)/len(p_ptrack_lumi_before),
-           (len(p_ptrack_lumi_after)/len(p_ptrack_lumi_before))*math.sqrt((1/len(p_ptrack_lumi_after))
-                                                           + (1/len(p_ptrack_lumi_before)))))
-    print("Calculated SHMS Cherenkov efficiency: %f +/- %f\n\n" %
-          (len(p_pcut_lumi_eff)/len(p_etrack_lumi_after),
-           (len(p_pcut_lumi_eff)/len(p_etrack_lumi_after))*math.sqrt((1/len(p_pcut_lumi_eff))
-                                                + (1/len(p_etrack_lumi_after)))))
+    print("Calculated tracking efficiency: %f +/- %f\n" % (eff["SHMS_track"], eff_uncern["SHMS_track"]))
+    print("Calculated hadron tracking efficiency: %f +/- %f\n" % (eff["hadtrack"], eff_uncern["hadtrack"]))
+    print("Calculated pion tracking efficiency: %f +/- %f\n" % (eff["pitrack"], eff_uncern["pitrack"]))
+    print("Calculated kaon tracking efficiency: %f +/- %f\n" % (eff["Ktrack"], eff_uncern["Ktrack"]))
+    print("Calculated proton tracking efficiency: %f +/- %f\n" % (eff["ptrack"], eff_uncern["ptrack"]))
+    print("Calculated SHMS Cherenkov efficiency: %f +/- %f\n\n" % (eff["SHMS_cer"], eff_uncern["SHMS_cer"]))
     print("============================================================================\n\n")
           
     return track_info
@@ -860,15 +600,11 @@ def main():
         data.update(d)
     lumi_data = {i : data[i] for i in sorted(data.keys())}
 
-    table  = pd.DataFrame([lumi_data], columns=lumi_data.keys())
-    table = table.reindex(sorted(table.columns), axis=1)
-    
-    file_exists = os.path.isfile(filename)
-
-    if file_exists:
-        table.to_csv(filename, index = False, header=False, mode='a',)
-    else:
-        table.to_csv(filename, index = False, header=True, mode='a',)
+    # One row per run and analysis version, reruns replace the old entry
+    store = klt.pyStore(dbname, "lumi_data", key="run number", version=klt.__version__)
+    store.upsert(lumi_data)
+    # Keep the csv for anything still reading it directly
+    store.to_csv(filename)
 
 if __name__ == '__main__':
     main()
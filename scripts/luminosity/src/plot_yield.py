@@ -16,6 +16,9 @@ import matplotlib.pyplot as plt
 from csv import DictReader
 import sys, os, subprocess
 
+sys.path.insert(0, '../../../bin/python/')
+import kaonlt as klt
+
 # Add this to all files for more dynamic pathing
 USER = subprocess.getstatusoutput("whoami") # Grab user info for file finding
 HOST = subprocess.getstatusoutput("hostname")
@@ -29,13 +32,13 @@ elif ("trottar" in HOST[1]):
 
 print("Running as %s on %s, hallc_replay_lt path assumed as %s" % (USER[1], HOST[1], REPLAYPATH))
 
-inp_f = "%s/UTIL_PION/OUTPUT/Analysis/Lumi/lumi_data.csv" % str(REPLAYPATH)
+inp_f = "%s/UTIL_PION/OUTPUT/Analysis/Lumi/lumi_data.db" % str(REPLAYPATH)
 out_f = "%s/UTIL_PION/OUTPUT/Analysis/Lumi/yield_data.csv" % str(REPLAYPATH)
 
-try:
-    lumi_data = dict(pd.read_csv(inp_f))
-except IOError:
+if not os.path.isfile(inp_f):
     print("Error: %s does not appear to exist." % inp_f)
+    sys.exit(1)
+lumi_data = dict(klt.pyStore(inp_f, "lumi_data", key="run number", version=klt.__version__).query())
 print(lumi_data.keys())
     
 # prints first instance of run number-> print(lumi_data["run number"][0])
@@ -43,151 +46,68 @@ target = "carbon"
 
 numRuns = len(lumi_data["run number"])
     
+# Ratio of two run columns, runs where the ratio is undefined (0/0, missing values) are set to fill
+def ratio(num, den, fill=0):
+    return klt.pyStats.ratio(num, den, fill)
+
+# Relative statistical uncertainty, sqrt(N)/N, of a column of counts
+stat_uncern = klt.pyStats.stat_uncern
+
+# Normalise a yield column to the yield of the reference run (last run with a current between 25
+# and 35 uA). If the reference run was not taken with that trigger (ps=0) the yield is left as is.
+def rel_yield(yields, current, ps):
+    ref = (current >= 25) & (current <= 35)
+    if not ref.any():
+        return yields
+    i = ref[ref].index[-1]
+    if ps[i] != 0:
+        return yields/yields[i]
+    else:
+        return yields
+
 def calc_yield():
-    charge = [lumi_data["charge"][i]
-               for i,evts in enumerate(lumi_data["run number"])]
-    current = [lumi_data["charge"][i]/lumi_data["time"][i]
-               for i,evts in enumerate(lumi_data["run number"])]
-    rate_HMS = [lumi_data["HMS_evts_scalar"][i]/lumi_data["time"][i]
-                for i,evts in enumerate(lumi_data["run number"])]
-    rate_HMS = pd.Series(rate_HMS).fillna(0).tolist()
-    rate_SHMS = [lumi_data["SHMS_evts_scalar"][i]/lumi_data["time"][i]
-                for i,evts in enumerate(lumi_data["run number"])]
-    rate_SHMS = pd.Series(rate_SHMS).fillna(0).tolist()
-    # cpuLT_HMS = [abs(lumi_data["TRIG3_cut"][i]/(((lumi_data["TRIG3_scaler"][i]/lumi_data["ps3"][i])-lumi_data["accp_edtm"][i])))
-                 # for i,evt in enumerate(lumi_data["run number"])]
-    cpuLT_HMS = [lumi_data["CPULT_scaler"][i]
-                 for i,evt in enumerate(lumi_data["run number"])]                 
-    cpuLT_HMS  = pd.Series(cpuLT_HMS).fillna(0).tolist()
-    cpuLT_HMS_uncern = [np.sqrt(abs(cpuLT_HMS[i]))/cpuLT_HMS[i]
-                        for i,evt in enumerate(lumi_data["run number"])]
-    cpuLT_HMS_uncern = pd.Series(cpuLT_HMS_uncern).fillna(0).tolist()
-    # cpuLT_SHMS = [abs(lumi_data["TRIG1_cut"][i]/(((lumi_data["TRIG1_scaler"][i]/lumi_data["ps1"][i])-lumi_data["accp_edtm"][i])))
-    #               for i,evt in enumerate(lumi_data["run number"])]
-    cpuLT_SHMS = [lumi_data["CPULT_scaler"][i]
-                 for i,evt in enumerate(lumi_data["run number"])]    
-    cpuLT_SHMS = pd.Series(cpuLT_SHMS).fillna(0).tolist()
-    cpuLT_SHMS_uncern = [np.sqrt(abs(cpuLT_SHMS[i]))/cpuLT_SHMS[i]
-                         for i,evt in enumerate(lumi_data["run number"])]
-    cpuLT_SHMS_uncern = pd.Series(cpuLT_SHMS_uncern).fillna(0).tolist()
-    uncern_HMS_evts_scalar = [np.sqrt(lumi_data["TRIG3_scaler"][i])/lumi_data["TRIG3_scaler"][i]
-                       for i,evt in enumerate(lumi_data["run number"])]
-    uncern_HMS_evts_scalar  = pd.Series(uncern_HMS_evts_scalar).fillna(0).tolist()
-    uncern_SHMS_evts_scalar = [np.sqrt(lumi_data["TRIG1_scaler"][i])/lumi_data["TRIG1_scaler"][i]
-                        for i,evt in enumerate(lumi_data["run number"])]
-    uncern_SHMS_evts_scalar = pd.Series(uncern_SHMS_evts_scalar).fillna(0).tolist()
-    uncern_HMS_evts_notrack = [np.sqrt(lumi_data["h_int_goodscin_evts"][i])/lumi_data["h_int_goodscin_evts"][i]
-                       for i,evt in enumerate(lumi_data["run number"])]
-    uncern_HMS_evts_notrack  = pd.Series(uncern_HMS_evts_notrack).fillna(0).tolist()
-    uncern_SHMS_evts_notrack = [np.sqrt(lumi_data["p_int_goodscin_evts"][i])/lumi_data["p_int_goodscin_evts"][i]
-                        for i,evt in enumerate(lumi_data["run number"])]
-    uncern_SHMS_evts_notrack = pd.Series(uncern_SHMS_evts_notrack).fillna(0).tolist()
-    uncern_HMS_evts_track = [np.sqrt(lumi_data["h_int_goodscin_evts"][i])/lumi_data["h_int_goodscin_evts"][i]
-                       for i,evt in enumerate(lumi_data["run number"])]
-    uncern_HMS_evts_track  = pd.Series(uncern_HMS_evts_track).fillna(0).tolist()
-    uncern_SHMS_evts_track = [np.sqrt(lumi_data["p_int_goodscin_evts"][i])/lumi_data["p_int_goodscin_evts"][i]
-                        for i,evt in enumerate(lumi_data["run number"])]
-    uncern_SHMS_evts_track = pd.Series(uncern_SHMS_evts_track).fillna(0).tolist()
-    
-    HMS_scalar_accp = [(lumi_data["TRIG3_scaler"][i]-lumi_data["sent_edtm"][i])
-                 for i,evt in enumerate(lumi_data["run number"])]
-    HMS_scalar_accp = pd.Series(HMS_scalar_accp).fillna(0).tolist()
-    HMS_scalar = [(lumi_data["TRIG3_scaler"][i])
-                 for i,evt in enumerate(lumi_data["run number"])]
-    HMS_scalar = pd.Series(HMS_scalar).fillna(0).tolist()
-    SHMS_scalar_accp = [(lumi_data["TRIG1_scaler"][i]-lumi_data["sent_edtm"][i])
-                 for i,evt in enumerate(lumi_data["run number"])]
-    SHMS_scalar_accp = pd.Series(SHMS_scalar_accp).fillna(0).tolist()
-    SHMS_scalar = [(lumi_data["TRIG1_scaler"][i])
-                 for i,evt in enumerate(lumi_data["run number"])]
-    SHMS_scalar = pd.Series(SHMS_scalar).fillna(0).tolist()
-        
-    yield_HMS_notrack = [(lumi_data["h_int_goodscin_evts"][i])/(lumi_data["charge"][i]*cpuLT_HMS[i])
-    for i,evt in enumerate(lumi_data["run number"])]
-    yield_HMS_track = [(lumi_data["h_int_goodscin_evts"][i])/(lumi_data["charge"][i]*cpuLT_HMS[i]*(1-lumi_data["etrack"][i]))
-    for i,evt in enumerate(lumi_data["run number"])]
-    yield_HMS_scalar = [(lumi_data["TRIG3_scaler"][i]-lumi_data["sent_edtm"][i])/(lumi_data["charge"][i])
-                 for i,evt in enumerate(lumi_data["run number"])]
-    yield_HMS_scalar = pd.Series(yield_HMS_scalar).fillna(0).tolist()
-    yield_HMS_notrack = pd.Series(yield_HMS_notrack).fillna(0).tolist()
-    yield_HMS_track = pd.Series(yield_HMS_track).fillna(0).tolist()
-    yield_SHMS_notrack = [(lumi_data["p_int_goodscin_evts"][i])/(lumi_data["charge"][i]*cpuLT_SHMS[i])
-    for i,evt in enumerate(lumi_data["run number"])]
-    yield_SHMS_track = [(lumi_data["h_int_goodscin_evts"][i])/(lumi_data["charge"][i]*cpuLT_SHMS[i]*(lumi_data["ptrack"][i]))
-    for i,evt in enumerate(lumi_data["run number"])]
-    yield_SHMS_scalar = [(lumi_data["TRIG1_scaler"][i]-lumi_data["sent_edtm"][i])/(lumi_data["charge"][i])
-                  for i,evt in enumerate(lumi_data["run number"])]
-    yield_SHMS_scalar = pd.Series(yield_SHMS_scalar).fillna(0).tolist()
-    yield_SHMS_notrack = pd.Series(yield_SHMS_notrack).fillna(0).tolist()
-    yield_SHMS_track = pd.Series(yield_SHMS_track).fillna(0).tolist()
-    
-    count_HMS = [(lumi_data["h_int_goodscin_evts"][i])
-                  for i,evt in enumerate(lumi_data["run number"])]
-    count_HMS = pd.Series(count_HMS).fillna(0).tolist()    
-    count_SHMS = [(lumi_data["p_int_goodscin_evts"][i])
-                  for i,evt in enumerate(lumi_data["run number"])]
-    count_SHMS = pd.Series(count_SHMS).fillna(0).tolist()
-
-    etrack_HMS = [(1-lumi_data["etrack"][i])
-                  for i,evt in enumerate(lumi_data["run number"])]
-    etrack_HMS = pd.Series(etrack_HMS).fillna(0).tolist()            
-    ptrack_SHMS = [(lumi_data["ptrack"][i])
-                  for i,evt in enumerate(lumi_data["run number"])]
-    ptrack_SHMS = pd.Series(ptrack_SHMS).fillna(0).tolist()
-
-
-    for i,curr in enumerate(current):
-        if curr <= 35 and curr >= 25:
-        # if curr == min(current):
-            if lumi_data["ps3"][i] !=0:
-                min_yield_HMS_scalar = yield_HMS_scalar[i]
-            else:
-                min_yield_HMS_scalar = 1
-            if lumi_data["ps1"][i] !=0:
-                min_yield_SHMS_scalar = yield_SHMS_scalar[i]
-            else:
-                min_yield_SHMS_scalar = 1
-                
-    for i,curr in enumerate(current):
-        if curr <= 35 and curr >= 25:
-        # if curr == min(current):
-            if lumi_data["ps3"][i] !=0:
-                min_yield_HMS_notrack = yield_HMS_notrack[i]
-            else:
-                min_yield_HMS_notrack = 1
-            if lumi_data["ps1"][i] !=0:
-                min_yield_SHMS_notrack = yield_SHMS_notrack[i]
-            else:
-                min_yield_SHMS_notrack = 1
-
-    for i,curr in enumerate(current):
-        if curr <= 35 and curr >= 25:        
-        # if curr == min(current):
-            if lumi_data["ps3"][i] !=0:
-                min_yield_HMS_track = yield_HMS_track[i]
-            else:
-                min_yield_HMS_track = 1
-            if lumi_data["ps1"][i] !=0:
-                min_yield_SHMS_track = yield_SHMS_track[i]
-            else:
-                min_yield_SHMS_track = 1
-
-    yieldRel_HMS_scalar = [yield_HMS_scalar[i]/min_yield_HMS_scalar for i,evt in enumerate(lumi_data["run number"])]
-    # yieldRel_HMS_scalar = pd.Series(yieldRel_HMS_scalar).fillna(0).tolist()
-    yieldRel_SHMS_scalar = [yield_SHMS_scalar[i]/min_yield_SHMS_scalar for i,evt in enumerate(lumi_data["run number"])]
-    # yieldRel_SHMS_scalar = pd.Series(yieldRel_SHMS_scalar).fillna(0).tolist()
-
-    yieldRel_HMS_notrack = [yield_HMS_notrack[i]/min_yield_HMS_notrack for i,evt in enumerate(lumi_data["run number"])]
-    # yieldRel_HMS_notrack = pd.Series(yieldRel_HMS_notrack).fillna(0).tolist()
-    yieldRel_SHMS_notrack = [yield_SHMS_notrack[i]/min_yield_SHMS_notrack for i,evt in enumerate(lumi_data["run number"])]
-    # yieldRel_SHMS_notrack = pd.Series(yieldRel_SHMS_notrack).fillna(0).tolist()
-
-    yieldRel_HMS_track = [yield_HMS_track[i]/min_yield_HMS_track for i,evt in enumerate(lumi_data["run number"])]
-    # yieldRel_HMS_track = pd.Series(yieldRel_HMS_track).fillna(0).tolist()
-    yieldRel_SHMS_track = [yield_SHMS_track[i]/min_yield_SHMS_track for i,evt in enumerate(lumi_data["run number"])]
-    # yieldRel_SHMS_track = pd.Series(yieldRel_SHMS_track).fillna(0).tolist()
-
-    return [current,rate_HMS,rate_SHMS,cpuLT_HMS,cpuLT_SHMS,uncern_HMS_evts_scalar,uncern_SHMS_evts_scalar,yield_HMS_scalar,yield_SHMS_scalar,yieldRel_HMS_scalar,yieldRel_SHMS_scalar,uncern_HMS_evts_notrack,uncern_SHMS_evts_notrack,yield_HMS_notrack,yield_SHMS_notrack,yieldRel_HMS_notrack,yieldRel_SHMS_notrack,uncern_HMS_evts_track,uncern_SHMS_evts_track,yield_HMS_track,yield_SHMS_track,yieldRel_HMS_track,yieldRel_SHMS_track,count_HMS,count_SHMS,etrack_HMS,ptrack_SHMS,charge,HMS_scalar_accp,HMS_scalar,SHMS_scalar_accp,SHMS_scalar]
+    lumi = pd.DataFrame(lumi_data)
+    y = pd.DataFrame(index=lumi.index)
+
+    y["charge"] = lumi["charge"]
+    y["current"] = lumi["charge"]/lumi["time"]
+    y["rate_HMS"] = ratio(lumi["HMS_evts_scalar"], lumi["time"])
+    y["rate_SHMS"] = ratio(lumi["SHMS_evts_scalar"], lumi["time"])
+    # cpuLT_HMS = abs(TRIG3_cut/((TRIG3_scaler/ps3)-accp_edtm))
+    y["cpuLT_HMS"] = lumi["CPULT_scaler"].fillna(0)
+    y["cpuLT_HMS_uncern"] = ratio(np.sqrt(abs(y["cpuLT_HMS"])), y["cpuLT_HMS"])
+    # cpuLT_SHMS = abs(TRIG1_cut/((TRIG1_scaler/ps1)-accp_edtm))
+    y["cpuLT_SHMS"] = lumi["CPULT_scaler"].fillna(0)
+    y["cpuLT_SHMS_uncern"] = ratio(np.sqrt(abs(y["cpuLT_SHMS"])), y["cpuLT_SHMS"])
+    y["uncern_HMS_evts_scalar"] = stat_uncern(lumi["TRIG3_scaler"])
+    y["uncern_SHMS_evts_scalar"] = stat_uncern(lumi["TRIG1_scaler"])
+    y["uncern_HMS_evts_notrack"] = stat_uncern(lumi["h_int_goodscin_evts"])
+    y["uncern_SHMS_evts_notrack"] = stat_uncern(lumi["p_int_goodscin_evts"])
+    y["uncern_HMS_evts_track"] = stat_uncern(lumi["h_int_goodscin_evts"])
+    y["uncern_SHMS_evts_track"] = stat_uncern(lumi["p_int_goodscin_evts"])
+
+    y["HMS_scalar_accp"] = (lumi["TRIG3_scaler"]-lumi["sent_edtm"]).fillna(0)
+    y["HMS_scalar"] = lumi["TRIG3_scaler"].fillna(0)
+    y["SHMS_scalar_accp"] = (lumi["TRIG1_scaler"]-lumi["sent_edtm"]).fillna(0)
+    y["SHMS_scalar"] = lumi["TRIG1_scaler"].fillna(0)
+
+    y["yield_HMS_scalar"] = ratio(lumi["TRIG3_scaler"]-lumi["sent_edtm"], lumi["charge"])
+    y["yield_HMS_notrack"] = ratio(lumi["h_int_goodscin_evts"], lumi["charge"]*y["cpuLT_HMS"])
+    y["yield_HMS_track"] = ratio(lumi["h_int_goodscin_evts"], lumi["charge"]*y["cpuLT_HMS"]*(1-lumi["etrack"]))
+    y["yield_SHMS_scalar"] = ratio(lumi["TRIG1_scaler"]-lumi["sent_edtm"], lumi["charge"])
+    y["yield_SHMS_notrack"] = ratio(lumi["p_int_goodscin_evts"], lumi["charge"]*y["cpuLT_SHMS"])
+    y["yield_SHMS_track"] = ratio(lumi["h_int_goodscin_evts"], lumi["charge"]*y["cpuLT_SHMS"]*lumi["ptrack"])
+
+    y["count_HMS"] = lumi["h_int_goodscin_evts"].fillna(0)
+    y["count_SHMS"] = lumi["p_int_goodscin_evts"].fillna(0)
+    y["etrack_HMS"] = (1-lumi["etrack"]).fillna(0)
+    y["ptrack_SHMS"] = lumi["ptrack"].fillna(0)
+
+    for cut in ["scalar","notrack","track"]:
+        y["yieldRel_HMS_%s" % cut] = rel_yield(y["yield_HMS_%s" % cut], y["current"], lumi["ps3"])
+        y["yieldRel_SHMS_%s" % cut] = rel_yield(y["yield_SHMS_%s" % cut], y["current"], lumi["ps1"])
+
+    return [y[col].tolist() for col in ["current","rate_HMS","rate_SHMS","cpuLT_HMS","cpuLT_SHMS","uncern_HMS_evts_scalar","uncern_SHMS_evts_scalar","yield_HMS_scalar","yield_SHMS_scalar","yieldRel_HMS_scalar","yieldRel_SHMS_scalar","uncern_HMS_evts_notrack","uncern_SHMS_evts_notrack","yield_HMS_notrack","yield_SHMS_notrack","yieldRel_HMS_notrack","yieldRel_SHMS_notrack","uncern_HMS_evts_track","uncern_SHMS_evts_track","yield_HMS_track","yield_SHMS_track","yieldRel_HMS_track","yieldRel_SHMS_track","count_HMS","count_SHMS","etrack_HMS","ptrack_SHMS","charge","HMS_scalar_accp","HMS_scalar","SHMS_scalar_accp","SHMS_scalar"]]
 
 def plot_yield():
 
@@ -31,12 +31,11 @@ elif ("trottar" in HOST[1]):
 
 print("Running as %s on %s, hallc_replay_lt path assumed as %s" % (USER[1], HOST[1], REPLAYPATH))
 
-inp_f = "%s/UTIL_PION/OUTPUT/Analysis/PID/pid_data.csv" % str(REPLAYPATH)
+inp_f = "%s/UTIL_PION/OUTPUT/Analysis/PID/pid_data.db" % str(REPLAYPATH)
 out_f = "%s/UTIL_PION/OUTPUT/Analysis/PID/pid_data.root" % str(REPLAYPATH)
 
-try:
-    pid_data = dict(pd.read_csv(inp_f))
-except IOError:
+if not os.path.isfile(inp_f):
     print("Error: %s does not appear to exist." % inp_f)
+    sys.exit(1)
+pid_data = klt.pyStore(inp_f, "pid_data", key="run_number", version=klt.__version__).to_root(out_f)
 print(pid_data.keys())
-r.csv2root(pid_data,out_f)
@@ -39,6 +39,7 @@ elif ("trottar" in HOST[1]):
 print("Running as %s on %s, hallc_replay_lt path assumed as %s" % (USER[1], HOST[1], REPLAYPATH))
 
 filename = "%s/UTIL_PION/OUTPUT/Analysis/PID/pid_data.csv" % (REPLAYPATH)
+dbname = "%s/UTIL_PION/OUTPUT/Analysis/PID/pid_data.db" % (REPLAYPATH)
 rootName = "%s/UTIL_PION/ROOTfiles/Analysis/PID/pid_coin_offline_%s_%s.root" % (REPLAYPATH, runNum,MaxEvent)
 
 '''
@@ -79,15 +80,11 @@ pEDTM              = tree.array("T.coin.pEDTM_tdcTime")
 pTRIG5             = tree.array("T.coin.pTRIG5_ROC1_tdcTime")
 EvtType            = tree.array("fEvtHdr.fEvtType")
 
-missmass = np.array(np.sqrt(abs(emiss*emiss-pmiss*pmiss)))
+missmass = klt.pyEquation.missmass(emiss, pmiss)
 
-#
-# Mp = 0.93828
-# MPi = 0.13957018
-# MK = 0.493677
-# MMpi = np.array([math.sqrt(abs((em + math.sqrt(abs((MK*MK) + (gtrp*gtrp))) - math.sqrt(abs((MPi*MPi) + (gtrp*gtrp) - (pm*pm))) ))**2) for (em, pm, gtrp) in zip(emiss, pmiss, P_gtr_p)])
-# MMK = np.array([math.sqrt(abs((em*em)-(pm*pm))) for (em, pm) in zip(emiss, pmiss)])
-# MMp = np.array([math.sqrt(abs((em + math.sqrt(abs((MK*MK) + (gtrp*gtrp))) - math.sqrt(abs((Mp*Mp) + (gtrp*gtrp) - (pm*pm))) ))**2) for (em, pm, gtrp) in zip(emiss, pmiss, P_gtr_p)])
+# Missing mass under other particle assumptions, the replay assumes a kaon in the SHMS
+# MM = klt.pyEquation.missmass_all(emiss, pmiss, P_gtr_p, "kaon")
+# MMpi, MMK, MMp = MM["pion"], MM["kaon"], MM["proton"]
 
 
 r = klt.pyRoot()
@@ -155,7 +152,7 @@ def hms_cer():
 
     h_cer_data = {
 
-        "h_cer_eff" : len(mm_noID_electron)/len(mm_PID_electron),
+        "h_cer_eff" : klt.pyStats.ratio(len(mm_noID_electron), len(mm_PID_electron)),
     }
 
     f = plt.figure(figsize=(11.69,8.27))
@@ -203,7 +200,7 @@ def hms_cal():
     
     h_cal_data = {
 
-        "h_cal_eff" : len(mm_noID_electron)/len(mm_PID_electron),
+        "h_cal_eff" : klt.pyStats.ratio(len(mm_noID_electron), len(mm_PID_electron)),
     }
 
     f = plt.figure(figsize=(11.69,8.27))
@@ -251,7 +248,7 @@ def shms_hgcer():
 
     p_hgcer_data = {
 
-        "p_hgcer_eff" : len(mm_noID_electron)/len(mm_PID_electron),
+        "p_hgcer_eff" : klt.pyStats.ratio(len(mm_noID_electron), len(mm_PID_electron)),
     }
 
     f = plt.figure(figsize=(11.69,8.27))
@@ -299,7 +296,7 @@ def shms_aero():
 
     p_aero_data = {
 
-        "p_aero_eff" : len(mm_noID_electron)/len(mm_PID_electron),
+        "p_aero_eff" : klt.pyStats.ratio(len(mm_noID_electron), len(mm_PID_electron)),
     }
 
     f = plt.figure(figsize=(11.69,8.27))
@@ -347,7 +344,7 @@ def shms_cal():
 
     p_cal_data = {
 
-        "p_cal_eff" : len(mm_noID_electron)/len(mm_PID_electron),
+        "p_cal_eff" : klt.pyStats.ratio(len(mm_noID_electron), len(mm_PID_electron)),
     }
 
     f = plt.figure(tight_layout=True, figsize=(11.69,8.27))
@@ -398,16 +395,11 @@ def main():
 
     # plt.show()
 
-    table  = pd.DataFrame([data], columns=data.keys())
-
-    table = table.reindex(sorted(table.columns), axis=1)
-    
-    file_exists = os.path.isfile(filename)
-
-    if file_exists:
-        table.to_csv(filename, index = False, header=False, mode='a',)
-    else:
-        table.to_csv(filename, index = False, header=True, mode='a',)
+    # One row per run and analysis version, reruns replace the old entry
+    store = klt.pyStore(dbname, "pid_data", key="run_number", version=klt.__version__)
+    store.upsert(data)
+    # Keep the csv for anything still reading it directly
+    store.to_csv(filename)
 
 if __name__ == '__main__':
     main()
@@ -17,12 +17,53 @@ import ROOT
 import scipy
 import scipy.integrate as integrate
 import matplotlib.pyplot as plt
-import sys, math, os, subprocess
+import sys, math, os, subprocess, resource
+from collections import OrderedDict
 
 sys.path.insert(0, 'python/')
+# Optional --memory-budget MB, the run is then processed in chunks of events sized to stay within it
+MemoryBudget = None
+if "--memory-budget" in sys.argv:
+    i = sys.argv.index("--memory-budget")
+    try:
+        MemoryBudget = float(sys.argv[i+1])
+    except (IndexError, ValueError):
+        print("!!!!! ERROR !!!!!\n --memory-budget needs a value in MB \n!!!!! ERROR !!!!!")
+        sys.exit(1)
+    del sys.argv[i:i+2]
+# Smallest chunk a memory budget can shrink the processing to
+MinChunkSize = 10000
+# Optional --scan PARAMETER LOW HIGH NPOINTS (can be given more than once), the yields are also found at every point
+# of the grid of cut parameter values, e.g. --scan pid.P_ecut_P_hgcer 0.5 3.0 26
+ScanAxes = []
+while "--scan" in sys.argv:
+    i = sys.argv.index("--scan")
+    try:
+        ScanAxes.append((sys.argv[i+1], float(sys.argv[i+2]), float(sys.argv[i+3]), int(sys.argv[i+4])))
+    except (IndexError, ValueError):
+        print("!!!!! ERROR !!!!!\n --scan needs a parameter, low value, high value and number of points \n!!!!! ERROR !!!!!")
+        sys.exit(1)
+    del sys.argv[i:i+5]
+# Optional --bootstrap NREPLICAS, bootstrap errors on the background subtracted yields from NREPLICAS Poisson(1) weights per event,
+# with --bootstrap-processes N the replicas are summed by a pool of N processes
+nReplicas = None
+BootProcesses = None
+for (flag, convert) in (("--bootstrap", int), ("--bootstrap-processes", int)):
+    if flag in sys.argv:
+        i = sys.argv.index(flag)
+        try:
+            value = convert(sys.argv[i+1])
+        except (IndexError, ValueError):
+            print("!!!!! ERROR !!!!!\n %s needs a number \n!!!!! ERROR !!!!!" % flag)
+            sys.exit(1)
+        del sys.argv[i:i+2]
+        if flag == "--bootstrap":
+            nReplicas = value
+        else:
+            BootProcesses = value
 # Check the number of arguments provided to the script
 if len(sys.argv)-1!=3:
-    print("!!!!! ERROR !!!!!\n Expected 3 arguments\n Usage is with - ROOTfilePrefix RunNumber MaxEvents \n!!!!! ERROR !!!!!")
+    print("!!!!! ERROR !!!!!\n Expected 3 arguments\n Usage is with - ROOTfilePrefix RunNumber MaxEvents --memory-budget MB(optional) --scan PARAMETER LOW HIGH NPOINTS(optional) --bootstrap NREPLICAS(optional) \n!!!!! ERROR !!!!!")
     sys.exit(1)
 # Input params - run number and max number of events
 ROOTPrefix = sys.argv[1]
@@ -43,6 +84,8 @@ elif("skynet" in HOST[1]):
 # Add more path setting as needed in a similar manner
 OUTPATH = "%s/UTIL_PION/OUTPUT/Analysis/PionLT" % REPLAYPATH
 CUTPATH = "%s/UTIL_PION/DB/CUTS" % REPLAYPATH
+TimingCutFile = "%s/UTIL_PION/DB/PARAM/Timing_Parameters.csv" % REPLAYPATH
+BinningFile = "%s/UTIL_PION/DB/PARAM/Binning_Parameters.csv" % REPLAYPATH
 sys.path.insert(0, '%s/UTIL_PION/bin/python/' % REPLAYPATH)
 import kaonlt as klt
 
@@ -70,73 +113,85 @@ print("Output path checks out, outputting to %s" % (OUTPATH))
 
 # Read stuff from the main event tree
 e_tree = up.open(rootName)["T"]
-# Timing info
-CTime_ePiCoinTime_ROC1 = e_tree.array("CTime.ePiCoinTime_ROC1")
-CTime_eKCoinTime_ROC1 = e_tree.array("CTime.eKCoinTime_ROC1")
-CTime_epCoinTime_ROC1 = e_tree.array("CTime.epCoinTime_ROC1")
-P_RF_tdcTime = e_tree.array("T.coin.pRF_tdcTime")
-P_hod_fpHitsTime = e_tree.array("P.hod.fpHitsTime")
-H_RF_Dist = e_tree.array("RFTime.HMS_RFtimeDist")
-P_RF_Dist = e_tree.array("RFTime.SHMS_RFtimeDist")
-# HMS info
-H_gtr_beta = e_tree.array("H.gtr.beta")
-H_gtr_xp = e_tree.array("H.gtr.th") # xpfp -> Theta
-H_gtr_yp = e_tree.array("H.gtr.ph") # ypfp -> Phi
-H_gtr_dp = e_tree.array("H.gtr.dp")
-H_cal_etotnorm = e_tree.array("H.cal.etotnorm")
-H_cal_etottracknorm = e_tree.array("H.cal.etottracknorm")
-H_cer_npeSum = e_tree.array("H.cer.npeSum")
-# SHMS info
-P_gtr_beta = e_tree.array("P.gtr.beta")
-P_gtr_xp = e_tree.array("P.gtr.th") # xpfp -> Theta
-P_gtr_yp = e_tree.array("P.gtr.ph") # ypfp -> Phi
-P_gtr_p = e_tree.array("P.gtr.p")
-P_gtr_dp = e_tree.array("P.gtr.dp")
-P_cal_etotnorm = e_tree.array("P.cal.etotnorm")
-P_cal_etottracknorm = e_tree.array("P.cal.etottracknorm")
-P_aero_npeSum = e_tree.array("P.aero.npeSum")
-P_aero_xAtAero = e_tree.array("P.aero.xAtAero")
-P_aero_yAtAero = e_tree.array("P.aero.yAtAero")
-P_hgcer_npeSum = e_tree.array("P.hgcer.npeSum")
-P_hgcer_xAtCer = e_tree.array("P.hgcer.xAtCer")
-P_hgcer_yAtCer = e_tree.array("P.hgcer.yAtCer")
-# Kinematic quantitites
-Q2 = e_tree.array("H.kin.primary.Q2")
-W = e_tree.array("H.kin.primary.W")
-epsilon = e_tree.array("H.kin.primary.epsilon")
-ph_q = e_tree.array("P.kin.secondary.ph_xq")
-emiss = e_tree.array("P.kin.secondary.emiss")
-pmiss = e_tree.array("P.kin.secondary.pmiss")
-MMpi = e_tree.array("P.kin.secondary.MMpi")
-MMK = e_tree.array("P.kin.secondary.MMK")
-MMp = e_tree.array("P.kin.secondary.MMp")
-MandelT = e_tree.array("P.kin.secondary.MandelT")
-MandelU = e_tree.array("P.kin.secondary.MandelU")
-# Misc quantities
-fEvtType = e_tree.array("fEvtHdr.fEvtType")
-RFFreq = e_tree.array("MOFC1FREQ")
-RFFreqDiff = e_tree.array("MOFC1DELTA")
-pEDTM = e_tree.array("T.coin.pEDTM_tdcTime")
-# Relevant branches now stored as NP arrays
+# Branches read from the tree - (name in this script, leaf), read a chunk of events at a time by read_branches()
+Branches = [
+    # Timing info
+    ("CTime_ePiCoinTime_ROC1", "CTime.ePiCoinTime_ROC1"),
+    ("CTime_eKCoinTime_ROC1", "CTime.eKCoinTime_ROC1"),
+    ("CTime_epCoinTime_ROC1", "CTime.epCoinTime_ROC1"),
+    ("P_RF_tdcTime", "T.coin.pRF_tdcTime"),
+    ("P_hod_fpHitsTime", "P.hod.fpHitsTime"),
+    ("H_RF_Dist", "RFTime.HMS_RFtimeDist"),
+    ("P_RF_Dist", "RFTime.SHMS_RFtimeDist"),
+    # HMS info
+    ("H_gtr_beta", "H.gtr.beta"),
+    ("H_gtr_xp", "H.gtr.th"), # xpfp -> Theta
+    ("H_gtr_yp", "H.gtr.ph"), # ypfp -> Phi
+    ("H_gtr_dp", "H.gtr.dp"),
+    ("H_cal_etotnorm", "H.cal.etotnorm"),
+    ("H_cal_etottracknorm", "H.cal.etottracknorm"),
+    ("H_cer_npeSum", "H.cer.npeSum"),
+    # SHMS info
+    ("P_gtr_beta", "P.gtr.beta"),
+    ("P_gtr_xp", "P.gtr.th"), # xpfp -> Theta
+    ("P_gtr_yp", "P.gtr.ph"), # ypfp -> Phi
+    ("P_gtr_p", "P.gtr.p"),
+    ("P_gtr_dp", "P.gtr.dp"),
+    ("P_cal_etotnorm", "P.cal.etotnorm"),
+    ("P_cal_etottracknorm", "P.cal.etottracknorm"),
+    ("P_aero_npeSum", "P.aero.npeSum"),
+    ("P_aero_xAtAero", "P.aero.xAtAero"),
+    ("P_aero_yAtAero", "P.aero.yAtAero"),
+    ("P_hgcer_npeSum", "P.hgcer.npeSum"),
+    ("P_hgcer_xAtCer", "P.hgcer.xAtCer"),
+    ("P_hgcer_yAtCer", "P.hgcer.yAtCer"),
+    # Kinematic quantitites
+    ("Q2", "H.kin.primary.Q2"),
+    ("W", "H.kin.primary.W"),
+    ("epsilon", "H.kin.primary.epsilon"),
+    ("ph_q", "P.kin.secondary.ph_xq"),
+    ("emiss", "P.kin.secondary.emiss"),
+    ("pmiss", "P.kin.secondary.pmiss"),
+    ("MMpi", "P.kin.secondary.MMpi"),
+    ("MMK", "P.kin.secondary.MMK"),
+    ("MMp", "P.kin.secondary.MMp"),
+    ("MandelT", "P.kin.secondary.MandelT"),
+    ("MandelU", "P.kin.secondary.MandelU"),
+    # Misc quantities
+    ("fEvtType", "fEvtHdr.fEvtType"),
+    ("RFFreq", "MOFC1FREQ"),
+    ("RFFreqDiff", "MOFC1DELTA"),
+    ("pEDTM", "T.coin.pEDTM_tdcTime")]
+
+# Read events start to stop of every branch, each is stored as a global NP array under its name (so the cuts can use them)
+def read_branches(start, stop):
+    for (name, leaf) in Branches:
+        globals()[name] = e_tree.array(leaf, entrystart=start, entrystop=stop)
 
 r = klt.pyRoot()
 fout = '%s/UTIL_PION/DB/CUTS/run_type/coin_prod.cuts' % REPLAYPATH
 # read in cuts file and make dictionary
 c = klt.pyPlot(REPLAYPATH)
 readDict = c.read_dict(fout,runNum)
+# Same cuts with the scanned parameters left as names, so the scan can find the comparisons to each one
+if ScanAxes:
+    ScanDict = c.read_dict(fout,runNum,[name for (name, low, high, nPoints) in ScanAxes])
 # This method calls several methods in kaonlt package. It is required to create properly formated
 # dictionaries. The evaluation must be in the analysis script because the analysis variables (i.e. the
 # leaves of interest) are not defined in the kaonlt package. This makes the system more flexible
 # overall, but a bit more cumbersome in the analysis script. Perhaps one day a better solution will be
 # implimented.
-def make_cutDict(cut,inputDict=None):
+# Each term is only evaluated once per chunk (most terms are shared by many cuts), Terms maps the term to its evaluated dictionary
+Terms = {}
+def make_cutDict(cut,inputDict=None,verbose=True):
 
     global c
 
     c = klt.pyPlot(REPLAYPATH,readDict)
     x = c.w_dict(cut)
-    print("%s" % cut)
-    print("x ", x)
+    if verbose:
+        print("%s" % cut)
+        print("x ", x)
     
     if inputDict == None:
         inputDict = {}
@@ -150,169 +205,315 @@ def make_cutDict(cut,inputDict=None):
         if tmp == "":
             continue
         else:
-            inputDict[cut].update(eval(tmp))
+            if tmp not in Terms:
+                Terms[tmp] = eval(tmp)
+            inputDict[cut].update(Terms[tmp])
         
     return inputDict
 
-cutDict = make_cutDict("coin_epi_cut_all")
-cutDict = make_cutDict("coin_epi_cut_prompt", cutDict)
-cutDict = make_cutDict("coin_epi_cut_rand", cutDict)
-cutDict = make_cutDict("coin_epi_cut_all_RF", cutDict)
-cutDict = make_cutDict("coin_epi_cut_prompt_RF", cutDict)
-cutDict = make_cutDict("coin_epi_cut_rand_RF", cutDict)
-cutDict = make_cutDict("coin_ek_cut_all", cutDict)
-cutDict = make_cutDict("coin_ek_cut_prompt", cutDict)
-cutDict = make_cutDict("coin_ek_cut_rand", cutDict)
-cutDict = make_cutDict("coin_ek_cut_all_RF", cutDict)
-cutDict = make_cutDict("coin_ek_cut_prompt_RF", cutDict)
-cutDict = make_cutDict("coin_ek_cut_rand_RF", cutDict)
-cutDict = make_cutDict("coin_ep_cut_all", cutDict)
-cutDict = make_cutDict("coin_ep_cut_prompt", cutDict)
-cutDict = make_cutDict("coin_ep_cut_rand", cutDict)
-cutDict = make_cutDict("coin_ep_cut_all_RF", cutDict)
-cutDict = make_cutDict("coin_ep_cut_prompt_RF", cutDict)
-cutDict = make_cutDict("coin_ep_cut_rand_RF", cutDict)
-c = klt.pyPlot(REPLAYPATH,cutDict)
-
-def coin_pions(): 
-    # Define the array of arrays containing the relevant HMS and SHMS info
-    NoCut_COIN_Pions = [H_gtr_beta, H_gtr_xp, H_gtr_yp, H_gtr_dp, H_cal_etotnorm, H_cal_etottracknorm, H_cer_npeSum, CTime_ePiCoinTime_ROC1, P_RF_tdcTime, P_hod_fpHitsTime, P_gtr_beta, P_gtr_xp, P_gtr_yp, P_gtr_p, P_gtr_dp, P_cal_etotnorm, P_cal_etottracknorm, P_aero_npeSum, P_aero_xAtAero, P_aero_yAtAero, P_hgcer_npeSum, P_hgcer_xAtCer, P_hgcer_yAtCer, MMpi, MMK, MMp, H_RF_Dist, P_RF_Dist, Q2, W, epsilon, MandelT, MandelU, ph_q]
-    Uncut_COIN_Pions = [(HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTPi, RF, HodStart, PiBeta, Pixp, Piyp, PiP, PiDel, PiCal, PiCalTrack, PiAero, PiAeroX, PiAeroY, PiHGC, PiHGCX, PiHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) for (HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTPi, RF, HodStart, PiBeta, Pixp, Piyp, PiP, PiDel, PiCal, PiCalTrack, PiAero, PiAeroX, PiAeroY, PiHGC, PiHGCX, PiHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) in zip(*NoCut_COIN_Pions)] 
-
-    # Create array of arrays of pions after cuts, all events, prompt and random
-    Cut_COIN_Pions_tmp = NoCut_COIN_Pions
-    Cut_COIN_Pions_all_tmp = []
-    Cut_COIN_Pions_all_noRF_tmp = []    
-    Cut_COIN_Pions_prompt_tmp = []
-    Cut_COIN_Pions_prompt_noRF_tmp = []
-    Cut_COIN_Pions_rand_tmp = []
-    Cut_COIN_Pions_rand_noRF_tmp = []
-
-    for arr in Cut_COIN_Pions_tmp:
-        Cut_COIN_Pions_all_tmp.append(c.add_cut(arr, "coin_epi_cut_all_RF"))
-        Cut_COIN_Pions_all_noRF_tmp.append(c.add_cut(arr, "coin_epi_cut_all"))
-        Cut_COIN_Pions_prompt_tmp.append(c.add_cut(arr, "coin_epi_cut_prompt_RF"))
-        Cut_COIN_Pions_prompt_noRF_tmp.append(c.add_cut(arr, "coin_epi_cut_prompt"))
-        Cut_COIN_Pions_rand_tmp.append(c.add_cut(arr, "coin_epi_cut_rand_RF"))
-        Cut_COIN_Pions_rand_noRF_tmp.append(c.add_cut(arr, "coin_epi_cut_rand"))
-
-    Cut_COIN_Pions_all = [(HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTPi, RF, HodStart, PiBeta, Pixp, Piyp, PiP, PiDel, PiCal, PiCalTrack, PiAero, PiAeroX, PiAeroY, PiHGC, PiHGCX, PiHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) for (HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTPi, RF, HodStart, PiBeta, Pixp, Piyp, PiP, PiDel, PiCal, PiCalTrack, PiAero, PiAeroX, PiAeroY, PiHGC, PiHGCX, PiHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) in zip(*Cut_COIN_Pions_all_tmp)]
-
-    Cut_COIN_Pions_all_noRF = [(HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTPi, RF, HodStart, PiBeta, Pixp, Piyp, PiP, PiDel, PiCal, PiCalTrack, PiAero, PiAeroX, PiAeroY, PiHGC, PiHGCX, PiHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) for (HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTPi, RF, HodStart, PiBeta, Pixp, Piyp, PiP, PiDel, PiCal, PiCalTrack, PiAero, PiAeroX, PiAeroY, PiHGC, PiHGCX, PiHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) in zip(*Cut_COIN_Pions_all_noRF_tmp)]
-
-    Cut_COIN_Pions_prompt = [(HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTPi, RF, HodStart, PiBeta, Pixp, Piyp, PiP, PiDel, PiCal, PiCalTrack, PiAero, PiAeroX, PiAeroY, PiHGC, PiHGCX, PiHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) for (HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTPi, RF, HodStart, PiBeta, Pixp, Piyp, PiP, PiDel, PiCal, PiCalTrack, PiAero, PiAeroX, PiAeroY, PiHGC, PiHGCX, PiHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) in zip(*Cut_COIN_Pions_prompt_tmp)]
-
-    Cut_COIN_Pions_prompt_noRF = [(HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTPi, RF, HodStart, PiBeta, Pixp, Piyp, PiP, PiDel, PiCal, PiCalTrack, PiAero, PiAeroX, PiAeroY, PiHGC, PiHGCX, PiHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) for (HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTPi, RF, HodStart, PiBeta, Pixp, Piyp, PiP, PiDel, PiCal, PiCalTrack, PiAero, PiAeroX, PiAeroY, PiHGC, PiHGCX, PiHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) in zip(*Cut_COIN_Pions_prompt_noRF_tmp)]
-
-    Cut_COIN_Pions_random = [(HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTPi, RF, HodStart, PiBeta, Pixp, Piyp, PiP, PiDel, PiCal, PiCalTrack, PiAero, PiAeroX, PiAeroY, PiHGC, PiHGCX, PiHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) for (HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTPi, RF, HodStart, PiBeta, Pixp, Piyp, PiP, PiDel, PiCal, PiCalTrack, PiAero, PiAeroX, PiAeroY, PiHGC, PiHGCX, PiHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) in zip(*Cut_COIN_Pions_rand_tmp)]
-
-    Cut_COIN_Pions_random_noRF = [(HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTPi, RF, HodStart, PiBeta, Pixp, Piyp, PiP, PiDel, PiCal, PiCalTrack, PiAero, PiAeroX, PiAeroY, PiHGC, PiHGCX, PiHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) for (HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTPi, RF, HodStart, PiBeta, Pixp, Piyp, PiP, PiDel, PiCal, PiCalTrack, PiAero, PiAeroX, PiAeroY, PiHGC, PiHGCX, PiHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) in zip(*Cut_COIN_Pions_rand_noRF_tmp)]
-
-    COIN_Pions = {
-        "Uncut_Pion_Events" : Uncut_COIN_Pions,
-        "Cut_Pion_Events_All" : Cut_COIN_Pions_all,
-        "Cut_Pion_Events_All_NoRF" : Cut_COIN_Pions_all_noRF,
-        "Cut_Pion_Events_Prompt" : Cut_COIN_Pions_prompt,
-        "Cut_Pion_Events_Prompt_NoRF" : Cut_COIN_Pions_prompt_noRF,
-        "Cut_Pion_Events_Random" : Cut_COIN_Pions_random,
-        "Cut_Pion_Events_Random_NoRF" : Cut_COIN_Pions_random_noRF,
-        }
-
-    return COIN_Pions
-
-def coin_kaons(): 
-    # Define the array of arrays containing the relevant HMS and SHMS info
-    NoCut_COIN_Kaons = [H_gtr_beta, H_gtr_xp, H_gtr_yp, H_gtr_dp, H_cal_etotnorm, H_cal_etottracknorm, H_cer_npeSum, CTime_eKCoinTime_ROC1, P_RF_tdcTime, P_hod_fpHitsTime, P_gtr_beta, P_gtr_xp, P_gtr_yp, P_gtr_p, P_gtr_dp, P_cal_etotnorm, P_cal_etottracknorm, P_aero_npeSum, P_aero_xAtAero, P_aero_yAtAero, P_hgcer_npeSum, P_hgcer_xAtCer, P_hgcer_yAtCer, MMpi, MMK, MMp, H_RF_Dist, P_RF_Dist, Q2, W, epsilon, MandelT, MandelU, ph_q]
-    Uncut_COIN_Kaons = [(HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTK, RF, HodStart, KBeta, Kxp, Kyp, KP, KDel, KCal, KCalTrack, KAero, KAeroX, KAeroY, KHGC, KHGCX, KHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) for (HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTK, RF, HodStart, KBeta, Kxp, Kyp, KP, KDel, KCal, KCalTrack, KAero, KAeroX, KAeroY, KHGC, KHGCX, KHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) in zip(*NoCut_COIN_Kaons)] 
-
-    # Create array of arrays of pions after cuts, all events, prompt and random
-    Cut_COIN_Kaons_tmp = NoCut_COIN_Kaons
-    Cut_COIN_Kaons_all_tmp = []
-    Cut_COIN_Kaons_prompt_tmp = []
-    Cut_COIN_Kaons_rand_tmp = []
-
-    for arr in Cut_COIN_Kaons_tmp:
-        Cut_COIN_Kaons_all_tmp.append(c.add_cut(arr, "coin_ek_cut_all_RF"))
-        Cut_COIN_Kaons_prompt_tmp.append(c.add_cut(arr, "coin_ek_cut_prompt_RF"))
-        Cut_COIN_Kaons_rand_tmp.append(c.add_cut(arr, "coin_ek_cut_rand_RF"))
-
-    Cut_COIN_Kaons_all = [(HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTK, RF, HodStart, KBeta, Kxp, Kyp, KP, KDel, KCal, KCalTrack, KAero, KAeroX, KAeroY, KHGC, KHGCX, KHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) for (HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTK, RF, HodStart, KBeta, Kxp, Kyp, KP, KDel, KCal, KCalTrack, KAero, KAeroX, KAeroY, KHGC, KHGCX, KHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) in zip(*Cut_COIN_Kaons_all_tmp)]
-
-    Cut_COIN_Kaons_prompt = [(HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTK, RF, HodStart, KBeta, Kxp, Kyp, KP, KDel, KCal, KCalTrack, KAero, KAeroX, KAeroY, KHGC, KHGCX, KHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) for (HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTK, RF, HodStart, KBeta, Kxp, Kyp, KP, KDel, KCal, KCalTrack, KAero, KAeroX, KAeroY, KHGC, KHGCX, KHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) in zip(*Cut_COIN_Kaons_prompt_tmp)]
-
-    Cut_COIN_Kaons_random = [(HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTK, RF, HodStart, KBeta, Kxp, Kyp, KP, KDel, KCal, KCalTrack, KAero, KAeroX, KAeroY, KHGC, KHGCX, KHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) for (HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTK, RF, HodStart, KBeta, Kxp, Kyp, KP, KDel, KCal, KCalTrack, KAero, KAeroX, KAeroY, KHGC, KHGCX, KHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) in zip(*Cut_COIN_Kaons_rand_tmp)]
-
-    COIN_Kaons = {
-        "Uncut_Kaon_Events" : Uncut_COIN_Kaons,
-        "Cut_Kaon_Events_All" : Cut_COIN_Kaons_all,
-        "Cut_Kaon_Events_Prompt" : Cut_COIN_Kaons_prompt,
-        "Cut_Kaon_Events_Random" : Cut_COIN_Kaons_random,
-        }
-
-    return COIN_Kaons
-
-def coin_protons(): 
-    # Define the array of arrays containing the relevant HMS and SHMS info
-    NoCut_COIN_Protons = [H_gtr_beta, H_gtr_xp, H_gtr_yp, H_gtr_dp, H_cal_etotnorm, H_cal_etottracknorm, H_cer_npeSum, CTime_epCoinTime_ROC1, P_RF_tdcTime, P_hod_fpHitsTime, P_gtr_beta, P_gtr_xp, P_gtr_yp, P_gtr_p, P_gtr_dp, P_cal_etotnorm, P_cal_etottracknorm, P_aero_npeSum, P_aero_xAtAero, P_aero_yAtAero, P_hgcer_npeSum, P_hgcer_xAtCer, P_hgcer_yAtCer, MMpi, MMK, MMp, H_RF_Dist, P_RF_Dist, Q2, W, epsilon, MandelT, MandelU, ph_q]
-    Uncut_COIN_Protons = [(HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTp, RF, HodStart, pBeta, pxp, pyp, pP, pDel, pCal, pCalTrack, pAero, pAeroX, pAeroY, pHGC, pHGCX, pHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) for (HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTp, RF, HodStart, pBeta, pxp, pyp, pP, pDel, pCal, pCalTrack, pAero, pAeroX, pAeroY, pHGC, pHGCX, pHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) in zip(*NoCut_COIN_Protons)] 
-
-    # Create array of arrays of pions after cuts, all events, prompt and random
-    Cut_COIN_Protons_tmp = NoCut_COIN_Protons
-    Cut_COIN_Protons_all_tmp = []
-    Cut_COIN_Protons_prompt_tmp =[]
-    Cut_COIN_Protons_rand_tmp =[]
-
-    for arr in Cut_COIN_Protons_tmp:
-        Cut_COIN_Protons_all_tmp.append(c.add_cut(arr, "coin_ep_cut_all_RF"))
-        Cut_COIN_Protons_prompt_tmp.append(c.add_cut(arr, "coin_ep_cut_prompt_RF"))
-        Cut_COIN_Protons_rand_tmp.append(c.add_cut(arr, "coin_ep_cut_rand_RF"))
-
-    Cut_COIN_Protons_all = [(HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTp, RF, HodStart, pBeta, pxp, pyp, pP, pDel, pCal, pCalTrack, pAero, pAeroX, pAeroY, pHGC, pHGCX, pHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) for (HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTp, RF, HodStart, pBeta, pxp, pyp, pP, pDel, pCal, pCalTrack, pAero, pAeroX, pAeroY, pHGC, pHGCX, pHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) in zip(*Cut_COIN_Protons_all_tmp)]
-
-    Cut_COIN_Protons_prompt = [(HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTp, RF, HodStart, pBeta, pxp, pyp, pP, pDel, pCal, pCalTrack, pAero, pAeroX, pAeroY, pHGC, pHGCX, pHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) for (HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTp, RF, HodStart, pBeta, pxp, pyp, pP, pDel, pCal, pCalTrack, pAero, pAeroX, pAeroY, pHGC, pHGCX, pHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) in zip(*Cut_COIN_Protons_prompt_tmp)]
-
-    Cut_COIN_Protons_random = [(HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTp, RF, HodStart, pBeta, pxp, pyp, pP, pDel, pCal, pCalTrack, pAero, pAeroX, pAeroY, pHGC, pHGCX, pHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) for (HBeta, Hxp, Hyp, Hdel, HCal, HCalTrack, HCer, CTp, RF, HodStart, pBeta, pxp, pyp, pP, pDel, pCal, pCalTrack, pAero, pAeroX, pAeroY, pHGC, pHGCX, pHGCY, mm1, mm2, mm3, HRFDist, PRFDist, Kin_Q2, Kin_W, Kin_eps, Kin_t, Kin_u, phq) in zip(*Cut_COIN_Protons_rand_tmp)]
-
-    COIN_Protons = {
-        "Uncut_Proton_Events" : Uncut_COIN_Protons,
-        "Cut_Proton_Events_All" : Cut_COIN_Protons_all,
-        "Cut_Proton_Events_Prompt" : Cut_COIN_Protons_prompt,
-        "Cut_Proton_Events_Random" : Cut_COIN_Protons_random,
-        }
-
-    return COIN_Protons
+# Cuts used by the selections below, evaluated on the events currently read in by build_cuts()
+CutNames = ["coin_epi_cut_all",
+            "coin_epi_cut_prompt",
+            "coin_epi_cut_rand",
+            "coin_epi_cut_all_RF",
+            "coin_epi_cut_prompt_RF",
+            "coin_epi_cut_rand_RF",
+            "coin_ek_cut_all",
+            "coin_ek_cut_prompt",
+            "coin_ek_cut_rand",
+            "coin_ek_cut_all_RF",
+            "coin_ek_cut_prompt_RF",
+            "coin_ek_cut_rand_RF",
+            "coin_ep_cut_all",
+            "coin_ep_cut_prompt",
+            "coin_ep_cut_rand",
+            "coin_ep_cut_all_RF",
+            "coin_ep_cut_prompt_RF",
+            "coin_ep_cut_rand_RF"]
+
+# Evaluate every cut on the events currently read in, the cut descriptions are only printed for the first chunk
+def build_cuts(verbose=True):
+    global c
+    Terms.clear()
+    cutDict = None
+    for cut in CutNames:
+        cutDict = make_cutDict(cut, cutDict, verbose)
+    c = klt.pyPlot(REPLAYPATH,cutDict)
+
+# Branches saved for each species, (name in the output) the cointime column is the cointime of that species
+def data_header(CTBranch):
+    return ["H_gtr_beta","H_gtr_xp","H_gtr_yp","H_gtr_dp","H_cal_etotnorm","H_cal_etottracknorm","H_cer_npeSum",CTBranch,"P_RF_tdcTime","P_hod_fpHitsTime","P_gtr_beta","P_gtr_xp","P_gtr_yp","P_gtr_p","P_gtr_dp","P_cal_etotnorm","P_cal_etottracknorm","P_aero_npeSum","P_aero_xAtAero","P_aero_yAtAero","P_hgcer_npeSum","P_hgcer_xAtCer","P_hgcer_yAtCer","MMpi","MMK","MMp","H_RF_Dist","P_RF_Dist","Q2","W","epsilon","MandelT","MandelU","ph_q"]
+
+# Species and their cointime branch, in the order they are written out
+Species = [("Pion", "CTime_ePiCoinTime_ROC1"), ("Kaon", "CTime_eKCoinTime_ROC1"), ("Proton", "CTime_epCoinTime_ROC1")]
+# Every output selection - (species, output tree, cut), each one is a bit of the per event bitfield made by classify()
+Selections = [("Pion", "Cut_Pion_Events_All", "coin_epi_cut_all_RF"),
+              ("Pion", "Cut_Pion_Events_All_NoRF", "coin_epi_cut_all"),
+              ("Pion", "Cut_Pion_Events_Prompt", "coin_epi_cut_prompt_RF"),
+              ("Pion", "Cut_Pion_Events_Prompt_NoRF", "coin_epi_cut_prompt"),
+              ("Pion", "Cut_Pion_Events_Random", "coin_epi_cut_rand_RF"),
+              ("Pion", "Cut_Pion_Events_Random_NoRF", "coin_epi_cut_rand"),
+              ("Kaon", "Cut_Kaon_Events_All", "coin_ek_cut_all_RF"),
+              ("Kaon", "Cut_Kaon_Events_Prompt", "coin_ek_cut_prompt_RF"),
+              ("Kaon", "Cut_Kaon_Events_Random", "coin_ek_cut_rand_RF"),
+              ("Proton", "Cut_Proton_Events_All", "coin_ep_cut_all_RF"),
+              ("Proton", "Cut_Proton_Events_Prompt", "coin_ep_cut_prompt_RF"),
+              ("Proton", "Cut_Proton_Events_Random", "coin_ep_cut_rand_RF")]
+
+# Background subtracted missing mass histograms and yields - (name, histogram, missing mass branch, nBins, low, high, prompt selection, random selection)
+Subtractions = [("Pion", "h1_MMpi_BGSub", "MMpi", 220, 0.5, 1.6, "Cut_Pion_Events_Prompt", "Cut_Pion_Events_Random"),
+                ("Pion_NoRF", "h1_MMpi_BGSub_NoRF", "MMpi", 220, 0.5, 1.6, "Cut_Pion_Events_Prompt_NoRF", "Cut_Pion_Events_Random_NoRF"),
+                ("Kaon", "h1_MMK_BGSub", "MMK", 200, 0.8, 1.8, "Cut_Kaon_Events_Prompt", "Cut_Kaon_Events_Random"),
+                ("Proton", "h1_MMp_BGSub", "MMp", 150, 0.0, 1.5, "Cut_Proton_Events_Prompt", "Cut_Proton_Events_Random")]
+
+# Evaluate every selection once, bit i of an event is set if it passes Selections[i]
+# A cut which is another plus extra terms (e.g. the _RF cuts) is the mask of that cut ANDed with the extra terms only
+def classify():
+    nEvts = len(H_gtr_beta)
+    Bits = np.zeros(nEvts, dtype=np.uint16)
+    for bit, (name, key, cut) in enumerate(Selections):
+        Bits[c.mask(cut)] |= (1 << bit)
+    return Bits
+
+# All events and then every selection of one species, one at a time so each selection can be freed as soon as it is written
+def coin_species(name, CTBranch, Bits):
+    Header = data_header(CTBranch)
+    Uncut = pd.DataFrame(OrderedDict((col, globals()[col]) for col in Header), columns = Header)
+    yield ("Uncut_%s_Events" % name, Uncut)
+    for bit, (species, key, cut) in enumerate(Selections):
+        if (species == name):
+            Selected = Uncut[(Bits & (1 << bit)) != 0]
+            # Number the selected events from 0 as before (setting the index doesn't copy the data)
+            Selected.index = pd.RangeIndex(len(Selected))
+            yield (key, Selected)
+
+# Events passing one of the selections (by output tree name)
+def selected(Bits, key):
+    bit = [Selection[1] for Selection in Selections].index(key)
+    return (Bits & (1 << bit)) != 0
+
+# Prompt minus random subtraction from the same bitfield, each event is weighted +1 (prompt) or -1/nWindows (random)
+# Returns the histograms (with the sum of squared weights of each bin alongside), a yield row per subtraction (with its sum of squared weights) and the masks and weights of each subtraction
+def subtract(Bits):
+    Sub = klt.pySubtract(TimingCutFile, runNum)
+    Histos = OrderedDict()
+    Yields = []
+    Weights = OrderedDict()
+    for (name, Histo, MMBranch, nBins, low, high, Prompt, Random) in Subtractions:
+        PromptEvents = selected(Bits, Prompt)
+        RandomEvents = selected(Bits, Random)
+        w = Sub.weights(PromptEvents, RandomEvents)
+        counts, sumw2, edges = Sub.histogram(globals()[MMBranch], w, nBins, low, high)
+        Histos[Histo] = (counts, edges)
+        Histos["%s_SumW2" % Histo] = (sumw2, edges)
+        Yield, Error = Sub.yields(w)
+        Yields.append([name, PromptEvents.sum(), RandomEvents.sum(), Sub.randomWeight, Yield, Error*Error])
+        Weights[name] = (PromptEvents, RandomEvents, w)
+    return Histos, pd.DataFrame(Yields, columns = ["Selection", "nPrompt", "nRandom", "RandomWeight", "Yield", "SumW2"]), Weights
+
+# Kinematic grids from Binning_Parameters.csv - (name, grid, values binned on each axis), -t is binned and phi is wrapped into 0 to 2pi
+def kinematic_grids():
+    Param = klt.pyParam.cached(BinningFile)
+    get = lambda col: Param.get(int(runNum), col)
+    tphi = klt.pyBinning.uniform(("t", get("t_nBins"), get("t_Low"), get("t_High")), ("phi", get("phi_nBins"), 0.0, 2*np.pi))
+    Q2W = klt.pyBinning.uniform(("Q2", get("Q2_nBins"), get("Q2_Low"), get("Q2_High")), ("W", get("W_nBins"), get("W_Low"), get("W_High")))
+    return [("tphi", tphi, (-MandelT, np.mod(ph_q, 2*np.pi))), ("Q2W", Q2W, (Q2, W))]
+
+# Prompt and random counts and the background subtracted yield in every bin of each grid, the bin of each event is found once per grid
+def binned_yields(Weights):
+    Tables = OrderedDict()
+    for (grid, Binning, Values) in kinematic_grids():
+        Index = Binning.index(*Values)
+        Table = []
+        for name, (PromptEvents, RandomEvents, w) in Weights.items():
+            Rows = Binning.table()
+            Rows.insert(0, "Selection", name)
+            Rows["nPrompt"] = Binning.count(Index, PromptEvents)
+            Rows["nRandom"] = Binning.count(Index, RandomEvents)
+            Yield, SumW2 = Binning.accumulate(Index, w)
+            Rows["Yield"] = Yield
+            Rows["SumW2"] = SumW2
+            Table.append(Rows)
+        Tables[grid] = pd.concat(Table, ignore_index=True)
+    return Tables
+
+# Scannable cut parameters - {prefix : parameter table}
+ScanFiles = {"pid" : "PID_Parameters.csv", "accept" : "Acceptance_Parameters.csv"}
+
+# Scanned cut parameters - (parameter, value for this run)
+def scan_parameters():
+    Params = []
+    for (name, low, high, nPoints) in ScanAxes:
+        prefix, column = (name.split(".", 1) + [""])[:2]
+        if prefix not in ScanFiles:
+            print("!!!!! ERROR !!!!!\n Can't scan %s, only pid. and accept. parameters can be scanned\n!!!!! ERROR !!!!!" % name)
+            sys.exit(5)
+        paramFile = ScanFiles[prefix]
+        Param = klt.pyParam.cached("%s/UTIL_PION/DB/PARAM/%s" % (REPLAYPATH, paramFile))
+        if column not in Param.table.columns:
+            print("!!!!! ERROR !!!!!\n %s not found in %s\n!!!!! ERROR !!!!!" % (column, paramFile))
+            sys.exit(5)
+        Params.append((name, float(Param.get(int(runNum), column))))
+    return Params
+
+# Number of events passing a cut at every point of the scan. The cut is taken from ScanDict, where the scanned parameters are
+# still names, and their comparisons are relaxed (always pass) so the rest of the cut is one mask, each event passing it covers a
+# range of points along every axis found from its sorted position among the scan values. Terms are evaluated through the same
+# Terms cache as the cuts, so only the relaxed terms are new.
+def scan_counts(Scan, Params, cut):
+    Mask = None
+    Found = [[] for Param in Params]
+    for term in klt.pyPlot(REPLAYPATH,ScanDict).w_dict(cut):
+        if term == "":
+            continue
+        for i, (name, nominal) in enumerate(Params):
+            term, matched = klt.pyScan.relax(term, name)
+            Found[i] += matched
+        if term not in Terms:
+            Terms[term] = eval(term)
+        for arr in Terms[term].values():
+            Mask = np.array(arr, dtype=bool) if Mask is None else (Mask & arr)
+    lo = []
+    hi = []
+    for i, comparisons in enumerate(Found):
+        # Parameters the cut doesn't use pass at every point
+        l = np.zeros(Mask.sum(), dtype=np.int64)
+        h = np.full(Mask.sum(), Scan.shape[i], dtype=np.int64)
+        for (lhs, op) in comparisons:
+            (cl, ch) = Scan.interval(i, eval(lhs)[Mask], op)
+            l = np.maximum(l, cl)
+            h = np.minimum(h, ch)
+        lo.append(l)
+        hi.append(h)
+    return Scan.count(lo, hi), [len(comparisons) > 0 for comparisons in Found]
+
+# Prompt and random counts and the background subtracted yield of each subtraction at every point of the scan. The prompt and
+# random windows don't overlap so the yield is the prompt minus the scaled random count, as pySubtract weights the events.
+def scan_yields(Scan, Params, verbose=False):
+    Sub = klt.pySubtract(TimingCutFile, runNum)
+    CutOf = dict((key, cut) for (species, key, cut) in Selections)
+    Table = []
+    for (name, Histo, MMBranch, nBins, low, high, Prompt, Random) in Subtractions:
+        nPrompt, Used = scan_counts(Scan, Params, CutOf[Prompt])
+        nRandom = scan_counts(Scan, Params, CutOf[Random])[0]
+        if verbose:
+            print("Scan of %s varies %s" % (name, ", ".join([Param[0] for (Param, used) in zip(Params, Used) if used]) or "nothing"))
+        Rows = Scan.table()
+        Rows.insert(0, "Selection", name)
+        Rows["nPrompt"] = nPrompt
+        Rows["nRandom"] = nRandom
+        Rows["Yield"] = nPrompt + Sub.randomWeight*nRandom
+        Rows["SumW2"] = nPrompt + Sub.randomWeight*Sub.randomWeight*nRandom
+        Table.append(Rows)
+    return pd.concat(Table, ignore_index=True)
+
+# Events per chunk, the whole run at once unless a memory budget is set. Each event in a chunk holds every branch read (8 bytes each),
+# the masks of every cut and up to three copies of the saved columns (the uncut dataframe, one selection and the records root_pandas writes from)
+def chunk_size(nEvts):
+    if MemoryBudget is None:
+        return max(nEvts, 1)
+    perEvent = 8*len(Branches) + 16*len(CutNames) + 3*8*len(data_header(""))
+    # Whatever is already in use (python, ROOT, the cut dictionaries) isn't available for events, ru_maxrss is in kB
+    used = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024.0
+    size = int((MemoryBudget*1024*1024 - used)/perEvent)
+    if (size < MinChunkSize):
+        print("!!! WARNING !!! - %.0f MB already in use before reading any events, memory budget of %.0f MB can't be met, using chunks of %i events - !!! WARNING !!!" % (used/(1024*1024), MemoryBudget, MinChunkSize))
+        size = MinChunkSize
+    return min(size, max(nEvts, 1))
+
+# Add the sums of a chunk to the running totals, Total is None for the first chunk
+def add_sums(Total, Chunk, Columns):
+    if Total is None:
+        return Chunk
+    for col in Columns:
+        Total[col] += Chunk[col].values
+    return Total
 
 def main():
-    COIN_Pion_Data = coin_pions()
-    COIN_Kaon_Data = coin_kaons()
-    COIN_Proton_Data = coin_protons()
-    # This is just the list of branches we use from the initial root file for each dict
-    # I don't like re-defining this here as it's very prone to errors if you included (or removed something) earlier but didn't modify it here
-    # Should base the branches to include based on some list and just repeat the list here (or call it again directly below)
-    COIN_Pion_Data_Header = ["H_gtr_beta","H_gtr_xp","H_gtr_yp","H_gtr_dp","H_cal_etotnorm","H_cal_etottracknorm","H_cer_npeSum","CTime_ePiCoinTime_ROC1","P_RF_tdcTime","P_hod_fpHitsTime","P_gtr_beta","P_gtr_xp","P_gtr_yp","P_gtr_p","P_gtr_dp","P_cal_etotnorm","P_cal_etottracknorm","P_aero_npeSum","P_aero_xAtAero","P_aero_yAtAero","P_hgcer_npeSum","P_hgcer_xAtCer","P_hgcer_yAtCer","MMpi","MMK","MMp","H_RF_Dist","P_RF_Dist","Q2","W","epsilon","MandelT","MandelU","ph_q"]
-    COIN_Kaon_Data_Header = ["H_gtr_beta","H_gtr_xp","H_gtr_yp","H_gtr_dp","H_cal_etotnorm","H_cal_etottracknorm","H_cer_npeSum","CTime_eKCoinTime_ROC1","P_RF_tdcTime","P_hod_fpHitsTime","P_gtr_beta","P_gtr_xp","P_gtr_yp","P_gtr_p","P_gtr_dp","P_cal_etotnorm","P_cal_etottracknorm","P_aero_npeSum","P_aero_xAtAero","P_aero_yAtAero","P_hgcer_npeSum","P_hgcer_xAtCer","P_hgcer_yAtCer","MMpi","MMK","MMp","H_RF_Dist","P_RF_Dist","Q2","W","epsilon","MandelT","MandelU","ph_q"]
-    COIN_Proton_Data_Header = ["H_gtr_beta","H_gtr_xp","H_gtr_yp","H_gtr_dp","H_cal_etotnorm","H_cal_etottracknorm","H_cer_npeSum","CTime_epCoinTime_ROC1","P_RF_tdcTime","P_hod_fpHitsTime","P_gtr_beta","P_gtr_xp","P_gtr_yp","P_gtr_p","P_gtr_dp","P_cal_etotnorm","P_cal_etottracknorm","P_aero_npeSum","P_aero_xAtAero","P_aero_yAtAero","P_hgcer_npeSum","P_hgcer_xAtCer","P_hgcer_yAtCer","MMpi","MMK","MMp","H_RF_Dist","P_RF_Dist","Q2","W","epsilon","MandelT","MandelU","ph_q"]
-    # Need to create a dict for all the branches we grab
-    data = {}
-
-    for d in (COIN_Pion_Data, COIN_Kaon_Data, COIN_Proton_Data): # Convert individual dictionaries into a "dict of dicts"
-        data.update(d)
-        data_keys = list(data.keys()) # Create a list of all the keys in all dicts added above, each is an array of data
-    for i in range (0, len(data_keys)):
-        if("Pion" in data_keys[i]):
-            DFHeader=list(COIN_Pion_Data_Header)
-        elif("Kaon" in data_keys[i]):
-            DFHeader=list(COIN_Kaon_Data_Header)
-        elif("Proton" in data_keys[i]):
-            DFHeader=list(COIN_Proton_Data_Header)
+    nEvts = e_tree.numentries
+    ChunkSize = chunk_size(nEvts)
+    if MemoryBudget is not None:
+        print("Memory budget %.0f MB, processing %i events in chunks of %i" % (MemoryBudget, nEvts, ChunkSize))
+    Histos = None
+    Yields = None
+    Tables = OrderedDict()
+    ScanTable = None
+    if ScanAxes:
+        Params = scan_parameters()
+        Scan = klt.pyScan.uniform(*ScanAxes)
+        for (name, nominal) in Params:
+            print("Scanning %s, %s for this run" % (name, nominal))
+        print("Scan of %i points" % len(Scan))
+    # Events are weighted the same way however the run is chunked (seeded per event range), the run number is the seed
+    Boot = None
+    BootYields = 0
+    if nReplicas is not None:
+        Boot = klt.pyBootstrap(nReplicas, seed=int(runNum), processes=BootProcesses)
+    first = True
+    # Events written to each tree so far, the index (saved as the __index__ branch) carries on from the previous chunk
+    Written = {}
+    for start in range(0, max(nEvts, 1), ChunkSize):
+        read_branches(start, min(start+ChunkSize, nEvts))
+        build_cuts(start == 0)
+        Bits = classify()
+        ChunkHistos, ChunkYields, Weights = subtract(Bits)
+        if Histos is None:
+            Histos = ChunkHistos
         else:
-            continue
-            # Uncomment the line below if you want .csv file output, WARNING the files can be very large and take a long time to process!
-            #pd.DataFrame(data.get(data_keys[i])).to_csv("%s/%s_%s.csv" % (OUTPATH, data_keys[i], runNum), header=DFHeader, index=False) # Convert array to panda dataframe and write to csv with correct header
-        if (i == 0):
-            pd.DataFrame(data.get(data_keys[i]), columns = DFHeader, index = None).to_root("%s/%s_%s_Analysed_Data.root" % (OUTPATH, runNum, MaxEvent), key ="%s" % data_keys[i])
-        elif (i != 0):
-            pd.DataFrame(data.get(data_keys[i]), columns = DFHeader, index = None).to_root("%s/%s_%s_Analysed_Data.root" % (OUTPATH, runNum, MaxEvent), key ="%s" % data_keys[i], mode ='a') 
-                    
+            for key, (counts, edges) in ChunkHistos.items():
+                Histos[key] = (Histos[key][0] + counts, edges)
+        Yields = add_sums(Yields, ChunkYields, ["nPrompt", "nRandom", "Yield", "SumW2"])
+        for grid, Table in binned_yields(Weights).items():
+            Tables[grid] = add_sums(Tables.get(grid), Table, ["nPrompt", "nRandom", "Yield", "SumW2"])
+        if Boot is not None:
+            # Replicas of every subtraction at once, the columns of Prompt and Random are the subtractions
+            Prompt = np.column_stack([PromptEvents for (PromptEvents, RandomEvents, w) in Weights.values()])
+            Random = np.column_stack([RandomEvents for (PromptEvents, RandomEvents, w) in Weights.values()])
+            BootYields = BootYields + Boot.subtract(Prompt, Random, ChunkYields["RandomWeight"].values, start)
+            del Prompt, Random
+        del Weights
+        if ScanAxes:
+            ScanTable = add_sums(ScanTable, scan_yields(Scan, Params, start == 0), ["nPrompt", "nRandom", "Yield", "SumW2"])
+        # Uncomment the line below in the loop if you want .csv file output, WARNING the files can be very large and take a long time to process!
+        for (name, CTBranch) in Species:
+            for key, Events in coin_species(name, CTBranch, Bits):
+                nWritten = Written.get(key, 0)
+                Events.index = pd.RangeIndex(nWritten, nWritten+len(Events))
+                Written[key] = nWritten+len(Events)
+                #Events.to_csv("%s/%s_%s.csv" % (OUTPATH, key, runNum), index=False)
+                if (first):
+                    Events.to_root("%s/%s_%s_Analysed_Data.root" % (OUTPATH, runNum, MaxEvent), key ="%s" % key)
+                    first = False
+                elif (start == 0 or len(Events) > 0):
+                    # Later chunks are appended to the trees made by the first
+                    Events.to_root("%s/%s_%s_Analysed_Data.root" % (OUTPATH, runNum, MaxEvent), key ="%s" % key, mode ='a')
+                del Events
+    BGSub_file = up.recreate("%s/%s_%s_BGSub.root" % (OUTPATH, runNum, MaxEvent))
+    for key, Histo in Histos.items():
+        BGSub_file[key] = Histo
+    BGSub_file.close()
+    Yields["YieldError"] = np.sqrt(Yields["SumW2"])
+    Columns = ["Selection", "nPrompt", "nRandom", "RandomWeight", "Yield", "YieldError"]
+    if Boot is not None:
+        Yields["BootstrapError"] = klt.pyBootstrap.error(BootYields)
+        Columns.append("BootstrapError")
+    Yields[Columns].to_csv("%s/%s_%s_BGSub_Yields.csv" % (OUTPATH, runNum, MaxEvent), index=False)
+    for Row in Yields.itertuples(index=False):
+        print("%s - %i prompt, %i random events, background subtracted yield %.1f +/- %.1f" % (Row.Selection, Row.nPrompt, Row.nRandom, Row.Yield, Row.YieldError))
+        if Boot is not None:
+            print("%s - bootstrap error %.1f from %i replicas" % (Row.Selection, Row.BootstrapError, nReplicas))
+    for grid, Table in Tables.items():
+        Table.insert(len(Table.columns)-1, "YieldError", np.sqrt(Table["SumW2"]))
+        Table.to_csv("%s/%s_%s_%s_Yields.csv" % (OUTPATH, runNum, MaxEvent, grid), index=False)
+    if ScanTable is not None:
+        ScanTable.insert(len(ScanTable.columns)-1, "YieldError", np.sqrt(ScanTable["SumW2"]))
+        ScanTable.to_csv("%s/%s_%s_Scan_Yields.csv" % (OUTPATH, runNum, MaxEvent), index=False)
+    # Linux reports ru_maxrss in kB
+    PeakRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.0
+    if MemoryBudget is not None:
+        print("Peak memory use (RSS) %.1f MB, budget %.0f MB" % (PeakRSS, MemoryBudget))
+    else:
+        print("Peak memory use (RSS) %.1f MB" % PeakRSS)
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,196 @@
+#! /usr/bin/python
+
+# Python script which combines the Pionyield.py output (RUN_MAXEVENTS_Analysed_Data.root) of every run in a kinematic setting
+# The prompt and random trees of each run are read a chunk of events at a time, only the columns needed are read and only the running sums are kept,
+# so the memory used doesn't depend on the number of runs (or the size of each run)
+# Each event is weighted +1 (prompt) or -1/nWindows (random) as in Pionyield.py, the summed yields and histograms are divided by the summed charge x efficiency of the runs
+# The charge (uC) and efficiency of each run are read from NormFile (csv with columns Run,Charge,Efficiency - default UTIL_PION/OUTPUT/Analysis/PionLT/KINEMATIC_Normalisation.csv),
+# runs not in it take the SHMS BCM4A charge from their replay report (written from config/TEMPLATES/COIN/coin_production.template) and an efficiency of 1,
+# runs with neither are skipped
+# Writes KINEMATIC_Setting.root (normalised missing mass histograms), KINEMATIC_Setting_Yields.csv (per run and total yields) and KINEMATIC_Setting_tphi_Yields.csv to UTIL_PION/OUTPUT/Analysis/PionLT
+
+# Import relevant packages
+import uproot as up
+import numpy as np
+import pandas as pd
+import sys, os, subprocess
+from collections import OrderedDict
+
+if (len(sys.argv)-1 < 1 or len(sys.argv)-1 > 4):
+    print("!!!!! ERROR !!!!!\n Expected 1-4 arguments\n Usage is with - KINEMATIC MaxEvents(optional, default -1) NormFile(optional) ChunkSize(optional, events, default 100000) \n!!!!! ERROR !!!!!")
+    sys.exit(1)
+KINEMATIC = sys.argv[1]
+if (len(sys.argv)-1 > 1):
+    MaxEvent = sys.argv[2]
+else:
+    MaxEvent = "-1"
+
+USER = subprocess.getstatusoutput("whoami") # Grab user info for file finding
+HOST = subprocess.getstatusoutput("hostname")
+if ("farm" in HOST[1]):
+    REPLAYPATH = "/group/c-pionlt/USERS/%s/hallc_replay_lt" % USER[1]
+elif ("qcd" in HOST[1]):
+    REPLAYPATH = "/group/c-pionlt/USERS/%s/hallc_replay_lt" % USER[1]
+elif ("phys.uregina" in HOST[1]):
+    REPLAYPATH = "/home/%s/work/JLab/hallc_replay_lt" % USER[1]
+elif("skynet" in HOST[1]):
+    REPLAYPATH = "/home/%s/Work/JLab/hallc_replay_lt" % USER[1]
+
+# Add more path setting as needed in a similar manner
+UTILPATH = "%s/UTIL_PION" % REPLAYPATH
+OUTPATH = "%s/OUTPUT/Analysis/PionLT" % UTILPATH
+REPORTPATH = "%s/REPORT_OUTPUT/Analysis/PionLT" % UTILPATH
+RunListFile = "%s/scripts/kinematics/%s" % (UTILPATH, KINEMATIC)
+TimingCutFile = "%s/DB/PARAM/Timing_Parameters.csv" % UTILPATH
+BinningFile = "%s/DB/PARAM/Binning_Parameters.csv" % UTILPATH
+if (len(sys.argv)-1 > 2):
+    NormFile = sys.argv[3]
+else:
+    NormFile = "%s/%s_Normalisation.csv" % (OUTPATH, KINEMATIC)
+if (len(sys.argv)-1 > 3):
+    ChunkSize = int(sys.argv[4])
+else:
+    ChunkSize = 100000
+sys.path.insert(0, '%s/bin/python/' % UTILPATH)
+import kaonlt as klt
+
+# Combined selections - (name, histogram, missing mass branch, nBins, low, high, prompt tree, random tree), as the subtractions in Pionyield.py
+Selections = [("Pion", "h1_MMpi_BGSub", "MMpi", 220, 0.5, 1.6, "Cut_Pion_Events_Prompt", "Cut_Pion_Events_Random"),
+              ("Pion_NoRF", "h1_MMpi_BGSub_NoRF", "MMpi", 220, 0.5, 1.6, "Cut_Pion_Events_Prompt_NoRF", "Cut_Pion_Events_Random_NoRF"),
+              ("Kaon", "h1_MMK_BGSub", "MMK", 200, 0.8, 1.8, "Cut_Kaon_Events_Prompt", "Cut_Kaon_Events_Random"),
+              ("Proton", "h1_MMp_BGSub", "MMp", 150, 0.0, 1.5, "Cut_Proton_Events_Prompt", "Cut_Proton_Events_Random")]
+
+# Charge and efficiency of a run, from the normalisation table or (charge only) the report file, None if neither has it
+def normalisation(runNum, Norm):
+    if runNum in Norm.index:
+        return (float(Norm.loc[runNum, "Charge"]), float(Norm.loc[runNum, "Efficiency"]))
+    report = "%s/Pion_replay_coin_production_%i_%s.report" % (REPORTPATH, runNum, MaxEvent)
+    Report = klt.pyReport(report) if os.path.isfile(report) else None
+    # Reports from replays made before the charge was added to the template don't have it
+    if (Report is None or "SHMS BCM4A Charge" not in Report):
+        print("!!! WARNING !!! - Run %i not in %s and no SHMS BCM4A Charge in %s, run skipped - !!! WARNING !!!" % (runNum, NormFile, report))
+        return None
+    print("!!! WARNING !!! - Run %i not in %s, using the charge from %s and an efficiency of 1 - !!! WARNING !!!" % (runNum, NormFile, report))
+    # Charge is in mC in the report
+    return (1000*Report.get("SHMS BCM4A Charge"), 1.0)
+
+# Running sums of one selection over the setting, weighted by +1/-1/nWindows, nothing per event is kept
+class Sums():
+
+    def __init__(self, nBins, low, high, Binning):
+        self.Edges = np.linspace(low, high, nBins+1)
+        self.Counts = np.zeros(nBins)
+        self.SumW2 = np.zeros(nBins)
+        self.Binning = Binning
+        self.BinYield = np.zeros(len(Binning))
+        self.BinSumW2 = np.zeros(len(Binning))
+        self.BinPrompt = np.zeros(len(Binning), dtype=np.int64)
+        self.BinRandom = np.zeros(len(Binning), dtype=np.int64)
+
+    # Add a chunk of events all with the same weight, returns the (number of events, sum of weights, sum of squared weights) of the chunk
+    def add(self, Chunk, MMBranch, weight):
+        n = len(Chunk[MMBranch])
+        MM = np.asarray(Chunk[MMBranch])
+        Histo = np.histogram(MM, bins=self.Edges)[0]
+        self.Counts += weight*Histo
+        self.SumW2 += weight*weight*Histo
+        Index = self.Binning.index(-np.asarray(Chunk["MandelT"]), np.mod(Chunk["ph_q"], 2*np.pi))
+        Counts = self.Binning.count(Index)
+        self.BinYield += weight*Counts
+        self.BinSumW2 += weight*weight*Counts
+        if (weight > 0):
+            self.BinPrompt += Counts
+        else:
+            self.BinRandom += Counts
+        return (n, weight*n, weight*weight*n)
+
+# Stream one tree of a run in chunks, only the needed columns are read
+def stream(InFile, Tree, MMBranch, Total, weight):
+    nEvts = 0
+    Yield = 0.0
+    SumW2 = 0.0
+    for Chunk in InFile[Tree].iterate([MMBranch, "MandelT", "ph_q"], entrysteps=ChunkSize, namedecode="utf-8"):
+        n, w, w2 = Total.add(Chunk, MMBranch, weight)
+        nEvts += n
+        Yield += w
+        SumW2 += w2
+    return (nEvts, Yield, SumW2)
+
+def main():
+    print("Running as %s on %s, hallc_replay_lt path assumed as %s" % (USER[1], HOST[1], REPLAYPATH))
+    if not os.path.isfile(RunListFile):
+        print("!!!!! ERROR !!!!!\n %s not found \n!!!!! ERROR !!!!!" % RunListFile)
+        sys.exit(2)
+    with open(RunListFile) as f:
+        RunList = sorted(set(int(line.strip()) for line in f if line.strip() != ""))
+    if os.path.isfile(NormFile):
+        Norm = pd.read_csv(NormFile, comment='#', skipinitialspace=True).set_index("Run")
+    else:
+        Norm = pd.DataFrame(columns=["Charge", "Efficiency"])
+    # One t-phi grid for the whole setting, that of the first run
+    Param = klt.pyParam.cached(BinningFile)
+    get = lambda col: Param.get(RunList[0], col)
+    Binning = klt.pyBinning.uniform(("t", get("t_nBins"), get("t_Low"), get("t_High")), ("phi", get("phi_nBins"), 0.0, 2*np.pi))
+    Totals = OrderedDict((Selection[0], Sums(Selection[3], Selection[4], Selection[5], Binning)) for Selection in Selections)
+    Rows = []
+    TotalNorm = 0.0
+    for runNum in RunList:
+        rootName = "%s/%i_%s_Analysed_Data.root" % (OUTPATH, runNum, MaxEvent)
+        if not os.path.isfile(rootName):
+            print("!!! WARNING !!! - %s not found, run %i skipped - !!! WARNING !!!" % (rootName, runNum))
+            continue
+        RunNorm = normalisation(runNum, Norm)
+        if RunNorm is None:
+            continue
+        Charge, Efficiency = RunNorm
+        if (Charge*Efficiency <= 0):
+            print("!!! WARNING !!! - Run %i has charge x efficiency %f, skipped - !!! WARNING !!!" % (runNum, Charge*Efficiency))
+            continue
+        TotalNorm += Charge*Efficiency
+        randomWeight = klt.pySubtract(TimingCutFile, runNum).randomWeight
+        InFile = up.open(rootName)
+        for (name, Histo, MMBranch, nBins, low, high, Prompt, Random) in Selections:
+            nPrompt, PromptYield, PromptW2 = stream(InFile, Prompt, MMBranch, Totals[name], 1.0)
+            nRandom, RandomYield, RandomW2 = stream(InFile, Random, MMBranch, Totals[name], randomWeight)
+            Yield = PromptYield + RandomYield
+            Error = np.sqrt(PromptW2 + RandomW2)
+            Rows.append([runNum, name, Charge, Efficiency, nPrompt, nRandom, Yield, Error, Yield/(Charge*Efficiency), Error/(Charge*Efficiency)])
+        print("Run %i added - charge %.3f uC, efficiency %.3f" % (runNum, Charge, Efficiency))
+    if (TotalNorm == 0):
+        print("!!!!! ERROR !!!!!\n No runs from %s could be added \n!!!!! ERROR !!!!!" % RunListFile)
+        sys.exit(3)
+    Columns = ["Run", "Selection", "Charge", "Efficiency", "nPrompt", "nRandom", "Yield", "YieldError", "NormYield", "NormYieldError"]
+    Yields = pd.DataFrame(Rows, columns=Columns)
+    # Setting total, the summed yield over the summed charge x efficiency (so each run counts in proportion to its charge)
+    Total = Yields.groupby("Selection", sort=False).agg({"nPrompt" : "sum", "nRandom" : "sum", "Yield" : "sum"}).reset_index()
+    Total["YieldError"] = Yields.groupby("Selection", sort=False)["YieldError"].apply(lambda e: np.sqrt(np.sum(e*e))).values
+    Total["Run"] = "All"
+    Total["Charge"] = Yields.groupby("Selection", sort=False)["Charge"].sum().values
+    Total["Efficiency"] = TotalNorm/Total["Charge"]
+    Total["NormYield"] = Total["Yield"]/TotalNorm
+    Total["NormYieldError"] = Total["YieldError"]/TotalNorm
+    Yields = pd.concat([Yields, Total[Columns]], ignore_index=True)
+    Yields.to_csv("%s/%s_Setting_Yields.csv" % (OUTPATH, KINEMATIC), index=False)
+    OutFile = up.recreate("%s/%s_Setting.root" % (OUTPATH, KINEMATIC))
+    Tables = []
+    for (name, Histo, MMBranch, nBins, low, high, Prompt, Random) in Selections:
+        Sum = Totals[name]
+        OutFile[Histo] = (Sum.Counts/TotalNorm, Sum.Edges)
+        OutFile["%s_SumW2" % Histo] = (Sum.SumW2/(TotalNorm*TotalNorm), Sum.Edges)
+        Table = Binning.table()
+        Table.insert(0, "Selection", name)
+        Table["nPrompt"] = Sum.BinPrompt
+        Table["nRandom"] = Sum.BinRandom
+        Table["Yield"] = Sum.BinYield
+        Table["YieldError"] = np.sqrt(Sum.BinSumW2)
+        Table["NormYield"] = Sum.BinYield/TotalNorm
+        Table["NormYieldError"] = np.sqrt(Sum.BinSumW2)/TotalNorm
+        Tables.append(Table)
+    OutFile.close()
+    pd.concat(Tables, ignore_index=True).to_csv("%s/%s_Setting_tphi_Yields.csv" % (OUTPATH, KINEMATIC), index=False)
+    for Row in Yields[Yields["Run"] == "All"].itertuples(index=False):
+        print("%s - yield %.1f +/- %.1f, %.3f +/- %.3f per uC" % (Row.Selection, Row.Yield, Row.YieldError, Row.NormYield, Row.NormYieldError))
+    print("Setting output written to %s/%s_Setting.root, _Setting_Yields.csv and _Setting_tphi_Yields.csv" % (OUTPATH, KINEMATIC))
+
+if __name__ == '__main__':
+    main()